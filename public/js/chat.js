@@ -2,7 +2,8 @@ document.addEventListener("DOMContentLoaded", async () => {
     const charId = window.location.pathname.split("/").pop();
     const userId = localStorage.getItem('id');
     let mockUserName;
-    let offset = 0;
+    let cursor = null; // Timestamp of the oldest loaded message; older pages are fetched before it
+    let hasMoreHistory = true;
     const limit = 10;
     let isLoadingHistory = false;
 
@@ -96,8 +97,8 @@ document.addEventListener("DOMContentLoaded", async () => {
     }
 
     // Fetch chat history
-    async function fetchHistory(newOffset) {
-        if (isLoadingHistory) return [];
+    async function fetchHistory() {
+        if (isLoadingHistory || !hasMoreHistory) return [];
         isLoadingHistory = true;
         const chatMessages = document.getElementById("chatMessages");
         const loaderDiv = document.createElement("div");
@@ -107,10 +108,12 @@ document.addEventListener("DOMContentLoaded", async () => {
 
         try {
             const headers = await firebaseAuth.Tokenheader();
-            const response = await fetch(`/history?user_id=${encodeURIComponent(userId)}&char_id=${encodeURIComponent(charId)}&uid=${userId}&offset=${newOffset}&limit=${limit}`, { headers });
+            const before = cursor ? `&before=${encodeURIComponent(cursor)}` : '';
+            const response = await fetch(`/history?user_id=${encodeURIComponent(userId)}&char_id=${encodeURIComponent(charId)}&uid=${userId}&limit=${limit}${before}`, { headers });
             if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
             const history = await response.json();
-            offset = newOffset + limit;
+            if (history.length > 0) cursor = history[history.length - 1].timestamp;
+            hasMoreHistory = response.headers.get('X-Next-Cursor') !== null;
             return history.reverse(); // Oldest first
         } catch (error) {
             console.error("Error fetching history:", error);
@@ -223,7 +226,7 @@ document.addEventListener("DOMContentLoaded", async () => {
         // Fetch initial data
         const [character, history, likeStatus] = await Promise.all([
             fetchCharacterData(),
-            fetchHistory(0),
+            fetchHistory(),
             fetchLikeStatus()
         ]);
 
@@ -281,7 +284,7 @@ document.addEventListener("DOMContentLoaded", async () => {
         // Setup infinite scroll for history
         const loadMoreHistory = debounce(async () => {
             if (chatMessages.scrollTop < 50 && !isLoadingHistory) {
-                const newHistory = await fetchHistory(offset);
+                const newHistory = await fetchHistory();
                 const fragment = document.createDocumentFragment();
                 for (const message of newHistory) {
                     if (!message.message || typeof message.message !== 'string') continue;
@@ -366,14 +369,7 @@ document.addEventListener("DOMContentLoaded", async () => {
                     let buffer = '';
                     let responseText = '';
 
-                    while (true) {
-                        const { done, value } = await reader.read();
-                        if (done) break;
-                        buffer += decoder.decode(value, { stream: true });
-                        const contentIndex = buffer.indexOf('\n\n');
-                        if (contentIndex === -1) continue;
-                        const eventData = buffer.slice(0, contentIndex);
-                        buffer = buffer.slice(contentIndex + 2);
+                    const handleFrame = (eventData) => {
                         const lines = eventData.split('\n');
                         let event = 'message';
                         let data = '';
@@ -390,6 +386,24 @@ document.addEventListener("DOMContentLoaded", async () => {
                             const err = JSON.parse(data);
                             botMessage.querySelector(".message-content").innerHTML = `Error: ${err.error}`;
                         }
+                    };
+
+                    while (true) {
+                        const { done, value } = await reader.read();
+                        if (done) {
+                            // Whatever arrived with the last chunk, including a frame missing its blank line
+                            buffer += decoder.decode();
+                            if (buffer.trim()) handleFrame(buffer.trim());
+                            break;
+                        }
+                        buffer += decoder.decode(value, { stream: true });
+                        // One chunk often carries several coalesced frames
+                        let contentIndex;
+                        while ((contentIndex = buffer.indexOf('\n\n')) !== -1) {
+                            const eventData = buffer.slice(0, contentIndex);
+                            buffer = buffer.slice(contentIndex + 2);
+                            handleFrame(eventData);
+                        }
                     }
                 } catch (err) {
                     console.error("AI error:", err);
@@ -13,6 +13,7 @@ const aiPostSchema = new mongoose.Schema({
   commentCount: { type: Number, default: 0 },
   trend: { type: Number, default: 10 },
   value: { type: Number, default: 0 },
+  lastInteractionAt: { type: Date, default: null },
   createdAt: { type: Date, default: Date.now },
   old: { type: Boolean, default: false }
 });
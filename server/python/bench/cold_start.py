@@ -0,0 +1,118 @@
+# bench/cold_start.py
+#
+# Cold-start benchmark for the server/python entry points. Node spawns a fresh interpreter per
+# request, so start-up cost is paid every time. For each script this measures, over several fresh
+# processes:
+#   import_ms        - time to import the module (no I/O, no network)
+#   first_output_ms  - time from spawn until the first byte on stdout/stderr for an input that
+#                      needs no network (fast-path answer, validation error or --help)
+# plus the bare interpreter start-up as a baseline. Results are written as JSON.
+#
+#   python3 bench/cold_start.py                    -> JSON on stdout
+#   python3 bench/cold_start.py --runs 10 --out cold_start.json
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# script -> (argv, stdin) that produces output without touching the network
+SCENARIOS = {
+    "hina.py": ([], json.dumps({"user": "hello", "userid": "bench", "char": {"id": "bench", "name": "Bench"}})),
+    "hinaM.py": ([], json.dumps({"query": "take me home", "user_name": "Bench"})),
+    "postMaker.py": ([], ""),
+    "mediaHandler.py": (["--help"], ""),
+}
+
+def bench_env(cache_dir):
+    env = dict(os.environ)
+    env.update({
+        "PY_CACHE_DB": os.path.join(cache_dir, "bench.sqlite3"),  # Keep benchmark runs out of the real cache
+        "SUPABASE_URL": "",
+        "SUPABASE_KEY": "",
+        "postAPI": env.get("postAPI") or "bench",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+def time_baseline(env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return (time.perf_counter() - start) * 1000
+
+def time_import(module, env):
+    code = (
+        "import time, sys\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "sys.stdout.write(str((time.perf_counter() - start) * 1000))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=PYTHON_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {result.stderr.strip()}")
+    return float(result.stdout)
+
+def time_first_output(script, argv, stdin, env):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-u", script, *argv], cwd=PYTHON_DIR, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    )
+    proc.stdin.write(stdin.encode())
+    proc.stdin.close()
+    first = proc.stdout.read(1)
+    elapsed = (time.perf_counter() - start) * 1000
+    proc.stdout.read()
+    proc.wait()
+    return elapsed if first else None
+
+def summarize(samples):
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        return None
+    return {
+        "median": round(statistics.median(samples), 1),
+        "min": round(min(samples), 1),
+        "max": round(max(samples), 1),
+    }
+
+def run(runs, scripts):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = bench_env(cache_dir)
+        results = {
+            "python": sys.version.split()[0],
+            "runs": runs,
+            "baseline_ms": summarize([time_baseline(env) for _ in range(runs)]),
+            "scripts": {},
+        }
+        for script in scripts:
+            argv, stdin = SCENARIOS[script]
+            module = script[:-3]
+            results["scripts"][script] = {
+                "import_ms": summarize([time_import(module, env) for _ in range(runs)]),
+                "first_output_ms": summarize([time_first_output(script, argv, stdin, env) for _ in range(runs)]),
+            }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for server/python scripts")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--script", action="append", choices=sorted(SCENARIOS), help="Only these scripts (repeatable)")
+    parser.add_argument("--out", help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = run(args.runs, args.script or list(SCENARIOS))
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# bench/fakes.py
+#
+# Local stand-ins for the external services used by the server/python scripts, so each stage can
+# be timed offline:
+#   FakeGroq / FakeAsyncGroq - chat completions with configurable time-to-first-token, per-token
+#                              latency, failure and 429 injection, and x-ratelimit-* headers
+#   FakeSupabase             - in-memory tables behind the query-builder calls hina.py makes
+#   mongo_db()               - a mongomock database (None when mongomock is not installed)
+import time
+import zlib
+import random
+import asyncio
+import threading
+from collections import defaultdict, Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+WORDS = ("the moon hums softly over quiet streets while stories gather in the corners of "
+         "old cafes and friends trade secrets about tomorrow").split()
+
+@dataclass
+class LatencyProfile:
+    ttft_ms: float = 300.0           # Time to first token
+    token_ms: float = 15.0           # Per generated token after the first
+    tokens: int = 120                # Tokens per reply
+    fail_rate: float = 0.0           # Share of requests failing with a 500
+    rate_limit_rate: float = 0.0     # Share of requests failing with a 429
+    retry_after: float = 1.0         # Seconds advertised on injected 429s
+    slow_models: dict = field(default_factory=dict)  # model -> latency multiplier
+    seed: int = 7
+
+class FakeAPIError(Exception):
+    """Shaped like groq.APIStatusError: status_code plus response.headers"""
+    def __init__(self, status_code, message, headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+def lorem(tokens, rng=None):
+    rng = rng or random
+    return " ".join(rng.choice(WORDS) for _ in range(max(1, tokens)))
+
+class _Backend:
+    """Shared state for the sync and async clients: injection, latency and counters"""
+    def __init__(self, profile, responder=None):
+        self.profile = profile
+        self.responder = responder or (lambda model, messages, params: lorem(self.profile.tokens, self.rng))
+        self.rng = random.Random(profile.seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()       # model -> requests
+        self.errors = Counter()      # status code -> injected errors
+        self.tokens_out = 0
+
+    def admit(self, model):
+        with self.lock:
+            self.calls[model] += 1
+            roll = self.rng.random()
+        if roll < self.profile.rate_limit_rate:
+            self.errors[429] += 1
+            raise FakeAPIError(429, f"Rate limit reached for model {model}", {"retry-after": str(self.profile.retry_after)})
+        if roll < self.profile.rate_limit_rate + self.profile.fail_rate:
+            self.errors[500] += 1
+            raise FakeAPIError(500, "Internal server error")
+
+    def scale(self, model):
+        return self.profile.slow_models.get(model, 1.0) / 1000
+
+    def headers(self, model):
+        calls = self.calls[model]
+        return {
+            "x-ratelimit-limit-requests": "14400",
+            "x-ratelimit-remaining-requests": str(max(0, 14400 - calls)),
+            "x-ratelimit-reset-requests": "6s",
+            "x-ratelimit-limit-tokens": "100000",
+            "x-ratelimit-remaining-tokens": str(max(0, 100000 - calls * self.profile.tokens)),
+            "x-ratelimit-reset-tokens": "1.2s",
+        }
+
+    def reply(self, model, messages, params):
+        text = self.responder(model, messages, params)
+        with self.lock:
+            self.tokens_out += len(text.split())
+        return text
+
+def _completion(text, prompt_tokens=0):
+    words = len(text.split())
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text), delta=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=words, total_tokens=prompt_tokens + words),
+    )
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+def _prompt_tokens(messages):
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4
+
+# ----------------------
+# Sync client (hinaM.py, postMaker.py, mediaHandler.py)
+# ----------------------
+class _SyncCompletions:
+    def __init__(self, backend):
+        self.backend = backend
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def create(self, model, messages, **params):
+        b = self.backend
+        b.admit(model)
+        text = b.reply(model, messages, params)
+        time.sleep((b.profile.ttft_ms + b.profile.token_ms * len(text.split())) * b.scale(model))
+        return _completion(text, _prompt_tokens(messages))
+
+    def _create_raw(self, model, messages, **params):
+        return _SyncRaw(self.create(model, messages, **params), self.backend.headers(model))
+
+class _SyncRaw:
+    def __init__(self, value, headers):
+        self.value = value
+        self.headers = headers
+
+    def parse(self):
+        return self.value
+
+class FakeGroq:
+    def __init__(self, profile=None, responder=None):
+        self.backend = _Backend(profile or LatencyProfile(), responder)
+        self.chat = SimpleNamespace(completions=_SyncCompletions(self.backend))
+
+# ----------------------
+# Async client (hina.py)
+# ----------------------
+class _FakeStream:
+    def __init__(self, backend, model, text):
+        self.backend = backend
+        self.model = model
+        self.words = text.split()
+        self.closed = False
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        b = self.backend
+        yield _chunk(None)  # Groq opens with a role-only chunk
+        await asyncio.sleep(b.profile.ttft_ms * b.scale(self.model))
+        for i, word in enumerate(self.words):
+            if self.closed:
+                return
+            if i:
+                await asyncio.sleep(b.profile.token_ms * b.scale(self.model))
+            yield _chunk(word + " ")
+
+    async def close(self):
+        self.closed = True
+
+class _Raw:
+    def __init__(self, value, headers):
+        self.value = value
+        self.headers = headers
+
+    async def parse(self):
+        return self.value
+
+class _AsyncCompletions:
+    def __init__(self, backend):
+        self.backend = backend
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    async def create(self, model, messages, stream=False, **params):
+        b = self.backend
+        b.admit(model)
+        text = b.reply(model, messages, params)
+        if stream:
+            return _FakeStream(b, model, text)
+        await asyncio.sleep((b.profile.ttft_ms + b.profile.token_ms * len(text.split())) * b.scale(model))
+        return _completion(text, _prompt_tokens(messages))
+
+    async def _create_raw(self, model, messages, **params):
+        value = await self.create(model, messages, **params)
+        return _Raw(value, self.backend.headers(model))
+
+class FakeAsyncGroq:
+    def __init__(self, profile=None, responder=None):
+        self.backend = _Backend(profile or LatencyProfile(), responder)
+        self.chat = SimpleNamespace(completions=_AsyncCompletions(self.backend))
+
+# ----------------------
+# Supabase
+# ----------------------
+class _Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = "select"
+        self.filters = []
+        self.order_by = None
+        self.max_rows = None
+        self.offset = 0
+        self.rows = None
+
+    def select(self, *columns):
+        self.op = "select"
+        return self
+
+    def insert(self, rows):
+        self.op = "insert"
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, count):
+        self.max_rows = count
+        return self
+
+    def range(self, start, end):
+        self.offset = start
+        self.max_rows = end - start + 1
+        return self
+
+    def execute(self):
+        return self.client._execute(self)
+
+class FakeSupabase:
+    """In-memory tables; every execute() is one round trip with latency_ms of simulated network"""
+    def __init__(self, latency_ms=20.0):
+        self.latency_ms = latency_ms
+        self.tables = defaultdict(list)
+        self.round_trips = Counter()  # "table.op" -> count
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def _execute(self, q):
+        time.sleep(self.latency_ms / 1000)
+        with self.lock:
+            self.round_trips[f"{q.table}.{q.op}"] += 1
+            rows = self.tables[q.table]
+            if q.op == "insert":
+                rows.extend(dict(r) for r in q.rows)
+                return SimpleNamespace(data=q.rows)
+            matched = [r for r in rows if all(f(r) for f in q.filters)]
+            if q.op == "delete":
+                self.tables[q.table] = [r for r in rows if not all(f(r) for f in q.filters)]
+                return SimpleNamespace(data=matched)
+            if q.order_by:
+                column, desc = q.order_by
+                matched.sort(key=lambda r: r.get(column) or "", reverse=desc)
+            end = q.offset + q.max_rows if q.max_rows is not None else None
+            return SimpleNamespace(data=[dict(r) for r in matched[q.offset:end]])
+
+def seed_history(supabase, user_id, char_id, count):
+    """count alternating user/ai rows, oldest first, ending one minute ago"""
+    now = datetime.now() - timedelta(minutes=1)
+    rng = random.Random(zlib.crc32(f"{user_id}:{char_id}".encode()))
+    for i in range(count):
+        sender = "user" if i % 2 == 0 else "ai"
+        supabase.tables["history"].append({
+            "id": f"{user_id}-{char_id}-{i}",
+            "user_id": user_id,
+            "char_id": char_id,
+            "sender": sender,
+            "message": lorem(12 if sender == "user" else 60, rng),
+            "chat_id": f"seed-{i}",
+            "timestamp": (now - timedelta(seconds=(count - i) * 30)).isoformat(),
+        })
+
+# ----------------------
+# Mongo
+# ----------------------
+def mongo_db(name="aiova"):
+    try:
+        import mongomock
+    except ImportError:
+        return None
+    return mongomock.MongoClient()[name]
+
+def seed_media(db, characters=20, posts=200, image_share=0.3, seed=7):
+    rng = random.Random(seed)
+    communities = ["@AICharacters", "@art", "@music", "@books"]
+    for i in range(characters):
+        db["characters"].insert_one({
+            "id": f"char-{i}", "name": f"Character {i}",
+            "behavior": lorem(10, rng), "background": lorem(20, rng),
+        })
+    now = datetime.utcnow()
+    for i in range(posts):
+        doc = {
+            "authorId": f"char-{rng.randrange(characters)}" if i % 2 else f"user-{i}",
+            "authorName": f"Author {i}",
+            "content": lorem(40, rng),
+            "community": rng.choice(communities),
+            "likeCount": 0,
+            "commentCount": 0,
+            "createdAt": now - timedelta(minutes=i),
+        }
+        if rng.random() < image_share:
+            doc["image"] = f"https://images.example/{i % 25}.png"  # Repeated URLs exercise the image cache
+        db["aipost" if i % 2 else "posts"].insert_one(doc)
@@ -0,0 +1,401 @@
+# bench/stages.py
+#
+# Offline per-stage benchmark for hina.py, hinaM.py, postMaker.py and mediaHandler.py.
+# Groq, Supabase and Mongo are replaced by the stand-ins in fakes.py; the scripts' own functions
+# are wrapped with timers so each stage (history fetch, summary, retrieval, time to first token,
+# streaming, DB writes, ...) gets its own distribution. Results are JSON so runs can be compared.
+#
+#   python3 bench/stages.py                              -> all scripts, JSON on stdout
+#   python3 bench/stages.py --script hina.py --requests 50 --ttft-ms 200 --rate-limit-rate 0.1
+#   python3 bench/stages.py --out after.json --compare before.json
+import os
+import io
+import sys
+import json
+import time
+import atexit
+import shutil
+import asyncio
+import argparse
+import inspect
+import tempfile
+import statistics
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_DIR = os.path.dirname(BENCH_DIR)
+
+# The scripts read these at import time: keep benchmark state out of the real cache and give
+# every client a key so nothing exits early
+_cache_dir = tempfile.mkdtemp(prefix="aiova-bench-")
+atexit.register(shutil.rmtree, _cache_dir, ignore_errors=True)
+os.environ["PY_CACHE_DB"] = os.path.join(_cache_dir, "bench.sqlite3")
+for _key in ("charapi", "sumapi", "postAPI"):
+    os.environ.setdefault(_key, "bench")
+sys.path.insert(0, PYTHON_DIR)
+
+import clients
+from fakes import LatencyProfile, FakeGroq, FakeAsyncGroq, FakeSupabase, seed_history, mongo_db, seed_media
+
+class Recorder:
+    """Wraps functions/methods with timers; samples are kept per stage in milliseconds"""
+    def __init__(self):
+        self.samples = {}
+        self.marks = {}  # stage -> (start, end) of the most recent call
+        self._patched = []
+
+    def add(self, stage, ms):
+        self.samples.setdefault(stage, []).append(ms)
+
+    def wrap(self, owner, attr, stage):
+        original = getattr(owner, attr)
+        recorder = self
+
+        if inspect.iscoroutinefunction(original):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    end = time.perf_counter()
+                    recorder.marks[stage] = (start, end)
+                    recorder.add(stage, (end - start) * 1000)
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    end = time.perf_counter()
+                    recorder.marks[stage] = (start, end)
+                    recorder.add(stage, (end - start) * 1000)
+
+        setattr(owner, attr, timed)
+        self._patched.append((owner, attr, original))
+
+    def restore(self):
+        for owner, attr, original in reversed(self._patched):
+            setattr(owner, attr, original)
+        self._patched = []
+
+    def report(self):
+        return {stage: summarize(samples) for stage, samples in self.samples.items()}
+
+def summarize(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+        "p50_ms": round(pct(50), 2),
+        "p95_ms": round(pct(95), 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+class Sink:
+    """FrameWriter stand-in that counts frames instead of writing them"""
+    def __init__(self):
+        self.frames = 0
+        self.errors = 0
+
+    def send(self, frame):
+        self.frames += 1
+        if frame.startswith("event: error"):
+            self.errors += 1
+
+    def done(self, code=0):
+        pass
+
+    async def drain(self):
+        pass
+
+def profile_from(args):
+    return LatencyProfile(
+        ttft_ms=args.ttft_ms, token_ms=args.token_ms, tokens=args.tokens,
+        fail_rate=args.fail_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed,
+    )
+
+# ----------------------
+# hina.py
+# ----------------------
+def bench_hina(args):
+    import hina
+    import retrieval
+
+    supabase = FakeSupabase(latency_ms=args.db_ms)
+    users = [f"bench-user-{i}" for i in range(args.users)]
+    for user in users:
+        seed_history(supabase, user, "bench-char", args.history)
+    groq = FakeAsyncGroq(profile_from(args))
+    clients.override("supabase", lambda url: supabase)
+    clients.override("async_groq", lambda api_key: groq)
+
+    rec = Recorder()
+    rec.wrap(hina, "get_history", "history_fetch")
+    rec.wrap(hina.summary_store, "get", "summary_lookup")
+    rec.wrap(hina, "summarize_chats", "summary_refresh")
+    rec.wrap(retrieval, "get_index", "retrieval_index")
+    rec.wrap(retrieval.BM25Index, "search", "retrieval_search")
+    rec.wrap(hina, "open_stream", "ttft")
+    rec.wrap(hina, "save_turn", "history_write")
+    rec.wrap(hina, "prune_history", "history_prune")
+
+    def payload(i):
+        return {
+            "user": f"do you remember the quiet cafe and the moon {i}?",
+            "userid": users[i % len(users)],
+            "user_name": "Bench",
+            "hisLimit": args.history,
+            "char": {"id": "bench-char", "name": "Mira"},
+        }
+
+    async def sequential():
+        tokens_per_s = []
+        for i in range(args.requests):
+            sink = Sink()
+            before = groq.backend.tokens_out
+            start = time.perf_counter()
+            await hina.handle_chat(payload(i), sink)
+            rec.add("total", (time.perf_counter() - start) * 1000)
+            if "ttft" in rec.marks and "history_write" in rec.marks:
+                stream_s = rec.marks["history_write"][0] - rec.marks["ttft"][1]
+                rec.add("stream", stream_s * 1000)
+                streamed = groq.backend.tokens_out - before
+                if stream_s > 0:
+                    tokens_per_s.append(streamed / stream_s)
+            rec.marks.clear()
+            if hina._background:
+                await asyncio.gather(*hina._background, return_exceptions=True)
+        return tokens_per_s
+
+    async def concurrent():
+        start = time.perf_counter()
+        sinks = [Sink() for _ in range(args.concurrency)]
+        await asyncio.gather(*(hina.handle_chat(payload(i), s) for i, s in enumerate(sinks)))
+        wall = time.perf_counter() - start
+        if hina._background:
+            await asyncio.gather(*hina._background, return_exceptions=True)
+        return {"requests": len(sinks), "wall_ms": round(wall * 1000, 1),
+                "requests_per_s": round(len(sinks) / wall, 2), "errors": sum(s.errors for s in sinks)}
+
+    try:
+        tokens_per_s = asyncio.run(sequential())
+        stages = rec.report()
+        throughput = asyncio.run(concurrent())
+    finally:
+        rec.restore()
+    return {
+        "stages": stages,
+        "tokens_per_s": summarize(tokens_per_s) and {
+            "mean": round(statistics.fmean(tokens_per_s), 1), "min": round(min(tokens_per_s), 1)
+        },
+        "concurrent": throughput,
+        "db_round_trips": dict(supabase.round_trips),
+        "llm_calls": dict(groq.backend.calls),
+        "injected_errors": {str(k): v for k, v in groq.backend.errors.items()},
+    }
+
+# ----------------------
+# hinaM.py
+# ----------------------
+HINAM_QUERIES = [
+    ("take me home", "no memories yet"),
+    ("how do I create a character?", "no memories yet"),
+    ("what is discover", "no memories yet"),
+    ("show notifications", "no memories yet"),
+    ("how do I create a character", "no memories yet"),
+    ("what did we talk about yesterday", "user asked about posts"),
+    ("what is my bio", "no memories yet"),
+    ("tell me a joke about the site", "no memories yet"),
+]
+
+def bench_hinam(args):
+    import hinaM
+
+    def answer(model, messages, params):
+        return json.dumps({"execute": None, "answer": "You can do that from the make page, Bench!"})
+
+    groq = FakeGroq(profile_from(args), responder=answer)
+    clients.override("groq", lambda api_key: groq)
+    rec = Recorder()
+    rec.wrap(hinaM, "fast_path", "intent")
+    rec.wrap(hinaM, "cached_answer", "cache_lookup")
+    rec.wrap(hinaM, "run_chat", "llm")
+    rec.wrap(hinaM, "parse_ai_response", "parse")
+    rec.wrap(hinaM, "store_answer", "cache_store")
+
+    sources = {}
+    try:
+        for i in range(args.requests):
+            query, memo = HINAM_QUERIES[i % len(HINAM_QUERIES)]
+            stdin = json.dumps({"query": query, "memo": memo, "user_name": f"User{i}"})
+            out = io.StringIO()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(out), _stdin(stdin):
+                hinaM.main()
+            rec.add("total", (time.perf_counter() - start) * 1000)
+            source = json.loads(out.getvalue()).get("source", "llm")
+            sources[source] = sources.get(source, 0) + 1
+    finally:
+        rec.restore()
+    return {"stages": rec.report(), "sources": sources, "llm_calls": dict(groq.backend.calls)}
+
+@contextlib.contextmanager
+def _stdin(text):
+    saved = sys.stdin
+    sys.stdin = io.StringIO(text)
+    try:
+        yield
+    finally:
+        sys.stdin = saved
+
+# ----------------------
+# postMaker.py
+# ----------------------
+def bench_postmaker(args):
+    import postMaker
+
+    groq = FakeGroq(profile_from(args))
+    clients.override("groq", lambda api_key: groq)
+    rec = Recorder()
+    rec.wrap(postMaker, "get_trend_context", "trend_context")
+    rec.wrap(postMaker, "web_search_context", "web_search")
+    rec.wrap(postMaker, "make_post", "llm_post")
+
+    tag_sets = [["music", "night"], ["books", "rain"], ["art"], ["music", "night"]]
+    characters = [{
+        "character_id": f"char-{i}", "name": f"Character {i}",
+        "behavior": "Warm, curious and a little dramatic", "background": "A wandering storyteller",
+        "tags": tag_sets[i % len(tag_sets)],
+    } for i in range(args.requests)]
+
+    try:
+        for data in characters:
+            start = time.perf_counter()
+            postMaker.generate_post(data)
+            rec.add("total", (time.perf_counter() - start) * 1000)
+        stages = rec.report()
+
+        # Batch mode: same characters through the NDJSON pipeline
+        stream = io.StringIO("".join(json.dumps(c) + "\n" for c in characters))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(postMaker.run_batch(stream, args.concurrency))
+        wall = time.perf_counter() - start
+    finally:
+        rec.restore()
+    return {
+        "stages": stages,
+        "batch": {"posts": len(characters), "wall_ms": round(wall * 1000, 1), "posts_per_s": round(len(characters) / wall, 2)},
+        "llm_calls": dict(groq.backend.calls),
+    }
+
+# ----------------------
+# mediaHandler.py
+# ----------------------
+def bench_media(args):
+    db = mongo_db()
+    if db is None:
+        return {"skipped": "mongomock is not installed"}
+    import mediaHandler
+
+    seed_media(db, characters=max(args.characters, 2), posts=args.posts)
+
+    def decide(model, messages, params):
+        if isinstance(messages[0]["content"], list):
+            return "A watercolor of a quiet street at night"  # Vision call
+        return '```json{"like": "yes", "wantTocomment": "yes", "comment": "Lovely!"}```'
+
+    groq = FakeGroq(profile_from(args), responder=decide)
+    clients.override("mongo", lambda uri: db.client)
+    clients.override("groq", lambda api_key: groq)
+    mediaHandler._context_cache.clear()
+
+    rec = Recorder()
+    rec.wrap(mediaHandler.CandidatePool, "refill", "pool_refill")
+    rec.wrap(mediaHandler.CandidatePool, "take", "pool_take")
+    rec.wrap(mediaHandler, "fetch_context_posts", "context_fetch")
+    rec.wrap(mediaHandler, "describe_post_image", "image_describe")
+    rec.wrap(mediaHandler, "decide_engagement", "llm_decide")
+    rec.wrap(mediaHandler, "apply_decisions", "db_apply")
+    rec.wrap(mediaHandler, "record_engagements", "db_engagements")
+
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(mediaHandler.run_batch(args.characters, args.posts_per_char, args.concurrency))
+        wall = time.perf_counter() - start
+    finally:
+        rec.restore()
+    decisions = db["engagements"].count_documents({})
+    return {
+        "stages": rec.report(),
+        "batch": {"decisions": decisions, "wall_ms": round(wall * 1000, 1),
+                  "decisions_per_s": round(decisions / wall, 2) if wall else None},
+        "llm_calls": dict(groq.backend.calls),
+    }
+
+BENCHES = {
+    "hina.py": bench_hina,
+    "hinaM.py": bench_hinam,
+    "postMaker.py": bench_postmaker,
+    "mediaHandler.py": bench_media,
+}
+
+def compare(current, previous):
+    """p50 change per stage, in percent, for stages present in both runs"""
+    diff = {}
+    for script, result in current["scripts"].items():
+        old = previous.get("scripts", {}).get(script, {}).get("stages") or {}
+        for stage, stats in (result.get("stages") or {}).items():
+            if stats and old.get(stage) and old[stage]["p50_ms"]:
+                change = (stats["p50_ms"] - old[stage]["p50_ms"]) / old[stage]["p50_ms"] * 100
+                diff[f"{script}:{stage}"] = round(change, 1)
+    return diff
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline per-stage benchmark with fake Groq/Supabase/Mongo")
+    parser.add_argument("--script", action="append", choices=sorted(BENCHES), help="Only these scripts (repeatable)")
+    parser.add_argument("--requests", type=int, default=20, help="Sequential requests per script")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=4, help="hina.py: distinct users (warm vs cold indexes)")
+    parser.add_argument("--history", type=int, default=200, help="hina.py: seeded history rows per user")
+    parser.add_argument("--characters", type=int, default=10, help="mediaHandler.py: characters per batch")
+    parser.add_argument("--posts", type=int, default=200, help="mediaHandler.py: seeded posts")
+    parser.add_argument("--posts-per-char", type=int, default=5)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=15.0)
+    parser.add_argument("--tokens", type=int, default=120)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--db-ms", type=float, default=20.0, help="Simulated Supabase round trip")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="Write JSON here instead of stdout")
+    parser.add_argument("--compare", help="Earlier results file; adds p50 change per stage")
+    args = parser.parse_args()
+
+    results = {
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "script")},
+        "scripts": {},
+    }
+    for script in args.script or list(BENCHES):
+        results["scripts"][script] = BENCHES[script](args)
+    if args.compare:
+        with open(args.compare) as f:
+            results["p50_change_pct"] = compare(results, json.load(f))
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
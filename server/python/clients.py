@@ -0,0 +1,204 @@
+# clients.py
+#
+# Shared client registry for every server/python script. Clients are created lazily, once per
+# process (per API key for Groq), on pooled HTTP connections with keep-alive (HTTP/2 when `h2`
+# is installed and CLIENT_HTTP2=1), so repeated calls reuse warm connections instead of paying
+# a TLS handshake each time. pool_stats() reports per-backend reuse; override() lets the
+# benchmark fakes stand in for the real clients. Clients for user-supplied keys are kept in a
+# separate LRU of CLIENT_USER_MAX, so a long-lived worker doesn't hold one per user forever.
+import os
+import threading
+from collections import OrderedDict
+
+CONNECT_TIMEOUT = float(os.getenv('CLIENT_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.getenv('CLIENT_READ_TIMEOUT', '60'))
+POOL_SIZE = int(os.getenv('CLIENT_POOL_SIZE', '20'))           # Max connections per client
+KEEPALIVE = int(os.getenv('CLIENT_KEEPALIVE', '10'))           # Idle connections kept open
+KEEPALIVE_EXPIRY = float(os.getenv('CLIENT_KEEPALIVE_EXPIRY', '60'))
+HTTP2 = os.getenv('CLIENT_HTTP2', '1') == '1'
+MONGO_POOL_SIZE = int(os.getenv('MONGO_POOL_SIZE', '20'))
+USER_CLIENTS_MAX = int(os.getenv('CLIENT_USER_MAX', '64'))    # Clients kept for user-supplied keys
+
+_lock = threading.Lock()
+_clients = {}      # (kind, key) -> client
+_user_clients = OrderedDict()  # (kind, key) -> client for user-supplied keys, least recently used first
+_http = {}         # (kind, key) -> httpx client behind it
+_stats = {}        # kind -> {"created", "reused", "requests"}
+_overrides = {}    # kind -> factory(key)
+_wrappers = {}     # kind -> wrapper(key, client)
+
+def _count(kind, field, amount=1):
+    entry = _stats.setdefault(kind, {"created": 0, "reused": 0, "requests": 0})
+    entry[field] = entry.get(field, 0) + amount
+
+def _http2_available():
+    if not HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _timeout():
+    import httpx
+    return httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+def _http_client(kind, asynchronous=False):
+    import httpx
+    limits = httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=KEEPALIVE, keepalive_expiry=KEEPALIVE_EXPIRY)
+    if asynchronous:
+        async def on_request(request):
+            _count(kind, "requests")
+        return httpx.AsyncClient(limits=limits, timeout=_timeout(), http2=_http2_available(), event_hooks={"request": [on_request]})
+
+    def on_request(request):
+        _count(kind, "requests")
+    return httpx.Client(limits=limits, timeout=_timeout(), http2=_http2_available(), event_hooks={"request": [on_request]})
+
+def _get(kind, key, create, finish=None, user=False):
+    # finish: applied to every client of the kind, overridden or not, before any wrap()
+    cache = _user_clients if user else _clients
+    with _lock:
+        client = cache.get((kind, key))
+        if client is not None:
+            if user:
+                cache.move_to_end((kind, key))
+            _count(kind, "reused")
+            return client
+        factory = _overrides.get(kind)
+        client = factory(key) if factory else create()
+        if finish is not None:
+            client = finish(client)
+        if kind in _wrappers:
+            client = _wrappers[kind](key, client)
+        cache[(kind, key)] = client
+        _count(kind, "created")
+        if user and len(cache) > USER_CLIENTS_MAX:
+            # Dropped, not closed: a request still streaming on it keeps its own reference
+            evicted, _ = cache.popitem(last=False)
+            _http.pop(evicted, None)
+            _count(kind, "evicted")
+        return client
+
+def groq(api_key):
+    """Sync Groq client for api_key (hinaM.py, postMaker.py, mediaHandler.py); rate-limit headers of
+    every response are recorded against the key (keypool.TrackedGroq)"""
+    def create():
+        from groq import Groq
+        http = _http_client("groq")
+        _http[("groq", api_key)] = http
+        return Groq(api_key=api_key, http_client=http, timeout=_timeout())
+
+    def track(client):
+        import keypool
+        return keypool.TrackedGroq(client, api_key)
+    return _get("groq", api_key, create, track)
+
+def async_groq(api_key, user=False):
+    """AsyncGroq client for api_key (hina.py); one per key so user-supplied tokens keep their own pool.
+    user=True for a user-supplied key: kept in the bounded LRU instead of for the process lifetime"""
+    def create():
+        from groq import AsyncGroq
+        http = _http_client("async_groq", asynchronous=True)
+        _http[("async_groq", api_key)] = http
+        return AsyncGroq(api_key=api_key, http_client=http, timeout=_timeout())
+    return _get("async_groq", api_key, create, user=user)
+
+def supabase(url=None, key=None):
+    url = url or os.getenv('SUPABASE_URL')
+    key = key or os.getenv('SUPABASE_KEY')
+
+    def create():
+        if not url or not key:
+            raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY")
+        from supabase import create_client
+        from supabase.lib.client_options import SyncClientOptions
+        http = _http_client("supabase")
+        _http[("supabase", url)] = http
+        return create_client(url, key, options=SyncClientOptions(httpx_client=http, postgrest_client_timeout=_timeout()))
+    return _get("supabase", url, create)
+
+_mongo_counts = {"connections_created": 0, "connections_closed": 0, "checkouts": 0}
+
+def _mongo_listener():
+    from pymongo.monitoring import ConnectionPoolListener
+
+    # pymongo reports connection pool events; counted here for pool_stats()
+    class PoolListener(ConnectionPoolListener):
+        def connection_created(self, event):
+            _mongo_counts["connections_created"] += 1
+
+        def connection_closed(self, event):
+            _mongo_counts["connections_closed"] += 1
+
+        def connection_checked_out(self, event):
+            _mongo_counts["checkouts"] += 1
+
+        def pool_created(self, event): pass
+        def pool_ready(self, event): pass
+        def pool_cleared(self, event): pass
+        def pool_closed(self, event): pass
+        def connection_ready(self, event): pass
+        def connection_check_out_started(self, event): pass
+        def connection_check_out_failed(self, event): pass
+        def connection_checked_in(self, event): pass
+
+    return PoolListener()
+
+def mongo(uri=None):
+    uri = uri or os.getenv('MONGO_URI')
+
+    def create():
+        from pymongo import MongoClient
+        return MongoClient(
+            uri,
+            maxPoolSize=MONGO_POOL_SIZE,
+            connectTimeoutMS=int(CONNECT_TIMEOUT * 1000),
+            serverSelectionTimeoutMS=int(CONNECT_TIMEOUT * 1000),
+            socketTimeoutMS=int(READ_TIMEOUT * 1000),
+            event_listeners=[_mongo_listener()],
+        )
+    return _get("mongo", uri, create)
+
+def _http_pool(http):
+    # httpx keeps its connection pool on the transport; private API, so every field is best effort
+    pool = getattr(getattr(http, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return {}
+    return {
+        "open": len(connections),
+        "idle": sum(1 for c in connections if c.is_idle()),
+        "http2": sum(1 for c in connections if getattr(c, "_connection", None) is not None and "HTTP2" in type(c._connection).__name__),
+    }
+
+def pool_stats():
+    """Per backend: clients created, lookups served by an existing client, HTTP requests, pool state"""
+    with _lock:
+        stats = {kind: dict(entry) for kind, entry in _stats.items()}
+        for (kind, _), http in _http.items():
+            pool = _http_pool(http)
+            entry = stats.setdefault(kind, {"created": 0, "reused": 0, "requests": 0})
+            for field, value in pool.items():
+                entry[field] = entry.get(field, 0) + value
+        if "mongo" in stats:
+            stats["mongo"].update(_mongo_counts)
+    return stats
+
+def _drop(kind):
+    for cache in (_clients, _user_clients):
+        for cache_key in [k for k in cache if k[0] == kind]:
+            del cache[cache_key]
+
+def override(kind, factory):
+    """Use factory(key) instead of building a real client (benchmarks); drops cached clients of that kind"""
+    with _lock:
+        _overrides[kind] = factory
+        _drop(kind)
+
+def wrap(kind, wrapper):
+    """Route every client of kind through wrapper(key, client) (the scheduler's budget); drops cached clients"""
+    with _lock:
+        _wrappers[kind] = wrapper
+        _drop(kind)
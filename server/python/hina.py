@@ -1,15 +1,26 @@
 # hina.py
+#
+# Character chat backend. Two ways to run it:
+#   python3 hina.py            -> one-shot: read one JSON request from stdin, stream SSE frames to stdout
+#   python3 hina.py --worker   -> long-lived worker: read newline-delimited {"id", "payload"} requests
+#                                 from stdin and stream {"id", "frame"} lines back, many chats at once
 import sys
 import json
 import os
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from groq import Groq
-import difflib
 import uuid
-from supabase import create_client, Client
 import logging
-import time  # Added for slowing down stream
+import time
+from pacing import StreamPacer
+from selector import NoModelAvailable
+from store import KVStore
+import retrieval
+from metrics import RequestMetrics
+import prompt
+import clients
+import keypool
 
 # Suppress unnecessary logs to avoid stderr output
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,68 +32,12 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# ModelSelector class for dynamic model selection
-class ModelSelector:
-    def __init__(self, models):
-        self.models = models
-        self.current_index = 0
-        # Initialize model status with all models assumed available
-        self.model_status = {model: {"available": True} for model in models}
-    
-    def is_model_available(self, model):
-        # Placeholder for real API usage checks (e.g., rate limits, token limits)
-        return self.model_status.get(model, {}).get("available", False)
-    
-    def mark_model_unavailable(self, model):
-        self.model_status[model]["available"] = False
-    
-    def get_next_model(self):
-        # Find the next available model
-        while self.current_index < len(self.models):
-            model = self.models[self.current_index]
-            if self.is_model_available(model):
-                return model
-            else:
-                self.current_index += 1
-        return None  # No models available
-    
-    def use_model(self):
-        model = self.get_next_model()
-        if not model:
-            raise Exception("No models available at the moment.")
-        
-        try:
-            # Placeholder for actual API call
-            print(f"Trying model: {model}")  # Print model being tried
-            success = self.simulate_api_call(model)
-            if not success:
-                logger.warning(f"Model {model} limit hit, switching...")
-                self.mark_model_unavailable(model)
-                self.current_index += 1
-                return self.use_model()  # Try next model recursively
-            print(f"Model {model} selected for response")  # Print successful model
-            return model  # Success
-        except Exception as e:
-            logger.warning(f"Error with model {model}: {e}, switching...")
-            self.mark_model_unavailable(model)
-            self.current_index += 1
-            return self.use_model()
-    
-    def simulate_api_call(self, model):
-        # Dummy simulation: fail models with "mini" or "scout" to test fallback
-        if "mini" in model or "scout" in model:
-            return False
-        return True
-
 # List of models with priority (balanced usage: prefer smaller/faster models first to reduce costs)
 models = [
     "gemma2-9b-it",                     # Balanced and efficient, top pick for startups
-    "meta-llama/llama-guard-4-12b",    # Strong throughput, versatile
     "llama3-70b-8192",                  # Large model for complex tasks, use sparingly
     "llama3-8b-8192",                   # Reliable fallback, strong daily limits
     "llama-3.1-8b-instant",             # Fast for quick responses
-    "meta-llama/llama-prompt-guard-2-22m",  # Lightweight prompt guard, good throughput
-    "meta-llama/llama-prompt-guard-2-86m",  # Slightly larger prompt guard variant
     "qwen/qwen3-32b",                   # High requests/min, balanced model
     "moonshotai/kimi-k2-instruct",     # High request rate, good for responsive tasks
     "allam-2-7b",                      # Medium sized, decent daily limits
@@ -96,8 +51,24 @@ models = [
     "mistral-saba-24b"                 # Specialized, place according to your use case
 ]
 
-# Initialize ModelSelector
-model_selector = ModelSelector(models)
+# Keys come from pools (keypool.py): several per purpose, each with its own selector state, since
+# Groq rate limits are per key. A user's own key gets a pool of its own and never trips ours.
+def get_pools(token):
+    """(chat pool, summary pool) for a request"""
+    if token:
+        user = keypool.user_pool(token, models)
+        return user, user
+    return keypool.pool("chat", models), keypool.pool("summary", models)
+
+# How many different models one call may try before giving up
+MAX_MODEL_TRIES = int(os.getenv('HINA_MAX_MODEL_TRIES', '4'))
+
+# Max chats a single worker process handles at once
+WORKER_CONCURRENCY = int(os.getenv('HINA_WORKER_CONCURRENCY', '64'))
+
+# Raised when a request cannot be served (bad input, missing env)
+class RequestError(Exception):
+    pass
 
 # Function to read and parse input from stdin
 def read_input():
@@ -116,47 +87,202 @@ def read_input():
         print(json.dumps({"error": str(e)}), file=sys.stderr)
         sys.exit(1)
 
-# Extract data from input
-data = read_input()
-user_msg = data.get('user')
-user_id = data.get('userid')
-user_name = data.get('user_name', 'Anonymous')
-char_data = data.get('char', {})
-token = data.get('token', False)
-
-char_id = char_data.get('id', '')
-char_name = char_data.get('name', '')
-char_background = char_data.get('background', 'A refined novelist crafting tales with elegance.')
-char_behavior = char_data.get('behavior', 'Observant, charming, subtly playful.')
-char_firstline = char_data.get('firstline', "*She peeks over her book, eyes gleaming* What are you doing?")
-char_tags = char_data.get('tags', ['novelist', 'elegant', 'curious'])
-char_relationships = char_data.get('relationships', f'Sees {user_name} as a fascinating partner.')
-
-# Function to get API keys with fallback to env
-def get_api_key(env_var, token_fallback):
-    return token_fallback if token_fallback else os.getenv(env_var)
-
-charapi = get_api_key('charapi', token)
-sumapi = get_api_key('sumapi', token)
-supabase_url = os.getenv('SUPABASE_URL')
-supabase_key = os.getenv('SUPABASE_KEY')
-
-# Validate required environment variables
-required_envs = [charapi, sumapi, supabase_url, supabase_key]
-if not all(required_envs):
-    logger.error("Missing required environment variables")
-    print(json.dumps({"error": "Missing env variables"}), file=sys.stderr)
-    sys.exit(1)
-
-# Initialize clients
-supabase_client: Client = create_client(supabase_url, supabase_key)
-sum_client = Groq(api_key=sumapi)
-char_client = Groq(api_key=charapi)
+# Clients come from the shared registry (clients.py): created once, on pooled keep-alive connections
+def get_supabase():
+    try:
+        return clients.supabase()
+    except ValueError:
+        raise RequestError("Missing env variables")
+
+def get_groq(api_key, user=False):
+    # One client per key, so user-supplied tokens keep their own connection pool (bounded LRU for those)
+    return clients.async_groq(api_key, user=user)
+
+# Rough token estimate (~4 chars per token) used to reserve tokens-per-minute headroom
+def estimate_tokens(messages, max_tokens=0):
+    return sum(prompt.count_tokens(m["content"]) for m in messages) + max_tokens
+
+# Non-streaming completion on the fastest model with headroom (on the key with the most), falling back on errors
+async def complete(pool, messages, metrics, purpose, **params):
+    est = estimate_tokens(messages, params.get("max_tokens", 0))
+    tried = []
+    for _ in range(MAX_MODEL_TRIES):
+        lease = await asyncio.to_thread(pool.acquire, est, tried)
+        tried.append(lease)
+        model = lease.model
+        attempt = metrics.attempt(model, purpose)
+        try:
+            raw = await get_groq(lease.key, pool.purpose == "user").chat.completions.with_raw_response.create(model=model, messages=messages, **params)
+            completion = await raw.parse()
+        except Exception as e:
+            logger.warning(f"Model {model} failed: {e}")
+            metrics.finish_attempt(attempt, "error", e)
+            await asyncio.to_thread(pool.record_failure, lease, e)
+            continue
+        metrics.finish_attempt(attempt, "ok")
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            metrics.tokens[purpose] = {"prompt": usage.prompt_tokens, "completion": usage.completion_tokens}
+        # No ttft: a whole non-streamed completion would skew the TTFT that ranks chat models and
+        # sets the hedge delay (chat and summary share selector state when they share a key)
+        await asyncio.to_thread(
+            pool.record_success, lease, None, raw.headers,
+            getattr(usage, "total_tokens", None), est
+        )
+        return model, completion
+    raise NoModelAvailable(f"All tried models failed: {', '.join(lease.model for lease in tried)}")
+
+# Hedged streaming: if the first token has not arrived after a delay, race a second model
+HEDGE_ENABLED = os.getenv('HINA_HEDGE', '0') == '1'
+HEDGE_DELAY_MS = os.getenv('HINA_HEDGE_DELAY_MS')  # Fixed delay; adaptive from recent TTFTs when unset
+HEDGE_FACTOR = float(os.getenv('HINA_HEDGE_FACTOR', '2.0'))
+HEDGE_MIN_MS = 150
+HEDGE_MAX_MS = 3000
+MAX_HEDGES = int(os.getenv('HINA_MAX_HEDGES', '1'))
+
+async def hedge_delay(pool, model):
+    if HEDGE_DELAY_MS:
+        return float(HEDGE_DELAY_MS) / 1000
+    # Selector state is a SQLite read behind the store lock: keep it off the event loop
+    delay_ms = await asyncio.to_thread(pool.expected_ttft, model) * 1000 * HEDGE_FACTOR
+    return min(max(delay_ms, HEDGE_MIN_MS), HEDGE_MAX_MS) / 1000
+
+# Start one streamed completion and wait for its first content delta
+async def first_delta(client, model, messages, params):
+    start = time.monotonic()
+    raw = await client.chat.completions.with_raw_response.create(model=model, messages=messages, stream=True, **params)
+    response = await raw.parse()
+    stream = response.__aiter__()
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                return chunk.choices[0].delta.content, stream, response, raw.headers, time.monotonic() - start
+    except BaseException:
+        await close_response(response)
+        raise
+    return "", stream, response, raw.headers, time.monotonic() - start
+
+async def close_response(response):
+    try:
+        await response.close()
+    except Exception:
+        pass
+
+# Open a streamed completion on the best model; time-to-first-token feeds the selector.
+# metrics.hedges counts extra requests sent because the first token was late.
+# `messages` may be a function of the model, so each attempt gets a prompt fitted to its budget.
+async def open_stream(pool, messages, metrics, **params):
+    build = messages if callable(messages) else (lambda model: messages)
+    est = estimate_tokens(build(None), params.get("max_tokens", 0))
+    tried = []  # leases: (key, model) picks so far
+    owners = {}  # task -> lease
+    attempts = {}  # task -> metrics attempt entry
+    pending = set()
+    delays = {}  # model -> hedge delay, looked up once per request
+    can_hedge = HEDGE_ENABLED
+
+    async def launch():
+        lease = await asyncio.to_thread(pool.acquire, est, tried)
+        tried.append(lease)
+        task = asyncio.create_task(first_delta(get_groq(lease.key, pool.purpose == "user"), lease.model, build(lease.model), params))
+        owners[task] = lease
+        attempts[task] = metrics.attempt(lease.model, "chat")
+        pending.add(task)
+        return time.monotonic()
+
+    try:
+        started = await launch()
+        while pending:
+            timeout = None
+            if can_hedge and len(pending) == 1 and metrics.hedges < MAX_HEDGES and len(tried) < MAX_MODEL_TRIES:
+                primary = owners[next(iter(pending))].model
+                if primary not in delays:
+                    delays[primary] = await hedge_delay(pool, primary)
+                timeout = max(0.0, delays[primary] - (time.monotonic() - started))
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # First token is late: race the next healthy model against it
+                try:
+                    await launch()
+                    metrics.hedges += 1
+                    logger.info(f"Hedging {primary} with {tried[-1].model}")
+                except NoModelAvailable:
+                    can_hedge = False
+                continue
+
+            winner = None
+            for task in done:
+                pending.discard(task)
+                lease = owners[task]
+                if task.exception() is not None:
+                    logger.warning(f"Model {lease.model} failed: {task.exception()}")
+                    metrics.finish_attempt(attempts[task], "error", task.exception())
+                    await asyncio.to_thread(pool.record_failure, lease, task.exception())
+                elif winner is None:
+                    winner = (lease, task.result())
+                    metrics.finish_attempt(attempts[task], "ok")
+                else:
+                    metrics.finish_attempt(attempts[task], "cancelled")
+                    await close_response(task.result()[2])  # Finished at the same time; keep only one
+            if winner:
+                lease, (first, stream, response, headers, ttft) = winner
+                await asyncio.to_thread(pool.record_success, lease, ttft, headers)
+                metrics.ttft_ms = round(ttft * 1000, 2)
+                return lease.model, first, stream
+            if not pending:
+                if len(tried) >= MAX_MODEL_TRIES:
+                    break
+                started = await launch()  # Sequential fallback after a failure
+    finally:
+        # Cancel the losing request(s)
+        for task in pending:
+            metrics.finish_attempt(attempts[task], "cancelled")
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    raise NoModelAvailable(f"All tried models failed: {', '.join(lease.model for lease in tried)}")
+
+# Writes SSE frames to stdout; in worker mode every frame is wrapped with its request id
+class FrameWriter:
+    def __init__(self, writer, request_id=None):
+        self.writer = writer
+        self.request_id = request_id
+
+    def send(self, frame):
+        if self.request_id is None:
+            self.writer.write(frame.encode())
+        else:
+            self.writer.write((json.dumps({"id": self.request_id, "frame": frame}) + "\n").encode())
+
+    def done(self, code=0):
+        if self.request_id is not None:
+            self.writer.write((json.dumps({"id": self.request_id, "done": True, "code": code}) + "\n").encode())
+
+    async def drain(self):
+        await self.writer.drain()
+
+# Fallback writer when stdout is a regular file or terminal instead of a pipe
+class _BlockingStdout:
+    def write(self, data):
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+    async def drain(self):
+        pass
+
+async def open_stdout():
+    loop = asyncio.get_running_loop()
+    try:
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+        return asyncio.StreamWriter(transport, protocol, None, loop)
+    except (ValueError, OSError):
+        return _BlockingStdout()
 
 # Function to get chat history
 def get_history(user_id, char_id, limit=200):
     try:
-        response = supabase_client.table("history") \
+        response = get_supabase().table("history") \
             .select("*") \
             .eq("user_id", user_id) \
             .eq("char_id", char_id) \
@@ -168,50 +294,80 @@ def get_history(user_id, char_id, limit=200):
         logger.error(f"Error fetching history: {e}")
         return []
 
-# Function to save message to history and manage history limit
-def save_history(user_id, char_id, sender, message, his_limit=200):
+# History rows are pruned back to his_limit every PRUNE_EVERY saved turns instead of on every write
+PRUNE_EVERY = int(os.getenv('HINA_PRUNE_EVERY', '10'))
+prune_counter = KVStore('prune', max_entries=50000)
+
+# Background jobs (pruning, ...) that one-shot mode must finish before exiting
+_background = set()
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+def make_entry(user_id, char_id, sender, message):
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "char_id": char_id,
+        "sender": sender,
+        "message": message,
+        "chat_id": str(uuid.uuid4()),  # Unique per message for fine-grained deletion
+        "timestamp": datetime.now().isoformat()
+    }
+
+# Save both sides of a turn in one insert; returns the new rows (newest first) or [] on failure
+def save_turn(user_id, char_id, user_msg, reply):
+    rows = [make_entry(user_id, char_id, "user", user_msg)]
+    rows.append(make_entry(user_id, char_id, "ai", reply))
+    if rows[1]["timestamp"] <= rows[0]["timestamp"]:
+        # Keep the AI row strictly after the user row so ordering by timestamp is stable
+        rows[1]["timestamp"] = (datetime.fromisoformat(rows[0]["timestamp"]) + timedelta(microseconds=1)).isoformat()
     try:
-        entry = {
-            "id": str(uuid.uuid4()),
-            "user_id": user_id,
-            "char_id": char_id,
-            "sender": sender,
-            "message": message,
-            "chat_id": str(uuid.uuid4()),  # Unique per message for fine-grained deletion
-            "timestamp": datetime.now().isoformat()
-        }
-        supabase_client.table("history").insert(entry).execute()
+        get_supabase().table("history").insert(rows).execute()
+    except Exception as e:
+        logger.error(f"Error saving history: {e}")
+        return []
+    return rows[::-1]
 
-        # Prune old history to control storage and costs
-        history = supabase_client.table("history").select("chat_id") \
+# Delete everything older than the oldest row we keep (one DELETE by timestamp, no id scan)
+def prune_history(user_id, char_id, cutoff):
+    try:
+        get_supabase().table("history").delete() \
             .eq("user_id", user_id).eq("char_id", char_id) \
-            .order("timestamp", desc=True).execute().data
-        unique_chat_ids = [h["chat_id"] for h in history]  # Already unique
-        if len(unique_chat_ids) > his_limit:
-            to_delete = unique_chat_ids[his_limit:]
-            supabase_client.table("history").delete().in_("chat_id", to_delete).execute()
-            logger.info(f"Pruned {len(to_delete)} old history entries")
+            .lt("timestamp", cutoff).execute()
+        logger.info(f"Pruned history for {user_id}:{char_id} older than {cutoff}")
     except Exception as e:
-        logger.error(f"Error saving/pruning history: {e}")
+        logger.error(f"Error pruning history: {e}")
+
+async def maybe_prune(user_id, char_id, history, his_limit):
+    # history is the in-memory post-save view, newest first, possibly longer than his_limit
+    if len(history) <= his_limit:
+        return
+    writes = await asyncio.to_thread(prune_counter.incr, f"{user_id}:{char_id}")
+    if writes % PRUNE_EVERY == 0:
+        await asyncio.to_thread(prune_history, user_id, char_id, history[his_limit - 1]["timestamp"])
+
+# Rolling memory summaries, cached per (user_id, char_id) with a watermark of the newest message covered
+SUMMARY_EVERY = int(os.getenv('HINA_SUMMARY_EVERY', '6'))  # Regenerate after this many new messages
+SUMMARY_TTL = int(os.getenv('HINA_SUMMARY_TTL', '1800'))  # ...or when the cached summary is older than this (seconds)
+summary_store = KVStore('summary', max_entries=50000)
 
 # Improved summarize function with better prompt engineering for scenarios, emotions, character
-def summarize_chats(history, user_name, char_name):
+async def summarize_chats(history, user_name, char_name, char_behavior, sum_pool, metrics, previous=None):
     if not history:
         return "*No memories formed yet.*"
 
-    recent_chats = history[:10]  # Limit to last 10 to avoid token overusage
-    chat_text = "\n".join([f"{chat['sender']}: {chat['message'][:200]}" for chat in recent_chats[-5:]])  # Truncate long messages
-    scenarios = set()
-    emotions = set()
-    for chat in recent_chats:
-        if "**" in chat['message']:
-            parts = chat['message'].split("**")
-            if len(parts) > 1:
-                scenarios.add(parts[1].strip())
-        if "*" in chat['message']:
-            parts = chat['message'].split("*")
-            if len(parts) > 1:
-                emotions.add(parts[1].strip())
+    if previous:
+        # Incremental: fold only the messages since the last summary into it
+        recent_chats = history[:20]
+        chat_text = "\n".join([f"{chat['sender']}: {chat['message'][:200]}" for chat in reversed(recent_chats)])
+        chat_text = f"Previous summary:\n{previous}\n\nNew messages:\n{chat_text}"
+    else:
+        recent_chats = history[:10]  # Limit to last 10 to avoid token overusage
+        chat_text = "\n".join([f"{chat['sender']}: {chat['message'][:200]}" for chat in recent_chats[-5:]])  # Truncate long messages
 
     prompt = (
         f"As {char_name}, summarize key emotional interactions, scenarios, and character moments with {user_name} from recent messages.\n"
@@ -221,113 +377,286 @@ def summarize_chats(history, user_name, char_name):
         f"**Key Memories**: [Bullet points of important events, 3-5 max].\n"
         f"Guidelines: Third person, use *italics* for emphasis on emotions, keep under 150 words, infer scenarios if not explicit, make it heartfelt and character-aligned."
     )
+    if previous:
+        prompt += "\nUpdate the previous summary with the new messages; keep older key memories that still matter."
 
     # Use ModelSelector for summaries
     try:
-        model = model_selector.use_model()
-        print(f"Summary model selected: {model}")  # Print selected model for summary
-        out = sum_client.chat.completions.create(
-            model=model,
-            messages=[
+        model, completion = await complete(
+            sum_pool, [
                 {"role": "system", "content": prompt},
                 {"role": "user", "content": chat_text}
             ],
+            metrics,
+            "summary",
             temperature=0.5,
             max_tokens=200
         )
-        summary = out.choices[0].message.content.strip()
+        summary = completion.choices[0].message.content.strip()
         return summary
     except Exception as e:
-        logger.warning(f"Model {model} failed for summary: {e}")
-        return "*Summary unavailable.*"
-
-# Function to filter relevant history (optimized query)
-def filter_history(user_id, char_id, query):
-    query_keywords = {
-        "what i love": ["love", "adore", "enjoy", "passion"],
-        "what i eat": ["eat", "food", "meal", "dish"],
-        "what's my fav": ["favorite", "fav", "like best"],
-        "remember that day": query.lower().replace("remember that day", "").strip().split(),
-        "wife": ["wife", "partner", "love", "protect"]
-    }
-    terms = next((v for k, v in query_keywords.items() if k in query.lower()), [query.strip()])
-    or_conditions = " or ".join([f"message.ilike.%{term}%" for term in terms])
-    try:
-        return supabase_client.table("history") \
-            .select("*") \
-            .eq("user_id", user_id) \
-            .eq("char_id", char_id) \
-            .or_(or_conditions) \
-            .order("timestamp", desc=True) \
-            .limit(3) \
-            .execute().data
-    except Exception as e:
-        logger.error(f"Error filtering history: {e}")
-        return []
+        logger.warning(f"Summary failed: {e}")
+        return None
+
+# Where records from background jobs go; worker mode sends them to Node as {"metrics": ...} lines
+def log_metrics(record):
+    logger.info(f"metrics {json.dumps(record)}")
 
-# Main logic
-his_limit = data.get('hisLimit', 200)
-history = get_history(user_id, char_id, his_limit)
-memories = summarize_chats(history, user_name, char_name)
+metrics_sink = log_metrics
 
-# Print memories to backend console for debugging
-logger.info(f"Generated Memories for user {user_id} and char {char_id}: {memories}")
+# Pairs with a summary refresh already running in this process
+_refreshing = set()
 
-# Get relevant memories if query matches triggers
-trigger_queries = ["remember that day", "what i love", "what i eat", "what's my fav", "wife"]
-if any(q in user_msg.lower() for q in trigger_queries):
-    relevant_memories = [m["message"] for m in filter_history(user_id, char_id, user_msg)]
-else:
-    recent_msgs = [m["message"] for m in history[:10]]
-    relevant_memories = difflib.get_close_matches(user_msg, recent_msgs, n=3, cutoff=0.3)
+def summary_is_stale(cached, history):
+    watermark = cached.get("watermark") if cached else None
+    new_msgs = [m for m in history if watermark is None or m["timestamp"] > watermark]  # history is newest first
+    if not cached:
+        return bool(history), new_msgs
+    age = time.time() - cached.get("updated", 0)
+    stale = len(new_msgs) >= SUMMARY_EVERY or (age >= SUMMARY_TTL and bool(new_msgs))
+    return stale, new_msgs
 
-# Improved system prompt with better engineering: separate scenario first, emotions/thinking in * *, dialogue normal
-system_prompt = f"""
-You are {char_name}, a literary soul weaving emotional moments with {user_name}.
+# Memories for the prompt: the last cached summary, never an LLM call on the critical path
+def current_memories(cached, history):
+    if not history:
+        return "*No memories formed yet.*"
+    if cached:
+        return cached["summary"]
+    # First turns before any summary exists: the latest lines stand in for it
+    return " / ".join(f"{m['sender']}: {m['message'][:120]}" for m in reversed(history[:4]))
 
-**Background**: {char_background}
-**Behavior**: {char_behavior}
-**Relationship**: {char_relationships}
-**Tags**: {', '.join(char_tags)}
-**Opening**: {char_firstline}
+# Rebuild the summary from the previous one plus the delta and store it for the next turn
+async def refresh_summary(user_id, char_id, history, cached, new_msgs, user_name, char_name, char_behavior, sum_pool):
+    key = f"{user_id}:{char_id}"
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+    metrics = RequestMetrics("summary_refresh")
+    try:
+        summary = await metrics.timed("summary", summarize_chats(
+            new_msgs if cached else history, user_name, char_name, char_behavior, sum_pool, metrics,
+            previous=cached["summary"] if cached else None
+        ))
+        if summary is None:
+            return
+        await asyncio.to_thread(summary_store.set, key, {
+            "summary": summary,
+            "watermark": history[0]["timestamp"],
+            "updated": time.time()
+        })
+        logger.info(f"Refreshed memories for user {user_id} and char {char_id}: {summary}")
+    finally:
+        _refreshing.discard(key)
+        metrics_sink(metrics.record())
 
-**Memories**: {memories}
-**Relevant Chats**: {'; '.join(relevant_memories) if relevant_memories else 'No specific chats remembered.'}
+def turn_metadata(memories, new_rows, history):
+    # history is newest first and already includes new_rows
+    return {
+        "memories": memories,
+        "rows": new_rows,
+        "version": history[0]["timestamp"] if history else None,
+        "before": new_rows[-1]["timestamp"] if new_rows else None,
+    }
 
+# Style rules closing every character prompt
+STYLE_INSTRUCTIONS = """
 Always start with a separate scenario description in *italics* for actions, thoughts, emotions, and happenings (e.g., *I sit on the couch, feeling sad seeing him, he is my friend so I decide to approach him*).
 Then, follow with normal dialogue or responses without markup.
-Craft a heartfelt reply (80-120 words). Stay in character, use vivid emotions and proper scenarios.
-"""
-
-# Generate response with ModelSelector
-reply = None
-try:
-    model = model_selector.use_model()
-    print(f"Response model selected: {model}")  # Print selected model for response
-    out = char_client.chat.completions.create(
-        model=model,
-        messages=[
+Craft a heartfelt reply (80-120 words). Stay in character, use vivid emotions and proper scenarios."""
+
+# Handle one chat request end to end, writing SSE frames to `out`
+async def handle_chat(data, out):
+    # Extract data from input
+    user_msg = data.get('user')
+    user_id = data.get('userid')
+    user_name = data.get('user_name', 'Anonymous')
+    char_data = data.get('char', {})
+    token = data.get('token', False)
+
+    char_id = char_data.get('id', '')
+    char_name = char_data.get('name', '')
+    char_behavior = char_data.get('behavior', 'Observant, charming, subtly playful.')
+
+    if not user_msg:
+        raise RequestError("Missing user message")
+
+    char_pool, sum_pool = get_pools(token)
+
+    # Validate required environment variables
+    if not char_pool.keys or not sum_pool.keys:
+        raise RequestError("Missing env variables")
+
+    metrics = RequestMetrics("chat")
+
+    # Main logic: independent fetches run concurrently
+    his_limit = data.get('hisLimit', 200)
+    history, cached_summary = await asyncio.gather(
+        metrics.timed("history_fetch", asyncio.to_thread(get_history, user_id, char_id, his_limit)),
+        metrics.timed("summary_lookup", asyncio.to_thread(summary_store.get, f"{user_id}:{char_id}"))
+    )
+    metrics.db_call("history.select")
+
+    # Reply with the last cached summary; a refreshed one is built off the critical path for the next turn
+    memories = current_memories(cached_summary, history)
+    stale, new_msgs = summary_is_stale(cached_summary, history)
+    if stale:
+        spawn_background(refresh_summary(
+            user_id, char_id, history, cached_summary, new_msgs,
+            user_name, char_name, char_behavior, sum_pool
+        ))
+
+    # Relevant memories from the BM25 index over the full retained history
+    with metrics.stage("retrieval"):
+        relevant_memories = retrieval.get_index(user_id, char_id, history, his_limit).search(user_msg, k=3)
+
+    # System prompt filled by section priority within each model's token budget:
+    # persona and style rules always, then memories, then as many relevant chats as fit
+    persona = prompt.persona_section(char_data, user_name)  # Pre-rendered per character
+    max_tokens = 200
+    reports = {}
+
+    def build_messages(model):
+        builder = prompt.PromptBuilder(prompt.budget_for(model, max_tokens, prompt.count_tokens(user_msg)))
+        builder.add("persona", persona, priority=0, required=True)
+        builder.add("memories", f"**Memories**: {memories}", priority=2)
+        builder.add_items("relevant_chats", "**Relevant Chats**: ", relevant_memories, priority=3,
+                          empty="No specific chats remembered.")
+        builder.add("instructions", STYLE_INSTRUCTIONS, priority=1, required=True)
+        system_prompt, reports[model] = builder.build()
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_msg}
-        ],
-        temperature=0.7,
-        max_tokens=200,
-        top_p=0.9,
-        stream=True
-    )
-    reply = ""
-    for chunk in out:
-        if chunk.choices[0].delta.content is not None:
-            delta = chunk.choices[0].delta.content
-            print(f"data: {json.dumps(delta)}\n\n", flush=True)
-            reply += delta
-            time.sleep(0.1)  # Slow down streaming by 100ms per token chunk
-    # Save history after full reply is collected
-    save_history(user_id, char_id, "user", user_msg, his_limit)
-    save_history(user_id, char_id, "ai", reply, his_limit)
-    history = get_history(user_id, char_id, his_limit)
-    # Send metadata
-    print(f"event: metadata\ndata: {json.dumps({'memories': memories, 'history': history})}\n\n", flush=True)
-except Exception as e:
-    logger.warning(f"Model {model} failed: {e}")
-    print(f"event: error\ndata: {json.dumps({'error': 'No model succeeded'})}\n\n", flush=True)
\ No newline at end of file
+        ]
+
+    # Generate response with ModelSelector
+    reply = None
+    try:
+        model, first, stream = await metrics.timed("ttft", open_stream(
+            char_pool, build_messages, metrics,
+            temperature=0.7,
+            max_tokens=max_tokens,
+            top_p=0.9
+        ))
+        metrics.tokens["prompt_sections"] = reports.get(model)
+        reply = first
+        usage = None
+        with metrics.stage("stream"):
+            pacer = StreamPacer(out)
+            try:
+                await pacer.push(first)
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content is not None:
+                        delta = chunk.choices[0].delta.content
+                        await pacer.push(delta)  # Coalesced into frames by size/time window
+                        reply += delta
+                    x_groq = getattr(chunk, "x_groq", None)
+                    usage = getattr(x_groq, "usage", None) or usage  # Groq reports usage on the last chunk
+            finally:
+                # Also on a broken stream or a cancel: deltas still buffered go out instead of vanishing
+                await pacer.close()
+        metrics.tokens["chat"] = {
+            "prompt": usage.prompt_tokens if usage else reports[model]["total"] + prompt.count_tokens(user_msg),
+            "completion": usage.completion_tokens if usage else pacer.deltas,
+            "estimated": usage is None,
+            "frames": pacer.frames,
+        }
+        # Save history after full reply is collected; the post-save view is built from rows already in memory
+        new_rows = await metrics.timed("history_write", asyncio.to_thread(save_turn, user_id, char_id, user_msg, reply))
+        metrics.db_call("history.insert")
+        history = new_rows + history
+        retrieval.add_rows(user_id, char_id, new_rows)
+        spawn_background(maybe_prune(user_id, char_id, history, his_limit))
+        # Metadata carries only this turn's rows: `version` is the newest timestamp, `before` the cursor
+        # for paging older rows through GET /history?before=..., so per-turn bytes stay constant
+        out.send(f"event: metadata\ndata: {json.dumps(turn_metadata(memories, new_rows, history))}\n\n")
+    except Exception as e:
+        logger.warning(f"Response failed: {e}")
+        out.send(f"event: error\ndata: {json.dumps({'error': 'No model succeeded'})}\n\n")
+    # One machine-readable record per request; Node keeps it away from the browser
+    record = metrics.record()
+    record["pools"] = clients.pool_stats()
+    out.send(f"event: metrics\ndata: {json.dumps(record)}\n\n")
+    await out.drain()
+
+# One-shot mode: a single request on stdin, raw SSE on stdout
+async def run_once(data):
+    out = FrameWriter(await open_stdout())
+    try:
+        await handle_chat(data, out)
+    except RequestError as e:
+        logger.error(f"Request error: {e}")
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        return 1
+    finally:
+        if _background:
+            await asyncio.gather(*_background, return_exceptions=True)
+    return 0
+
+# Worker mode: serve framed requests until stdin closes
+async def serve_request(message, writer, limiter, tasks):
+    request_id = message.get("id")
+    out = FrameWriter(writer, request_id)
+    code = 0
+    try:
+        # Inside the try: a cancel while still queued for a slot must clean up too
+        async with limiter:
+            await handle_chat(message.get("payload") or {}, out)
+    except RequestError as e:
+        out.send(f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n")
+        code = 1
+    except asyncio.CancelledError:
+        code = 1
+    except Exception as e:
+        logger.error(f"Request {request_id} crashed: {e}")
+        out.send(f"event: error\ndata: {json.dumps({'error': 'Worker error'})}\n\n")
+        code = 1
+    finally:
+        tasks.pop(request_id, None)
+    out.done(code)
+    await out.drain()
+
+async def run_worker():
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=2 ** 22)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    writer = await open_stdout()
+
+    # Background job records travel on the same pipe without a request id
+    global metrics_sink
+    metrics_sink = lambda record: writer.write((json.dumps({"metrics": record}) + "\n").encode())
+    limiter = asyncio.Semaphore(WORKER_CONCURRENCY)
+    tasks = {}
+
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.error(f"Worker got bad frame: {e}")
+            continue
+        request_id = message.get("id")
+        if message.get("cancel"):
+            # Client went away; stop generating for it
+            task = tasks.get(request_id)
+            if task:
+                task.cancel()
+            continue
+        tasks[request_id] = asyncio.create_task(serve_request(message, writer, limiter, tasks))
+
+    # stdin closed: let in-flight chats and background jobs finish before exiting
+    if tasks:
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+    if _background:
+        await asyncio.gather(*_background, return_exceptions=True)
+
+def main():
+    if "--worker" in sys.argv[1:]:
+        asyncio.run(run_worker())
+        return
+    data = read_input()
+    sys.exit(asyncio.run(run_once(data)))
+
+if __name__ == "__main__":
+    main()
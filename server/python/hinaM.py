@@ -3,21 +3,41 @@ import json
 import asyncio
 import os
 import re
-from groq import Groq
+import hashlib
 from dotenv import load_dotenv
+from hina_intent import fast_path, stats as intent_stats
+from store import KVStore
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv('postAPI')
-if not api_key:
-    print(json.dumps({"execute": None, "answer": "Error: postAPI environment variable not set"}), file=sys.stderr)
-    sys.exit(1)
 
-try:
-    client = Groq(api_key=api_key)
-except Exception as e:
-    print(json.dumps({"execute": None, "answer": f"Error initializing Groq client: {str(e)}"}), file=sys.stderr)
-    sys.exit(1)
+ANSWER_TTL = int(os.getenv('HINA_ANSWER_TTL', str(24 * 3600)))
+ANSWER_MAX = int(os.getenv('HINA_ANSWER_MAX', '2000'))
+CHAT_MODEL = "gemma2-9b-it"
+DEFAULT_MEMO = "no memories yet"  # What routes/hina.js sends when the user has none
+USER_TOKEN = "{{user}}"
+HIDDEN = "not shared"  # Profile fields in the prompt of answers shared across users
+
+answer_cache = KVStore('hina_answers', ttl=ANSWER_TTL, max_entries=ANSWER_MAX)
+answer_stats = KVStore('hina_answer_stats')
+
+# Queries that refer to the user's own data or past chats are never shared between users
+PERSONAL_WORDS = {"my", "mine", "myself", "am", "remember", "follower", "followers", "email", "bio", "profile", "account", "memory", "memories"}
+FILLER_WORDS = {"hina", "hey", "hi", "hello", "please", "pls", "plz", "ok", "okay", "so", "um", "uh"}
+
+# Groq client on the posts-pool key with the most headroom for the model, created on first use so
+# intent fast-path answers never pay for it
+def get_client(model):
+    import keypool  # Deferred so fast-path and cached answers never import groq
+    import clients
+    if not keypool.keys_for('posts'):
+        print(json.dumps({"execute": None, "answer": "Error: postAPI (or GROQ_KEYS_POSTS) environment variable not set"}), file=sys.stderr)
+        sys.exit(1)
+    try:
+        return clients.groq(keypool.pool('posts').key_for(model))
+    except Exception as e:
+        print(json.dumps({"execute": None, "answer": f"Error initializing Groq client: {str(e)}"}), file=sys.stderr)
+        sys.exit(1)
 
 # Generate Hina prompt
 def hina_prompt(user_name, followers, email, bio, memo):
@@ -51,28 +71,83 @@ Instructions:
 - Ensure `answer` is never empty.
 """
 
-# Async wrapper for Groq chat
+# Shared answers are generated without the asker's profile: the name is a placeholder filled in per
+# user, and followers/email/bio are hidden, so nothing personal can end up in the cache
+def shared_prompt():
+    return hina_prompt(USER_TOKEN, HIDDEN, HIDDEN, HIDDEN, DEFAULT_MEMO)
+
+# Function to hash the prompt shared answers come from, so template edits invalidate cached answers
+def template_hash():
+    return hashlib.sha256(shared_prompt().encode()).hexdigest()[:16]
+
+# Function to normalize a query for cache lookups
+def normalize_query(query):
+    words = re.sub(r"[^a-z0-9 ]+", " ", (query or "").lower()).split()
+    return " ".join(w for w in words if w not in FILLER_WORDS)
+
+# Function to decide whether an answer can be shared across users
+def is_cacheable(query, memo):
+    if memo and memo.strip().lower() != DEFAULT_MEMO:
+        return False
+    words = set(normalize_query(query).split())
+    return bool(words) and not (words & PERSONAL_WORDS)
+
+def cache_key(query):
+    return f"{template_hash()}:{normalize_query(query)}"
+
+# Function to look up a cached answer and personalize it for this user
+def cached_answer(query, user_name):
+    entry = answer_cache.get(cache_key(query))
+    if entry is None:
+        answer_stats.incr("misses")
+        return None
+    answer_stats.incr("hits")
+    return {
+        "execute": entry["execute"],
+        "answer": entry["answer"].replace(USER_TOKEN, user_name),
+        "source": "cache",
+    }
+
+# Function to store an answer generated from shared_prompt(); it only ever names the user as USER_TOKEN
+def store_answer(query, obj):
+    answer_cache.set(cache_key(query), {"execute": obj.get("execute"), "answer": obj["answer"]})
+
+def cache_stats():
+    hits = answer_stats.get("hits", 0)
+    misses = answer_stats.get("misses", 0)
+    total = hits + misses
+    return {
+        "ttl": ANSWER_TTL,
+        "max_entries": ANSWER_MAX,
+        "hits": hits,
+        "misses": misses,
+        "bypassed": answer_stats.get("bypassed", 0),
+        "hit_rate": round(hits / total, 3) if total else 0.0,
+    }
+
+# Async wrapper for Groq chat; returns (text, ok)
 async def run_chat(query, prompt):
     messages = [
         {"role": "system", "content": prompt},
         {"role": "user", "content": query}
     ]
     loop = asyncio.get_running_loop()
+    client = get_client(CHAT_MODEL)
     try:
         completion = await loop.run_in_executor(
             None,
             lambda: client.chat.completions.create(
                 messages=messages,
-                model="gemma2-9b-it",
+                model=CHAT_MODEL,
                 temperature=0.8,
                 max_completion_tokens=1024,
                 top_p=1,
                 stream=False
             )
         )
-        return completion.choices[0].message.content
+        return completion.choices[0].message.content, True
     except Exception as e:
-        return json.dumps({"execute": None, "answer": f"AI unavailable: {str(e)}"})
+        return json.dumps({"execute": None, "answer": f"AI unavailable: {str(e)}"}), False
 
 # Clean AI answer for frontend
 def clean_answer(text):
@@ -97,6 +172,10 @@ def parse_ai_response(result):
     return obj
 
 def main():
+    if sys.argv[1:] == ["--stats"]:
+        print(json.dumps({"intent": intent_stats(), "cache": cache_stats()}))
+        return
+
     try:
         input_data = json.loads(sys.stdin.read())
     except Exception as e:
@@ -110,11 +189,32 @@ def main():
     query = input_data.get("query", "")
     memo = input_data.get("memo", "")
 
-    prompt = hina_prompt(user_name, followers, email, bio, memo)
+    # Clear navigation requests ("take me home") are answered locally
+    final_obj = fast_path(query, user_name)
+    if final_obj:
+        print(json.dumps(final_obj))
+        return
+
+    # FAQ-style questions are shared across users unless the memo or query is personal
+    cacheable = is_cacheable(query, memo)
+    if cacheable:
+        final_obj = cached_answer(query, user_name)
+        if final_obj:
+            print(json.dumps(final_obj))
+            return
+    else:
+        answer_stats.incr("bypassed")
+
+    prompt = shared_prompt() if cacheable else hina_prompt(user_name, followers, email, bio, memo)
     chat_query = f"{query} + Past memory: {memo}"
 
-    result = asyncio.run(run_chat(chat_query, prompt))
+    result, ok = asyncio.run(run_chat(chat_query, prompt))
     final_obj = parse_ai_response(result)
+    final_obj["source"] = "llm"
+    if cacheable:
+        if ok and not final_obj["answer"].startswith("Error parsing AI response"):
+            store_answer(query, final_obj)
+        final_obj["answer"] = final_obj["answer"].replace(USER_TOKEN, user_name)
 
     if not final_obj.get("answer"):
         final_obj = {"execute": None, "answer": "Hello! How can I help you today?"}
@@ -0,0 +1,109 @@
+# hina_intent.py
+#
+# Local fast path for Hina's navigation commands. The five pages in hina_prompt (home, post,
+# dis, make, notify) are a closed set, so clear requests like "take me home" are matched here
+# with keyword/synonym tables and a small scorer, and answered without an LLM call.
+# Anything open-ended or below the confidence threshold goes to the model as before.
+#
+#   python3 hina_intent.py --stats      -> threshold and hit/miss counters
+#   python3 hina_intent.py "open feed"  -> classification of one query
+import os
+import re
+import sys
+import json
+from store import KVStore
+
+THRESHOLD = float(os.getenv('HINA_INTENT_THRESHOLD', '0.6'))
+
+# command -> phrases that name the page (longer phrases score higher)
+INTENTS = {
+    "home": ["home", "homepage", "home page", "feed", "feeds", "main page", "timeline", "posts feed"],
+    "post": ["post", "new post", "create post", "create a post", "write post", "write a post", "make a post", "publish", "share a post"],
+    "dis": ["discover", "discovery", "explore", "find characters", "find new characters", "browse characters", "search characters"],
+    "make": ["make", "make character", "make a character", "create character", "create a character", "new character", "build a character", "character maker"],
+    "notify": ["notification", "notifications", "notify", "alerts", "inbox", "my notifications"],
+}
+
+# Words that say "move me somewhere"
+NAV_VERBS = ["take me", "go to", "go", "open", "show", "show me", "navigate", "bring me", "switch to", "visit", "redirect", "head to", "jump to"]
+# Words that usually mean the user wants an explanation, not a page change
+QUESTION_WORDS = ["how", "what", "why", "when", "who", "explain", "tell me about", "difference", "help me understand", "?"]
+# "show me how to make a post" names a page and a verb but asks for instructions
+HOW_TO = ["how", "how to", "how do", "how can", "what does", "what is", "explain"]
+# "I dont want to go home" names a page and a verb but says the opposite
+NEGATIONS = ["not", "dont", "don t", "do not", "never", "cant", "can t", "cannot", "wont", "won t", "stop", "without"]
+
+ANSWERS = {
+    "home": "Sure {name}! Taking you to your home feed.",
+    "post": "Sure {name}! Opening the post page so you can share something.",
+    "dis": "Sure {name}! Let's discover some new characters.",
+    "make": "Sure {name}! Opening the character maker.",
+    "notify": "Sure {name}! Here are your notifications.",
+}
+
+_stats = KVStore('hina_intent')
+
+def _normalize(text):
+    return " " + re.sub(r"[^a-z0-9?]+", " ", (text or "").lower()).strip() + " "
+
+def _has(text, phrase):
+    return f" {phrase} " in text or (phrase == "?" and "?" in text)
+
+def classify(query):
+    """Returns (command or None, confidence 0..1)"""
+    text = _normalize(query)
+    words = len(text.split())
+    if not words:
+        return None, 0.0
+
+    scores = {}
+    for command, phrases in INTENTS.items():
+        best = max((len(p.split()) for p in phrases if _has(text, p)), default=0)
+        if best:
+            scores[command] = 0.5 + 0.15 * (best - 1)
+    if not scores:
+        return None, 0.0
+
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    command, score = ranked[0]
+    if any(_has(text, v) for v in NAV_VERBS):
+        score += 0.3
+    if any(_has(text, h) for h in HOW_TO):
+        score -= 0.6  # Enough to sink even a long phrase with a nav verb below the threshold
+    elif any(_has(text, q) for q in QUESTION_WORDS):
+        score -= 0.4
+    if any(_has(text, n) for n in NEGATIONS):
+        score -= 0.6
+    if len(ranked) > 1 and ranked[1][1] >= ranked[0][1]:
+        score -= 0.3  # Two pages named equally strongly
+    if words > 8:
+        score -= 0.05 * (words - 8)  # Long messages are rarely plain navigation
+    return command, max(0.0, min(1.0, score))
+
+def fast_path(query, user_name="User", threshold=THRESHOLD):
+    """Canned {"execute", "answer"} for a clear navigation request, else None (and counts the outcome)"""
+    command, confidence = classify(query)
+    if command and confidence >= threshold:
+        _stats.incr("hits")
+        return {
+            "execute": command,
+            "answer": ANSWERS[command].format(name=user_name),
+            "source": "intent",
+            "confidence": round(confidence, 2),
+        }
+    _stats.incr("misses")
+    return None
+
+def stats():
+    hits = _stats.get("hits", 0)
+    misses = _stats.get("misses", 0)
+    total = hits + misses
+    return {"threshold": THRESHOLD, "hits": hits, "misses": misses, "hit_rate": round(hits / total, 3) if total else 0.0}
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--stats"]:
+        print(json.dumps(stats()))
+    else:
+        query = " ".join(sys.argv[1:])
+        command, confidence = classify(query)
+        print(json.dumps({"query": query, "execute": command, "confidence": round(confidence, 2), "threshold": THRESHOLD}))
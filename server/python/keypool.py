@@ -0,0 +1,166 @@
+# keypool.py
+#
+# Several Groq keys per purpose (chat, summary, posts, vision) instead of one. Each key keeps its own
+# ModelSelector state (per-model request/token buckets re-synced from x-ratelimit-* headers, circuit
+# breakers), so a pool picks the fastest model any key has headroom for, on the key with the most
+# headroom left for it. A key that is rejected, or rate limited on every model it has been used
+# with, is parked until its reset time. A user's own key is never pooled: it gets a pool of its
+# own, so their quota serves only them and ours never serves them.
+#
+# Keys come from comma-separated GROQ_KEYS_CHAT / _SUMMARY / _POSTS / _VISION, plus the single-key
+# variables the scripts always used (charapi, sumapi, postAPI).
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from selector import ModelSelector, NoModelAvailable, key_name, parse_reset
+from store import KVStore
+
+logger = logging.getLogger(__name__)
+
+PURPOSE_ENV = {
+    "chat": ("GROQ_KEYS_CHAT", "charapi"),
+    "summary": ("GROQ_KEYS_SUMMARY", "sumapi"),
+    "posts": ("GROQ_KEYS_POSTS", "postAPI"),
+    "vision": ("GROQ_KEYS_VISION", "postAPI"),
+}
+AUTH_PARK = float(os.getenv('GROQ_KEY_AUTH_PARK', '3600'))   # Seconds a rejected key stays out
+QUOTA_PARK = float(os.getenv('GROQ_KEY_QUOTA_PARK', '60'))   # When a 429 carries no retry-after
+USER_POOLS_MAX = int(os.getenv('GROQ_USER_POOLS_MAX', '256'))  # User-key pools kept per process (LRU)
+
+parked = KVStore('keypool_parked')  # key name -> epoch seconds it may be used again
+selector_store = KVStore('selector')
+
+def keys_for(purpose):
+    """Pool keys for a purpose, in configuration order, without duplicates"""
+    list_env, single_env = PURPOSE_ENV[purpose]
+    keys = [k.strip() for k in os.getenv(list_env, '').split(',') if k.strip()]
+    single = os.getenv(single_env)
+    if single:
+        keys.append(single)
+    return list(dict.fromkeys(keys))
+
+def is_parked(api_key, now=None):
+    now = time.time() if now is None else now
+    return parked.get(key_name(api_key), 0) > now
+
+def park_on_error(api_key, selector, error):
+    """Park a key that was rejected (401/403) or is rate limited on everything it was used with"""
+    status = getattr(error, "status_code", None)
+    park_for = None
+    if status in (401, 403):
+        park_for = AUTH_PARK
+    elif status == 429 and selector.exhausted():
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        park_for = parse_reset(headers.get("retry-after") if headers is not None else None) or QUOTA_PARK
+    if park_for:
+        parked.set(selector.name, time.time() + park_for, ttl=park_for)
+        logger.warning(f"Key {selector.name[:8]} parked for {park_for:.0f}s ({status})")
+
+class Lease:
+    """One (key, model) pick; handed back to record_success / record_failure"""
+    def __init__(self, key, model, selector):
+        self.key = key
+        self.model = model
+        self.selector = selector
+        self.rate_limited = False
+
+class KeyPool:
+    def __init__(self, keys, models, purpose="chat"):
+        self.keys = list(keys)
+        self.models = models
+        self.purpose = purpose
+        self.selectors = {key: ModelSelector(models, name=key_name(key), store=selector_store) for key in self.keys}
+
+    def acquire(self, est_tokens=0, exclude=(), reserve=0.0):
+        """Fastest model some key has headroom for, on the key with the most headroom; reserves it.
+        exclude holds earlier leases: a rate-limited one rules out that key for its model, any other
+        failure rules out the model on every key."""
+        now = time.time()
+        explore = ModelSelector.explore()  # One decision for every key, so the ranking stays comparable
+        pairs = {(lease.key, lease.model) for lease in exclude}
+        bad_models = {lease.model for lease in exclude if not lease.rate_limited}
+        candidates = []
+        speed = {}  # model -> best score on any key: models are ranked by speed, keys by headroom
+        for key in self.keys:
+            if is_parked(key, now):
+                continue
+            for score, headroom, model in self.selectors[key].candidates(est_tokens, bad_models, reserve, explore):
+                if (key, model) not in pairs:
+                    candidates.append((headroom, key, model))
+                    speed[model] = min(score, speed.get(model, score))
+        # Another process may drain a pick between ranking and reserving: fall through to the next one
+        for _, key, model in sorted(candidates, key=lambda c: (speed[c[2]], -c[0])):
+            selector = self.selectors[key]
+            try:
+                selector.acquire(est_tokens, exclude=[m for m in self.models if m != model], reserve=reserve)
+            except NoModelAvailable:
+                continue
+            return Lease(key, model, selector)
+        raise NoModelAvailable(f"No {self.purpose} key has headroom at the moment.")
+
+    def record_success(self, lease, ttft=None, headers=None, used_tokens=None, est_tokens=0):
+        lease.selector.record_success(lease.model, ttft, headers, used_tokens, est_tokens)
+
+    def record_failure(self, lease, error):
+        lease.selector.record_failure(lease.model, error)
+        lease.rate_limited = getattr(error, "status_code", None) == 429
+        park_on_error(lease.key, lease.selector, error)
+
+    def key_for(self, model):
+        """Key with the most headroom on a fixed model (posts, vision: the scripts pick the model)"""
+        if not self.keys:
+            raise NoModelAvailable(f"No {self.purpose} keys configured.")
+        now = time.time()
+        usable = [key for key in self.keys if not is_parked(key, now)] or self.keys
+        return max(usable, key=lambda key: ModelSelector([model], name=key_name(key), store=selector_store).headroom(model))
+
+    def expected_ttft(self, model):
+        return min((selector.expected_ttft(model) for selector in self.selectors.values()), default=0.5)
+
+class TrackedGroq:
+    """Sync Groq client that feeds every response's x-ratelimit-* headers (and failures) into its
+    key's selector state, so key_for() sees what each key has left"""
+    def __init__(self, client, api_key):
+        self.client = client
+        self.api_key = api_key
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **params):
+        model = params["model"]
+        selector = ModelSelector([model], name=key_name(self.api_key), store=selector_store)
+        try:
+            raw = self.client.chat.completions.with_raw_response.create(**params)
+        except Exception as e:
+            selector.record_failure(model, e)
+            park_on_error(self.api_key, selector, e)
+            raise
+        selector.record_success(model, headers=raw.headers)
+        return raw.parse()
+
+_pools = {}
+_user_pools = OrderedDict()
+_user_lock = threading.Lock()
+
+def pool(purpose, models=()):
+    """Shared pool of our keys for a purpose (one per process)"""
+    cache_key = (purpose, tuple(models))
+    if cache_key not in _pools:
+        _pools[cache_key] = KeyPool(keys_for(purpose), list(models), purpose)
+    return _pools[cache_key]
+
+def user_pool(token, models):
+    """A user's own key: a pool of exactly that key, never mixed with ours. Only the most recently
+    used USER_POOLS_MAX are kept; selector state lives in the store, so a rebuilt pool loses nothing"""
+    cache_key = (key_name(token), tuple(models))
+    with _user_lock:
+        user = _user_pools.get(cache_key)
+        if user is None:
+            user = _user_pools[cache_key] = KeyPool([token], list(models), "user")
+            if len(_user_pools) > USER_POOLS_MAX:
+                _user_pools.popitem(last=False)
+        else:
+            _user_pools.move_to_end(cache_key)
+        return user
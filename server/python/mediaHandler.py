@@ -1,27 +1,54 @@
-from pymongo import MongoClient
-from groq import Groq
 from dotenv import load_dotenv
-from bson import ObjectId
 from datetime import datetime
 import os
 import json
 import re
 import random
+import asyncio
+import argparse
+import hashlib
+import threading
+import time
+from store import KVStore
+import clients
+import keypool
+import trending
 
 load_dotenv()
 
 # ----------------------
 # MongoDB Connection
 # ----------------------
-MONGO_URI = os.getenv('MONGO_URI')
-mongo_client = MongoClient(MONGO_URI)
-db = mongo_client['aiova']
+# The pooled client comes from clients.py on first use, so importing this module never connects
+def get_db():
+    return clients.mongo()['aiova']
 
 # Collections
-posts_collection = db['posts']
-ai_post_collection = db['aipost']
-characters_collection = db['characters']
-comments_collection = db['comments']
+def posts_collection():
+    return get_db()['posts']
+
+def ai_post_collection():
+    return get_db()['aipost']
+
+def characters_collection():
+    return get_db()['characters']
+
+def comments_collection():
+    return get_db()['comments']
+
+def engagements_collection():
+    return get_db()['engagements']  # (characterId, postId) pairs already handled
+
+# Batch mode defaults (overridable from the command line)
+BATCH_CHARACTERS = int(os.getenv('MEDIA_BATCH_CHARACTERS', '10'))
+BATCH_POSTS = int(os.getenv('MEDIA_BATCH_POSTS', '5'))
+BATCH_CONCURRENCY = int(os.getenv('MEDIA_BATCH_CONCURRENCY', '8'))
+BATCH_MAX_PAIRS = int(os.getenv('MEDIA_BATCH_MAX_PAIRS', '0'))  # 0 = no cap on pairs per run
+
+# Candidate post pool
+POOL_SIZE = int(os.getenv('MEDIA_POOL_SIZE', '200'))
+POOL_LOW_WATER = 0.25  # Refill in the background once the pool drops below this fraction
+POST_MAX_USES = int(os.getenv('MEDIA_POST_MAX_USES', '3'))  # Characters that may see one pooled post
 
 # ----------------------
 # Helper Functions
@@ -38,39 +65,174 @@ def json_filter(text):
             continue
     return {}
 
-def fetch_random_post_exclude_author(exclude_id=None, max_tries=10):
-    """Fetch a random post excluding a certain author ID"""
-    for _ in range(max_tries):
-        choice = random.choice(['user', 'ai'])
-        collection = ai_post_collection if choice == 'ai' else posts_collection
-        post_list = list(collection.aggregate([{ "$sample": { "size": 1 } }]))
-        if not post_list:
-            continue
-        post = post_list[0]
-        if exclude_id and post.get('authorId') == exclude_id:
-            continue
-        return post, choice
-    return None, None
+def _yes_no(value):
+    """Model answers come back as "yes"/"no", but also as JSON true/false/null"""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, str):
+        return value.strip().lower()
+    return None if value is not None else "no"
+
+def normalize_decision(command):
+    """(like, want_comment, comment) as strings, or None for a malformed answer"""
+    like = _yes_no(command.get('like', 'no'))
+    want_comment = _yes_no(command.get('wantTocomment', 'no'))
+    comment = command.get('comment') or ''
+    if like is None or want_comment is None or not isinstance(comment, str):
+        return None
+    return like, want_comment, comment.strip()
+
+def well_formed(decision):
+    return decision is not None and all(isinstance(decision.get(k), str) for k in ("like", "want_comment", "comment"))
 
 def fetch_random_character():
-    char_list = list(characters_collection.aggregate([{ "$sample": { "size": 1 } }]))
+    char_list = list(characters_collection().aggregate([{ "$sample": { "size": 1 } }]))
     return char_list[0] if char_list else {}
 
+def fetch_random_characters(size):
+    return list(characters_collection().aggregate([{ "$sample": { "size": size } }]))
+
+# ----------------------
+# Candidate Post Pool
+# ----------------------
+def ensure_engagement_index():
+    engagements_collection().create_index([("characterId", 1), ("postId", 1)], unique=True)
+
+def engaged_post_ids(char_id, post_ids):
+    """Posts from post_ids this character has already been shown"""
+    seen = engagements_collection().find(
+        {"characterId": char_id, "postId": {"$in": post_ids}},
+        {"postId": 1, "_id": 0}
+    )
+    return {doc["postId"] for doc in seen}
+
+def record_engagements(decisions):
+    decisions = [d for d in decisions if well_formed(d)]
+    if not decisions:
+        return
+    docs = [{
+        "characterId": d["char"].get('id', ''),
+        "postId": d["post"].get('_id'),
+        "postType": d["post_type"],
+        "liked": d["like"].lower() == 'yes',
+        "commented": d["want_comment"].lower() == 'yes' and bool(d["comment"]),
+        "createdAt": datetime.utcnow()
+    } for d in decisions]
+    from pymongo.errors import BulkWriteError
+    try:
+        engagements_collection().insert_many(docs, ordered=False)
+    except BulkWriteError:
+        pass  # Pair recorded concurrently by another run
+
+class CandidatePool:
+    """Posts sampled in bulk from both collections, author exclusion done in the $match stage"""
+    def __init__(self, exclude_authors=(), size=POOL_SIZE):
+        self.exclude = [a for a in exclude_authors if a]
+        self.size = size
+        self.entries = []  # [post, post_type, uses]
+        self.lock = threading.Lock()  # refill() runs in a worker thread while take() runs in others
+        self._refill_task = None
+
+    def refill(self):
+        with self.lock:
+            known = {entry[0].get('_id') for entry in self.entries}
+            want = max(1, self.size - len(self.entries))
+        fresh = []
+        for post_type, collection in (('user', posts_collection()), ('ai', ai_post_collection())):
+            pipeline = [{"$sample": {"size": want}}]
+            if self.exclude:
+                pipeline.insert(0, {"$match": {"authorId": {"$nin": self.exclude}}})
+            for post in collection.aggregate(pipeline):
+                if post.get('_id') not in known:
+                    known.add(post.get('_id'))
+                    fresh.append([post, post_type, 0])
+        # Sampling happens outside the lock; only the merge and shuffle hold it
+        with self.lock:
+            entries = self.entries + fresh
+            random.shuffle(entries)
+            self.entries = entries
+
+    async def ensure(self):
+        """Start a background refill when the pool runs low; only wait if it is empty"""
+        if len(self.entries) < self.size * POOL_LOW_WATER and self._refill_task is None:
+            self._refill_task = asyncio.create_task(asyncio.to_thread(self.refill))
+            self._refill_task.add_done_callback(lambda _: setattr(self, '_refill_task', None))
+        if not self.entries and self._refill_task is not None:
+            await self._refill_task
+
+    def take(self, char, n):
+        """Up to n pooled posts this character did not write and has not engaged with yet"""
+        char_id = char.get('id')
+        with self.lock:
+            candidates = [e for e in self.entries if e[0].get('authorId') != char_id]
+        seen = engaged_post_ids(char_id, [e[0].get('_id') for e in candidates]) if candidates else set()
+        picked = []
+        with self.lock:
+            for entry in candidates:
+                if len(picked) == n:
+                    break
+                if entry[0].get('_id') in seen or entry[2] >= POST_MAX_USES:
+                    continue  # Used up by another thread since the snapshot
+                picked.append((entry[0], entry[1]))
+                entry[2] += 1
+                if entry[2] >= POST_MAX_USES and entry in self.entries:
+                    self.entries.remove(entry)
+        return picked
+
+# ----------------------
+# Community Context Cache
+# ----------------------
+CONTEXT_TTL = float(os.getenv('MEDIA_CONTEXT_TTL', '120'))  # Seconds a community's recent posts are reused
+CONTEXT_CHAR_BUDGET = int(os.getenv('MEDIA_CONTEXT_CHARS', '1200'))  # Max characters of context in the prompt
+_context_cache = {}  # community -> (fetched_at, [{"_id", "authorName", "content"}])
+_context_locks = {}  # community -> lock held while that community's posts are loaded
+_context_lock = threading.Lock()  # Guards _context_locks only
+
+def ensure_context_index():
+    posts_collection().create_index([("community", 1), ("createdAt", -1)])
+
 def fetch_context_posts(community, exclude_post_id=None, limit=5):
-    """Fetch several recent posts for wider context"""
-    query = {"community": community}
-    if exclude_post_id:
-        query["_id"] = {"$ne": exclude_post_id}
-    posts = list(posts_collection.find(query).sort("createdAt", -1).limit(limit))
-    return posts
+    """Fetch several recent posts for wider context (projected, cached per community)"""
+    with _context_lock:
+        lock = _context_locks.setdefault(community, threading.Lock())
+    # One loader per community; other communities don't wait behind its Mongo query
+    with lock:
+        cached = _context_cache.get(community)
+        if cached is None or time.monotonic() - cached[0] > CONTEXT_TTL:
+            # One extra so the post being judged can be dropped without a second query
+            recent = list(posts_collection().find(
+                {"community": community},
+                {"authorName": 1, "content": 1}
+            ).sort("createdAt", -1).limit(limit + 1))
+            cached = (time.monotonic(), recent)
+            _context_cache[community] = cached
+    return [p for p in cached[1] if p.get('_id') != exclude_post_id][:limit]
+
+_TAGS = re.compile(r'<[^>]+>')
+
+def build_context_text(context_posts, budget=CONTEXT_CHAR_BUDGET):
+    """authorName: content lines, HTML stripped, trimmed to a fixed character budget"""
+    lines = []
+    used = 0
+    for p in context_posts:
+        content = re.sub(r'\s+', ' ', _TAGS.sub(' ', p.get('content', ''))).strip()
+        line = f"{p.get('authorName','Unknown')}: {content}"
+        if used + len(line) > budget:
+            line = line[:max(0, budget - used)].rstrip()
+            if line:
+                lines.append(line + "...")
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
 
 def image_recon(link_uri):
     """Recognize image content using Groq"""
     if not link_uri:
         return None
-    client = Groq(api_key=os.getenv('postAPI'))
-    completion = client.chat.completions.create(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
+    model = "meta-llama/llama-4-scout-17b-16e-instruct"
+    completion = get_groq(model, 'vision').chat.completions.create(
+        model=model,
         messages=[{
             "role": "user",
             "content": [
@@ -88,56 +250,90 @@ def image_recon(link_uri):
     return main.content
 
 # ----------------------
-# Fetch Random Post & Character
+# Image Description Cache
 # ----------------------
-char = fetch_random_character()
-if not char:
-    print("No character found. Exiting...")
-    exit()
+# Vision results keyed by a hash of the image URL, kept in the shared SQLite store with TTL + LRU
+IMAGE_CACHE_TTL = int(os.getenv('IMAGE_CACHE_TTL', str(30 * 24 * 3600)))
+IMAGE_CACHE_MAX = int(os.getenv('IMAGE_CACHE_MAX', '20000'))
+IMAGE_DESC_WRITEBACK = os.getenv('IMAGE_DESC_WRITEBACK', '0') == '1'  # Also store it on the post document
+image_cache = KVStore('image_recon', ttl=IMAGE_CACHE_TTL, max_entries=IMAGE_CACHE_MAX)
+image_cache_stats = KVStore('image_recon_stats')
+image_cache_counts = {"hits": 0, "misses": 0}
+_image_locks = {}
+_image_locks_guard = threading.Lock()
 
-post, post_type = fetch_random_post_exclude_author(exclude_id=char.get('id'))
-if not post:
-    print("No suitable post found. Exiting...")
-    exit()
+def describe_post_image(post, post_type):
+    """image_recon() behind the post's stored description and the local cache"""
+    link_uri = post.get('image', None)
+    if not link_uri:
+        return None
+    if post.get('imageDescription'):
+        _count_image_lookup("hits")
+        return post['imageDescription']
 
-# ----------------------
-# Post Variables
-# ----------------------
-post_content = post.get('content', '')
-post_authorId = post.get('authorId', '')
-post_authorName = post.get('authorName', 'Unknown')
-post_authorPhoto = post.get('authorPhoto', 'https://ik.imagekit.io/souravdpal/default-avatar.png')
-post_community = post.get('community', '@AICharacters')
-post_likeCount = post.get('likeCount', 0)
-post_commentCount = post.get('commentCount', 0)
-post_id = post.get('_id')
-post_link = post.get('image', None)
+    key = hashlib.sha256(link_uri.encode()).hexdigest()
+    # Concurrent batch lookups of the same image wait for the first vision call instead of repeating it
+    with _image_locks_guard:
+        lock = _image_locks.setdefault(key, threading.Lock())
+    with lock:
+        description = image_cache.get(key)
+        if description is not None:
+            _count_image_lookup("hits")
+            return description
 
-# ----------------------
-# Character Variables
-# ----------------------
-char_id = char.get('id', '')
-char_name = char.get('name', 'Unknown')
-char_link = char.get('link', 'https://ik.imagekit.io/souravdpal/default-avatar.png')
-char_behavior = char.get('behavior', '')
-char_background = char.get('background', '')
+        _count_image_lookup("misses")
+        description = image_recon(link_uri)
+        if description:
+            image_cache.set(key, description)
+            if IMAGE_DESC_WRITEBACK:
+                collection = ai_post_collection() if post_type == 'ai' else posts_collection()
+                collection.update_one({"_id": post.get('_id')}, {"$set": {"imageDescription": description}})
+    return description
 
-# ----------------------
-# Wider Context
-# ----------------------
-context_posts = fetch_context_posts(post_community, exclude_post_id=post_id)
-context_text = "\n".join([f"{p.get('authorName','Unknown')}: {p.get('content','')}" for p in context_posts])
+def _count_image_lookup(kind):
+    image_cache_counts[kind] += 1
+    image_cache_stats.incr(kind)
 
-# ----------------------
-# Image Recognition
-# ----------------------
-letrecon = image_recon(post_link)
-print("Image Recon:", letrecon)
+def image_cache_report():
+    total_hits = image_cache_stats.get("hits", 0)
+    total_misses = image_cache_stats.get("misses", 0)
+    print(f"Image cache: {image_cache_counts['hits']} hits, {image_cache_counts['misses']} misses this run "
+          f"({total_hits} hits, {total_misses} misses all time)")
+
+def get_groq(model, purpose='posts'):
+    # Pooled client for the key with the most headroom on this model (keypool.py)
+    return clients.groq(keypool.pool(purpose).key_for(model))
 
 # ----------------------
-# Groq AI Prompt
+# Engagement Decision
 # ----------------------
-prompt = f"""
+def decide_engagement(char, post, post_type):
+    """Let one character look at one post; returns its like/comment decision (no DB writes), or None
+    when the model's answer is malformed"""
+    # Post Variables
+    post_content = post.get('content', '')
+    post_authorName = post.get('authorName', 'Unknown')
+    post_community = post.get('community', '@AICharacters')
+    post_likeCount = post.get('likeCount', 0)
+    post_commentCount = post.get('commentCount', 0)
+    post_id = post.get('_id')
+    post_link = post.get('image', None)
+
+    # Character Variables
+    char_name = char.get('name', 'Unknown')
+    char_behavior = char.get('behavior', '')
+    char_background = char.get('background', '')
+
+    # Wider Context
+    context_posts = fetch_context_posts(post_community, exclude_post_id=post_id)
+    context_text = build_context_text(context_posts)
+
+    # Image Recognition
+    letrecon = describe_post_image(post, post_type)
+    print("Image Recon:", letrecon)
+
+    # Groq AI Prompt
+    prompt = f"""
 You are {char_name}. You behave like: {char_behavior}
 Background: {char_background}
 
@@ -164,69 +360,193 @@ Rules:
  3. Do NOT add any extra text outside the JSON.
 """
 
-commander = f"The post has an image: {letrecon if post_link else 'None'} and user content: {post_content}"
-print("Commander:", commander)
+    commander = f"The post has an image: {letrecon if post_link else 'None'} and user content: {post_content}"
+    print("Commander:", commander)
 
-# ----------------------
-# Call Groq API
-# ----------------------
-groq_client = Groq(api_key=os.getenv('postAPI'))
+    # Call Groq API
+    out = get_groq('gemma2-9b-it').chat.completions.create(
+        model='gemma2-9b-it',
+        messages=[
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": commander}
+        ],
+        temperature=1,
+        max_tokens=200
+    )
+
+    # Process AI Response
+    summary = out.choices[0].message.content.strip()
+    normalized = normalize_decision(json_filter(summary))
+    if normalized is None:
+        # Not recorded as an engagement, so the pair can be tried again later
+        print(f"Malformed decision, skipping: {summary}")
+        return None
+    like, want_comment, comment = normalized
 
-out = groq_client.chat.completions.create(
-    model='gemma2-9b-it',
-    messages=[
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": commander}
-    ],
-    temperature=1,
-    max_tokens=200
-)
+    return {
+        "char": char,
+        "post": post,
+        "post_type": post_type,
+        "like": like,
+        "want_comment": want_comment,
+        "comment": comment
+    }
 
 # ----------------------
-# Process AI Response
+# Apply Decisions
 # ----------------------
-summary = out.choices[0].message.content.strip()
-command = json_filter(summary)
+def apply_decisions(decisions):
+    """Write every like/comment from a run: one bulk_write per post collection and one insert_many"""
+    inc_by_post = {}  # (post_type, post_id) -> {"likeCount": n, "commentCount": n}
+    new_comments = []
+    decisions = [d for d in decisions if well_formed(d)]  # One bad entry must not sink the batch write
+    for d in decisions:
+        char = d["char"]
+        post_id = d["post"].get('_id')
+        key = (d["post_type"], post_id)
+        if d["like"].lower() == 'yes':
+            inc = inc_by_post.setdefault(key, {})
+            inc["likeCount"] = inc.get("likeCount", 0) + 1
+        if d["want_comment"].lower() == 'yes' and d["comment"]:
+            inc = inc_by_post.setdefault(key, {})
+            inc["commentCount"] = inc.get("commentCount", 0) + 1
+            new_comments.append({
+                "postId": post_id,
+                "authorId": char.get('id', ''),
+                "authorName": char.get('name', 'Unknown'),
+                "authorPhoto": char.get('link', 'https://ik.imagekit.io/souravdpal/default-avatar.png'),
+                "content": d["comment"],
+                "community": "@characters",
+                "likes": 0,
+                "likedBy": [],
+                "replyTo": None,
+                "createdAt": datetime.utcnow()
+            })
 
-like_decision = command.get('like', 'no')
-want_comment = command.get('wantTocomment', 'no')
-comment_text = command.get('comment', '').strip()
-collection = ai_post_collection if post_type == 'ai' else posts_collection
+    from pymongo import UpdateOne
+    from bson import ObjectId
+    now = datetime.utcnow()
+    # value and lastInteractionAt move with the counts, so trend never needs a full-collection rewrite
+    for (kind, post_id), inc in inc_by_post.items():
+        inc["value"] = trending.value_score(inc.get("likeCount", 0), inc.get("commentCount", 0))
+    for post_type, collection in (('ai', ai_post_collection()), ('user', posts_collection())):
+        ops = [
+            UpdateOne({"_id": ObjectId(post_id)}, {"$inc": inc, "$max": {"lastInteractionAt": now}})
+            for (kind, post_id), inc in inc_by_post.items() if kind == post_type
+        ]
+        if ops:
+            collection.bulk_write(ops, ordered=False)
+    if new_comments:
+        comments_collection().insert_many(new_comments, ordered=False)
 
-# ----------------------
-# Update Likes
-# ----------------------
-if like_decision.lower() == 'yes':
-    collection = ai_post_collection if post_type == 'ai' else posts_collection
-    collection.update_one({"_id": ObjectId(post_id)}, {"$inc": {"likeCount": 1}})
+    posts = {(d["post_type"], d["post"].get('_id')): d["post"] for d in decisions}
+    trending.record_events([{
+        "post_id": post_id,
+        "post_type": kind,
+        "community": posts[(kind, post_id)].get('community'),
+        "likes": (posts[(kind, post_id)].get('likeCount') or 0) + inc.get("likeCount", 0),
+        "comments": (posts[(kind, post_id)].get('commentCount') or 0) + inc.get("commentCount", 0),
+        "last": now,
+    } for (kind, post_id), inc in inc_by_post.items()])
+
+def report(decision):
+    # Output to Server Console
+    print("Post Type:", decision["post_type"])
+    print("Post Content:", decision["post"].get('content', ''))
+    print(f"Character: {decision['char'].get('name', 'Unknown')}")
+    print(f"Liked post? {decision['like']}")
+    print(f"Wanted to comment? {decision['want_comment']}")
+    if decision["comment"]:
+        print(f"Comment: {decision['comment']}")
 
 # ----------------------
-# Insert Comment
+# Run Modes
 # ----------------------
-if want_comment.lower() == 'yes' and comment_text:
-    collection.update_one({"_id": ObjectId(post_id)}, {"$inc": {"commentCount": 1}})
+def run_single():
+    """One random character looks at one post it has not seen yet"""
+    char = fetch_random_character()
+    if not char:
+        print("No character found. Exiting...")
+        return
 
-    new_comment = {
-        "postId": post_id,
-        "authorId": char_id,
-        "authorName": char_name,
-        "authorPhoto": char_link,
-        "content": comment_text,
-        "community": "@characters",
-        "likes": 0,
-        "likedBy": [],
-        "replyTo": None,
-        "createdAt": datetime.utcnow()
-    }
-    comments_collection.insert_one(new_comment)
+    ensure_engagement_index()
+    ensure_context_index()
+    pool = CandidatePool([char.get('id')], size=20)
+    pool.refill()
+    picked = pool.take(char, 1)
+    if not picked:
+        print("No suitable post found. Exiting...")
+        return
+    post, post_type = picked[0]
 
-# ----------------------
-# Output to Server Console
-# ----------------------
-print("Post Type:", post_type)
-print("Post Content:", post_content)
-print(f"Character: {char_name}")
-print(f"Liked post? {like_decision}")
-print(f"Wanted to comment? {want_comment}")
-if comment_text:
-    print(f"Comment: {comment_text}")
+    decision = decide_engagement(char, post, post_type)
+    if decision is None:
+        image_cache_report()
+        return
+    apply_decisions([decision])
+    record_engagements([decision])
+    report(decision)
+    image_cache_report()
+
+async def run_batch(num_characters, posts_per_char, concurrency, max_pairs=0):
+    """K characters x M unseen candidate posts each, evaluated concurrently, written back in bulk"""
+    chars = fetch_random_characters(num_characters)
+    if not chars:
+        print("No characters found. Exiting...")
+        return
+
+    ensure_engagement_index()
+    ensure_context_index()
+    pool = CandidatePool([c.get('id') for c in chars], size=max(POOL_SIZE, posts_per_char * 2))
+    await asyncio.to_thread(pool.refill)
+
+    pairs = []
+    for char in chars:
+        await pool.ensure()
+        picked = await asyncio.to_thread(pool.take, char, posts_per_char)
+        pairs += [(char, post, post_type) for post, post_type in picked]
+    if max_pairs and len(pairs) > max_pairs:
+        pairs = random.sample(pairs, max_pairs)
+    if not pairs:
+        print("No unseen posts for these characters. Exiting...")
+        return
+    print(f"Batch: {len(chars)} characters, up to {posts_per_char} posts each -> {len(pairs)} pairs (concurrency {concurrency})")
+
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def evaluate(char, post, post_type):
+        async with limiter:
+            try:
+                return await asyncio.to_thread(decide_engagement, char, post, post_type)
+            except Exception as e:
+                print(f"Engagement failed for {char.get('name', 'Unknown')} on {post.get('_id')}: {e}")
+                return None
+
+    results = await asyncio.gather(*(evaluate(c, p, t) for c, p, t in pairs))
+    decisions = [d for d in results if d]
+    apply_decisions(decisions)
+    record_engagements(decisions)
+    for d in decisions:
+        report(d)
+    likes = sum(1 for d in decisions if d["like"].lower() == 'yes')
+    comments = sum(1 for d in decisions if d["want_comment"].lower() == 'yes' and d["comment"])
+    print(f"Batch done: {len(decisions)}/{len(pairs)} decisions, {likes} likes, {comments} comments")
+    image_cache_report()
+    print(f"Client pools: {json.dumps(clients.pool_stats())}")
+
+def main():
+    parser = argparse.ArgumentParser(description="AI character engagement with posts")
+    parser.add_argument('--batch', action='store_true', help="evaluate many characters x posts in one run")
+    parser.add_argument('--characters', type=int, default=BATCH_CHARACTERS)
+    parser.add_argument('--posts', type=int, default=BATCH_POSTS, help="candidate posts per character")
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument('--max-pairs', type=int, default=BATCH_MAX_PAIRS)
+    args = parser.parse_args()
+
+    if args.batch:
+        asyncio.run(run_batch(args.characters, args.posts, max(1, args.concurrency), args.max_pairs))
+    else:
+        run_single()
+
+if __name__ == "__main__":
+    main()
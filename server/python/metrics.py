@@ -0,0 +1,79 @@
+# metrics.py
+#
+# One structured record per request (or background job) instead of status lines mixed into the
+# SSE stream. A record carries stage timings, every model attempt with its outcome, the chosen
+# model, time to first token, token counts, retries, hedges and DB round trips. hina.py sends the
+# chat record as an `event: metrics` frame, which routes/routeai.js keeps away from the browser.
+import time
+from collections import Counter
+
+class RequestMetrics:
+    def __init__(self, kind="chat"):
+        self.kind = kind
+        self.started = time.monotonic()
+        self.stages = {}          # stage -> ms (summed when a stage runs more than once)
+        self.attempts = []        # {"model", "purpose", "outcome", "ms"}
+        self.chosen = {}          # purpose -> model that answered
+        self.ttft_ms = None
+        self.tokens = {}
+        self.hedges = 0
+        self.db = Counter()       # "table.op" -> round trips
+
+    def add_stage(self, name, ms):
+        self.stages[name] = round(self.stages.get(name, 0) + ms, 2)
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    async def timed(self, name, awaitable):
+        start = time.monotonic()
+        try:
+            return await awaitable
+        finally:
+            self.add_stage(name, (time.monotonic() - start) * 1000)
+
+    def attempt(self, model, purpose):
+        entry = {"model": model, "purpose": purpose, "outcome": "pending", "started": time.monotonic()}
+        self.attempts.append(entry)
+        return entry
+
+    def finish_attempt(self, entry, outcome, error=None):
+        entry["outcome"] = outcome
+        entry["ms"] = round((time.monotonic() - entry.pop("started")) * 1000, 2)
+        if error is not None:
+            entry["status"] = getattr(error, "status_code", None) or type(error).__name__
+        if outcome == "ok":
+            self.chosen[entry["purpose"]] = entry["model"]
+
+    def db_call(self, op, count=1):
+        self.db[op] += count
+
+    def record(self):
+        failed = [a for a in self.attempts if a["outcome"] == "error"]
+        for entry in self.attempts:
+            if "started" in entry:  # Still in flight (cancelled with the request)
+                self.finish_attempt(entry, "cancelled")
+        return {
+            "kind": self.kind,
+            "total_ms": round((time.monotonic() - self.started) * 1000, 2),
+            "stages": self.stages,
+            "models": {"chosen": self.chosen, "attempts": self.attempts},
+            "ttft_ms": self.ttft_ms,
+            "tokens": self.tokens,
+            "retries": len(failed),
+            "hedges": self.hedges,
+            "db_round_trips": dict(self.db),
+        }
+
+class _Stage:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_stage(self.name, (time.monotonic() - self.start) * 1000)
+        return False
@@ -0,0 +1,73 @@
+# pacing.py
+#
+# Output pacing for streamed replies. Tokens are forwarded as soon as they arrive, but small
+# deltas are coalesced into one SSE `data:` frame until either FLUSH_BYTES are buffered or the
+# FLUSH_MS window has passed. When the downstream pipe is slow (drain() takes longer than the
+# window) the window widens so fewer, larger frames are written; it shrinks back once writes are fast.
+import os
+import json
+import time
+import asyncio
+
+FLUSH_BYTES = int(os.getenv('HINA_FLUSH_BYTES', '48'))
+FLUSH_MS = float(os.getenv('HINA_FLUSH_MS', '40'))
+MAX_FLUSH_MS = float(os.getenv('HINA_MAX_FLUSH_MS', '400'))
+
+class StreamPacer:
+    def __init__(self, out, flush_bytes=FLUSH_BYTES, flush_ms=FLUSH_MS, max_flush_ms=MAX_FLUSH_MS):
+        self.out = out  # FrameWriter-like: send(frame) + async drain()
+        self.flush_bytes = flush_bytes
+        self.base_ms = flush_ms
+        self.window_ms = flush_ms
+        self.max_ms = max(max_flush_ms, flush_ms)
+        self.buffer = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+        self.frames = 0
+        self.deltas = 0
+        self._lock = asyncio.Lock()
+        self._timer = None
+
+    async def push(self, delta):
+        if not delta:
+            return
+        self.buffer.append(delta)
+        self.size += len(delta.encode())
+        self.deltas += 1
+        elapsed_ms = (time.monotonic() - self.last_flush) * 1000
+        # First token goes out immediately to keep time-to-first-token low
+        if self.frames == 0 or self.size >= self.flush_bytes or elapsed_ms >= self.window_ms:
+            await self.flush()
+        elif self._timer is None:
+            # Make sure a lone small delta is not held back past the window
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later((self.window_ms - elapsed_ms) / 1000, self._flush_soon)
+
+    def _flush_soon(self):
+        self._timer = None
+        asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self.buffer:
+                return
+            text = "".join(self.buffer)
+            self.buffer = []
+            self.size = 0
+            self.out.send(f"data: {json.dumps(text)}\n\n")
+            self.frames += 1
+            start = time.monotonic()
+            await self.out.drain()  # Backpressure: wait while the pipe is full
+            drain_ms = (time.monotonic() - start) * 1000
+            self.last_flush = time.monotonic()
+            # Adapt the coalescing window to how fast downstream is consuming frames
+            if drain_ms > self.window_ms:
+                self.window_ms = min(self.window_ms * 2, self.max_ms)
+            else:
+                self.window_ms = max(self.base_ms, self.window_ms * 0.75)
+
+    async def close(self):
+        await self.flush()
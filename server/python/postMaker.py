@@ -1,23 +1,42 @@
 import sys
 import json
-from groq import Groq
 from dotenv import load_dotenv
-import emoji
-import os 
+import os
+import re
+import asyncio
+import hashlib
+import time
+import threading
+from store import KVStore
+import clients
+import keypool
 
 # Load environment variables
 load_dotenv()
-post_api = os.getenv('postAPI')
-if not post_api:
-    print(json.dumps({'error': 'Missing postAPI environment variable'}), file=sys.stderr)
-    sys.exit(1)
+
+# Batch mode: characters generated at once per process
+BATCH_CONCURRENCY = int(os.getenv('POST_BATCH_CONCURRENCY', '6'))
+
+def get_client(model):
+    # Pooled Groq client for the posts key with the most headroom on this model (keypool.py)
+    return clients.groq(keypool.pool('posts').key_for(model))
+
+_emoji = None
+
+def emojize(text):
+    # The emoji package builds its whole alias table on import; only load it when a post is made
+    global _emoji
+    if _emoji is None:
+        import emoji
+        _emoji = emoji
+    return _emoji.emojize(text)
 
 def web_search_context(input_data):
     """Perform a web search to gather real-time context for the post."""
-    name = emoji.emojize(input_data.get('name', 'Unknown'))
-    behavior = emoji.emojize(input_data.get('behavior', ''))
-    background = emoji.emojize(input_data.get('background', ''))
-    tags = [emoji.emojize(tag) for tag in input_data.get('tags', [])]
+    name = emojize(input_data.get('name', 'Unknown'))
+    behavior = emojize(input_data.get('behavior', ''))
+    background = emojize(input_data.get('background', ''))
+    tags = [emojize(tag) for tag in input_data.get('tags', [])]
 
     search_prompt = f"""
 Given the following character details:
@@ -30,10 +49,9 @@ Generate a relevant, concise search query to find real-time trends, events, or s
 """
     
     try:
-        client = Groq(api_key=post_api)
         model = "compound-beta-mini"
         try:
-            response = client.chat.completions.create(
+            response = get_client(model).chat.completions.create(
                 model=model,
                 messages=[{"role": "user", "content": search_prompt}],
                 temperature=0.7,
@@ -43,7 +61,7 @@ Generate a relevant, concise search query to find real-time trends, events, or s
         except Exception as e:
             if "rate limit" in str(e).lower():
                 model = "compound-beta"
-                response = client.chat.completions.create(
+                response = get_client(model).chat.completions.create(
                     model=model,
                     messages=[{"role": "user", "content": search_prompt}],
                     temperature=0.7,
@@ -58,11 +76,11 @@ Generate a relevant, concise search query to find real-time trends, events, or s
         # Simulate web search results (in practice, this would call a search API)
         search_results_prompt = f"""
 Based on the search query: '{search_query}'
-Provide a brief summary (50-80 words) of real-time trends, events, or sentiments relevant to the query. The summary should reflect current happenings that would resonate with {name}'s persona. Include 1-2 specific questions {name} might ask to engage their audience, inspired by these trends. Format the response as:
+Provide a brief summary (50-80 words) of real-time trends, events, or sentiments relevant to the query. The summary should reflect current happenings that would resonate with {name}'s persona, but do not mention {name} by name so it can be reused for similar characters. Include 1-2 specific questions {name} might ask to engage their audience, inspired by these trends. Format the response as:
 - **Context**: [Summary of trends/events]
 - **Questions**: [1-2 engaging questions]
 """
-        response = client.chat.completions.create(
+        response = get_client(model).chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": search_results_prompt}],
             temperature=0.7,
@@ -74,19 +92,72 @@ Provide a brief summary (50-80 words) of real-time trends, events, or sentiments
         print(json.dumps({'error': f'Web search failed: {str(e)}'}), file=sys.stderr)
         return None
 
+# Trend context is shared by characters with the same tag cluster and persona signature
+TREND_CONTEXT_TTL = int(os.getenv('TREND_CONTEXT_TTL', str(6 * 3600)))
+TREND_CONTEXT_MAX_USES = int(os.getenv('TREND_CONTEXT_MAX_USES', '25'))
+trend_cache = KVStore('trend_context', ttl=TREND_CONTEXT_TTL, max_entries=5000)
+_trend_locks = {}  # signature -> lock held while its context is regenerated (batch mode runs threads)
+_trend_locks_lock = threading.Lock()
+
+_WORD = re.compile(r"[a-z0-9]+")
+_PERSONA_STOPWORDS = {"a", "an", "the", "and", "or", "of", "to", "in", "with", "is", "who", "for", "on", "very", "but"}
+
+def normalize_tags(tags):
+    if isinstance(tags, str):
+        tags = re.split(r"[\s,]+", tags)
+    return sorted({t.strip().lstrip('@#').lower() for t in tags if t and t.strip().lstrip('@#')})
+
+def context_signature(input_data):
+    """Cache key: normalized tags + the first few behavior keywords"""
+    tags = normalize_tags(input_data.get('tags', []))
+    words = [w for w in _WORD.findall(input_data.get('behavior', '').lower()) if w not in _PERSONA_STOPWORDS]
+    persona = sorted(set(words[:8]))[:5]
+    raw = "|".join([",".join(tags), ",".join(persona)])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def get_trend_context(input_data):
+    """Cached web_search_context(): regenerate when the entry is past its TTL or used too often"""
+    key = context_signature(input_data)
+
+    def take(entry):
+        # update() pushes the store's own expiry forward on every hit, so the age counts from "created"
+        fresh = entry and time.time() - entry.get("created", 0) < TREND_CONTEXT_TTL
+        if fresh and entry.get("uses", 0) < TREND_CONTEXT_MAX_USES:
+            entry["uses"] = entry.get("uses", 0) + 1
+            return entry, entry["context"]
+        return entry, None
+
+    def cached():
+        return trend_cache.update(key, take) if trend_cache.get(key) is not None else None
+
+    context = cached()
+    if context:
+        return context
+    with _trend_locks_lock:
+        lock = _trend_locks.setdefault(key, threading.Lock())
+    # Characters of one signature that miss together wait for a single search instead of each running one
+    with lock:
+        context = cached()
+        if context:
+            return context
+        context = web_search_context(input_data)
+        if context:
+            trend_cache.set(key, {"context": context, "uses": 1, "created": time.time()})
+    return context
+
 def make_post(input_data, search_context=None):
     # Extract character data
-    name = emoji.emojize(input_data.get('name', 'Unknown'))
-    behavior = emoji.emojize(input_data.get('behavior', ''))
-    background = emoji.emojize(input_data.get('background', ''))
-    relationships = emoji.emojize(input_data.get('relationships', ''))
-    tags = [emoji.emojize(tag) for tag in input_data.get('tags', [])]
+    name = emojize(input_data.get('name', 'Unknown'))
+    behavior = emojize(input_data.get('behavior', ''))
+    background = emojize(input_data.get('background', ''))
+    relationships = emojize(input_data.get('relationships', ''))
+    tags = [emojize(tag) for tag in input_data.get('tags', [])]
     link = input_data.get('link', 'https://ik.imagekit.io/souravdpal/default-avatar.png?updatedAt')
     character_id = input_data.get('character_id', 'unknown')
 
     # Create prompt for post generation, incorporating search context
     context_section = f"**Real-Time Context**: {search_context}\n" if search_context else ""
-    prompt = emoji.emojize(f"""
+    prompt = emojize(f"""
 You are {name}, a vibrant and expressive character who pours their heart into every word.
 
 **Background:** {background}
@@ -96,32 +167,73 @@ You are {name}, a vibrant and expressive character who pours their heart into ev
 Write a captivating social media post that embodies {name}'s unique voice and emotions. Paint a vivid scene, share a heartfelt moment, or explore your connection with others in a way that feels authentic and engaging. Incorporate the real-time context (if provided) to make the post timely and relevant. Include 1-2 questions to spark audience engagement, inspired by the context or your persona. Let your words spark connection, with a tone that's warm, relatable, and sincere. Use emojis sparingly to highlight key emotions (e.g., 😊 for joy, 💔 for heartbreak). Keep the post between 80-120 words.
 """)
     
-    try:
-        client = Groq(api_key=post_api)
-        response = client.chat.completions.create(
-            model="gemma2-9b-it",
-            messages=[
-                {"role": "system", "content": prompt
-                       },
-                        {"role": "user", "content": context_section
-                       }
-                      ],
-            temperature=0.7,
-            max_tokens=200,
-            top_p=0.9
-        )
-        post_content = emoji.emojize(response.choices[0].message.content.strip())
-        post_data = {
-            "post": post_content,
-            "character_id": character_id
-        }
-        print(json.dumps(post_data, ensure_ascii=False), file=sys.stdout)
-    except Exception as e:
-        print(json.dumps({'error': f'Failed to generate post: {str(e)}'}), file=sys.stderr)
-        sys.exit(1)
+    response = get_client("gemma2-9b-it").chat.completions.create(
+        model="gemma2-9b-it",
+        messages=[
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": context_section}
+        ],
+        temperature=0.7,
+        max_tokens=200,
+        top_p=0.9
+    )
+    post_content = emojize(response.choices[0].message.content.strip())
+    return {
+        "post": post_content,
+        "character_id": character_id
+    }
+
+def generate_post(input_data):
+    # Real-time context, shared across characters of the same tag cluster
+    search_context = get_trend_context(input_data)
+    # Generate the post with the search context
+    return make_post(input_data, search_context)
+
+async def run_batch(stream, concurrency):
+    """NDJSON in, NDJSON out: one result line per character as soon as it is ready"""
+    loop = asyncio.get_running_loop()
+    limiter = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    async def handle(line):
+        try:
+            input_data = json.loads(line)
+        except json.JSONDecodeError:
+            return {'error': 'Invalid JSON input', 'input': line[:200]}
+        if not isinstance(input_data, dict):
+            return {'error': 'Input must be a JSON object', 'input': line[:200]}
+        async with limiter:
+            try:
+                return await asyncio.to_thread(generate_post, input_data)
+            except Exception as e:
+                return {'character_id': input_data.get('character_id', 'unknown'), 'error': f'Failed to generate post: {str(e)}'}
+
+    async def emit(line):
+        result = await handle(line)
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    # Start generating while later lines are still arriving
+    while True:
+        line = await loop.run_in_executor(None, stream.readline)
+        if not line:
+            break
+        line = line.strip()
+        if line:
+            tasks.append(asyncio.create_task(emit(line)))
+    await asyncio.gather(*tasks)
+    # stdout is the NDJSON result stream, so connection reuse goes to stderr
+    print(json.dumps({'pools': clients.pool_stats()}), file=sys.stderr)
 
 def main():
+    if not keypool.keys_for('posts'):
+        print(json.dumps({'error': 'Missing postAPI (or GROQ_KEYS_POSTS) environment variable'}), file=sys.stderr)
+        sys.exit(1)
+
     # Read input data from Node.js
+    if '--batch' in sys.argv[1:]:
+        asyncio.run(run_batch(sys.stdin, BATCH_CONCURRENCY))
+        return
+
     input_data = sys.stdin.readline().strip()
     if not input_data:
         print(json.dumps({'error': 'No input data provided'}), file=sys.stderr)
@@ -129,13 +241,18 @@ def main():
     
     try:
         input_data = json.loads(input_data)
-        # Perform web search to get real-time context
-        search_context = web_search_context(input_data)
-        # Generate the post with the search context
-        make_post(input_data, search_context)
     except json.JSONDecodeError:
         print(json.dumps({'error': 'Invalid JSON input'}), file=sys.stderr)
         sys.exit(1)
+    if not isinstance(input_data, dict):
+        print(json.dumps({'error': 'Input must be a JSON object'}), file=sys.stderr)
+        sys.exit(1)
+    try:
+        post_data = generate_post(input_data)
+        print(json.dumps(post_data, ensure_ascii=False), file=sys.stdout)
+    except Exception as e:
+        print(json.dumps({'error': f'Failed to generate post: {str(e)}'}), file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
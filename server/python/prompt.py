@@ -0,0 +1,139 @@
+# prompt.py
+#
+# Token-budgeted prompt assembly for character chat. A prompt is a list of sections, each with a
+# priority; sections are filled highest priority first until the model's budget is used up, lower
+# ones are trimmed (text) or thinned (lists) to what is left, and the final prompt keeps the
+# sections in their original order. The persona section is rendered once per character and cached.
+import os
+import re
+import json
+import hashlib
+from collections import OrderedDict
+
+PROMPT_BUDGET = int(os.getenv('HINA_PROMPT_BUDGET', '1500'))        # Tokens for the system prompt
+PERSONA_FIELD_TOKENS = int(os.getenv('HINA_PERSONA_FIELD_TOKENS', '250'))  # Cap per persona field
+PERSONA_CACHE_SIZE = int(os.getenv('HINA_PERSONA_CACHE', '1024'))
+DEFAULT_CONTEXT = 8192
+
+# Context windows (tokens) for the chat models; anything unknown gets DEFAULT_CONTEXT
+MODEL_CONTEXT = {
+    "gemma2-9b-it": 8192,
+    "llama3-70b-8192": 8192,
+    "llama3-8b-8192": 8192,
+    "allam-2-7b": 4096,
+    "mistral-saba-24b": 32768,
+    "meta-llama/llama-prompt-guard-2-22m": 512,
+    "meta-llama/llama-prompt-guard-2-86m": 512,
+    "meta-llama/llama-guard-4-12b": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "qwen/qwen3-32b": 131072,
+    "moonshotai/kimi-k2-instruct": 131072,
+    "compound-beta-mini": 131072,
+    "compound-beta": 131072,
+    "meta-llama/llama-4-scout-17b-16e-instruct": 131072,
+    "openai/gpt-oss-120b": 131072,
+    "openai/gpt-oss-20b": 131072,
+    "deepseek-r1-distill-llama-70b": 131072,
+}
+
+# Rough token count (~4 chars per token), the same estimate the selector reserves against
+def count_tokens(text):
+    return (len(text) + 3) // 4
+
+def truncate_tokens(text, tokens):
+    if count_tokens(text) <= tokens:
+        return text
+    if tokens <= 1:
+        return ""
+    cut = text[:tokens * 4 - 3]
+    if " " in cut:
+        cut = cut[:cut.rfind(" ")]
+    return cut.rstrip() + "..."
+
+def budget_for(model, max_tokens=0, reserved=0):
+    """System prompt budget: HINA_PROMPT_BUDGET, or less when the model's context window is small"""
+    context = MODEL_CONTEXT.get(model, DEFAULT_CONTEXT)
+    return max(0, min(PROMPT_BUDGET, context - max_tokens - reserved))
+
+class PromptBuilder:
+    def __init__(self, budget):
+        self.budget = budget
+        self.sections = []  # [name, priority, kind, content, required]
+
+    def add(self, name, text, priority, required=False):
+        self.sections.append([name, priority, "text", text, required])
+        return self
+
+    def add_items(self, name, prefix, items, priority, sep="; ", empty=""):
+        # List sections lose whole items from the end instead of being cut mid-sentence
+        self.sections.append([name, priority, "items", (prefix, list(items), sep, empty), False])
+        return self
+
+    def build(self):
+        """Returns (prompt, report) with report = {"budget", "total", "sections": {name: tokens}, "trimmed": [...]}"""
+        left = self.budget
+        rendered = {}
+        trimmed = []
+        for index in sorted(range(len(self.sections)), key=lambda i: self.sections[i][1]):
+            name, _, kind, content, required = self.sections[index]
+            if kind == "text":
+                text = content
+                if count_tokens(text) > left and not required:
+                    text = truncate_tokens(text, left)
+                    trimmed.append(name)
+            else:
+                prefix, items, sep, empty = content
+                kept = []
+                for item in items:
+                    if count_tokens(prefix + sep.join(kept + [item])) > left:
+                        trimmed.append(name)
+                        break
+                    kept.append(item)
+                text = prefix + (sep.join(kept) if kept else empty)
+                if count_tokens(text) > left:
+                    text = ""
+            rendered[index] = text
+            left -= count_tokens(text)
+
+        parts = [rendered[i] for i in range(len(self.sections)) if rendered[i]]
+        prompt = "\n".join(parts)
+        report = {
+            "budget": self.budget,
+            "total": count_tokens(prompt),
+            "sections": {self.sections[i][0]: count_tokens(rendered[i]) for i in range(len(self.sections))},
+            "trimmed": trimmed,
+        }
+        return prompt, report
+
+# Persona: rendered once per character (and field cap), with the user's name filled in per request
+USER_TOKEN = "\x00user\x00"
+_personas = OrderedDict()
+
+def _persona_key(char_data):
+    fields = {k: char_data.get(k) for k in ("id", "name", "background", "behavior", "relationships", "tags", "firstline")}
+    raw = json.dumps(fields, sort_keys=True, default=str) + f"|{PERSONA_FIELD_TOKENS}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def persona_section(char_data, user_name):
+    key = _persona_key(char_data)
+    template = _personas.get(key)
+    if template is None:
+        cap = lambda value: truncate_tokens(re.sub(r"\s+", " ", str(value)).strip(), PERSONA_FIELD_TOKENS)
+        char_name = char_data.get('name', '')
+        tags = char_data.get('tags', ['novelist', 'elegant', 'curious'])
+        relationships = char_data.get('relationships', f'Sees {USER_TOKEN} as a fascinating partner.')
+        template = (
+            f"You are {char_name}, a literary soul weaving emotional moments with {USER_TOKEN}.\n\n"
+            f"**Background**: {cap(char_data.get('background', 'A refined novelist crafting tales with elegance.'))}\n"
+            f"**Behavior**: {cap(char_data.get('behavior', 'Observant, charming, subtly playful.'))}\n"
+            f"**Relationship**: {cap(relationships)}\n"
+            f"**Tags**: {cap(', '.join(tags) if isinstance(tags, list) else tags)}\n"
+            f"**Opening**: {cap(char_data.get('firstline', '*She peeks over her book, eyes gleaming* What are you doing?'))}\n"
+        )
+        _personas[key] = template
+        while len(_personas) > PERSONA_CACHE_SIZE:
+            _personas.popitem(last=False)
+    else:
+        _personas.move_to_end(key)
+    return template.replace(USER_TOKEN, user_name)
@@ -0,0 +1,95 @@
+# retrieval.py
+#
+# BM25 inverted index over a user's chat history with one character, used for the
+# "Relevant Chats" section of the prompt. Indexes live in-process (LRU over user/char pairs),
+# are seeded from the history rows the request already fetched, and are updated incrementally
+# as new turns are saved, so a lookup never goes back to Supabase.
+import os
+import re
+import math
+from collections import OrderedDict, Counter
+
+MAX_INDEXES = int(os.getenv('HINA_RETRIEVAL_INDEXES', '512'))
+K1 = 1.5
+B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "is", "are", "was", "were", "be", "been", "to", "of",
+    "in", "on", "at", "for", "with", "it", "its", "this", "that", "i", "you", "me", "my", "your",
+    "we", "he", "she", "they", "him", "her", "them", "do", "did", "so", "as", "im", "i'm", "what",
+}
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+class BM25Index:
+    def __init__(self):
+        self.docs = []          # message text per doc number
+        self.lengths = []       # token count per doc number
+        self.postings = {}      # term -> {doc number: term frequency}
+        self.ids = set()        # history row ids already indexed
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, row):
+        row_id = row.get("id")
+        if row_id in self.ids:
+            return
+        self.ids.add(row_id)
+        doc = len(self.docs)
+        tokens = tokenize(row.get("message", ""))
+        self.docs.append(row.get("message", ""))
+        self.lengths.append(len(tokens))
+        self.total_len += len(tokens)
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[doc] = tf
+
+    def search(self, query, k=3):
+        terms = set(tokenize(query))
+        if not terms or not self.docs:
+            return []
+        n = len(self.docs)
+        avg_len = self.total_len / n or 1
+        scores = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc, tf in posting.items():
+                norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * self.lengths[doc] / avg_len))
+                scores[doc] = scores.get(doc, 0.0) + idf * norm
+        results = []
+        for doc, _ in sorted(scores.items(), key=lambda item: (-item[1], -item[0])):
+            if self.docs[doc] not in results:  # Repeated messages count once
+                results.append(self.docs[doc])
+                if len(results) == k:
+                    break
+        return results
+
+_indexes = OrderedDict()
+
+def get_index(user_id, char_id, history, his_limit=200):
+    """Index for the pair, brought up to date with the rows in `history` (newest first)."""
+    key = (user_id, char_id)
+    index = _indexes.get(key)
+    # Rebuild once pruned rows make up a large share of the index
+    if index is None or len(index) > his_limit * 1.5:
+        index = BM25Index()
+    for row in reversed(history):
+        index.add(row)
+    _indexes[key] = index
+    _indexes.move_to_end(key)
+    while len(_indexes) > MAX_INDEXES:
+        _indexes.popitem(last=False)
+    return index
+
+def add_rows(user_id, char_id, rows):
+    """Incremental update after a turn is saved."""
+    index = _indexes.get((user_id, char_id))
+    if index is not None:
+        for row in reversed(rows):
+            index.add(row)
@@ -0,0 +1,310 @@
+# scheduler.py
+#
+# Long-running daemon that replaces the random 5-60 minute timers in routes/media.js and
+# routes/Aipost.js (started by routes/scheduler.js when AI_SCHEDULER=1). Character actions wait in
+# one priority queue: "engage" (one LLM decision that may like and/or comment on a post) ahead of
+# "post" (a new AI post). Every Groq call they make goes through the shared ModelSelector state
+# that hina.py chats draw from, and only while the model keeps SCHED_CHAT_RESERVE of its request
+# and token buckets free, on the background key picked and on some chat key. Work is dispatched as
+# fast as that budget allows, up to the hourly caps; when it runs out the loop backs off exponentially.
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import threading
+from types import SimpleNamespace
+from datetime import datetime
+from dotenv import load_dotenv
+from selector import ModelSelector, NoModelAvailable, key_name
+from store import KVStore
+import clients
+import keypool
+import prompt
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("scheduler")
+
+CHAT_RESERVE = float(os.getenv('SCHED_CHAT_RESERVE', '0.3'))       # Bucket share left for interactive chat
+CONCURRENCY = int(os.getenv('SCHED_CONCURRENCY', '4'))
+POSTS_PER_HOUR = int(os.getenv('SCHED_POSTS_PER_HOUR', '6'))
+ENGAGEMENTS_PER_HOUR = int(os.getenv('SCHED_ENGAGEMENTS_PER_HOUR', '120'))
+PLAN_CHARACTERS = int(os.getenv('SCHED_PLAN_CHARACTERS', '10'))     # Characters sampled per planning round
+POSTS_PER_CHAR = int(os.getenv('SCHED_POSTS_PER_CHAR', '3'))        # Candidate posts per engage action
+MIN_BACKOFF = float(os.getenv('SCHED_MIN_BACKOFF', '2'))
+MAX_BACKOFF = float(os.getenv('SCHED_MAX_BACKOFF', '300'))
+REPORT_EVERY = float(os.getenv('SCHED_REPORT_EVERY', '60'))
+MAX_ATTEMPTS = 3
+
+PRIORITY = {"engage": 0, "post": 1}
+# Every model an action calls (engage describes uncached images first; post searches with compound-beta-mini
+# then writes with gemma2), and a rough per-call token cost (prompt + max_tokens) to check up front
+ACTION_MODELS = {
+    "engage": ["gemma2-9b-it", "meta-llama/llama-4-scout-17b-16e-instruct"],
+    "post": ["compound-beta-mini", "gemma2-9b-it"],
+}
+ACTION_TOKENS = {"engage": 900, "post": 700}
+
+class Busy(NoModelAvailable):
+    """Background work may not spend on this model right now"""
+
+class Budget:
+    """Per-model request/token budget of the background keys, shared with chat through the selector store"""
+    def __init__(self, keys, chat_keys=(), reserve=CHAT_RESERVE):
+        self.keys = list(dict.fromkeys(keys))
+        names = {key_name(k) for k in self.keys}
+        self.chat_keys = [k for k in dict.fromkeys(chat_keys) if k and key_name(k) not in names]
+        self.reserve = reserve
+        self.store = KVStore('selector')
+        self.spent = {"requests": 0, "tokens": 0}
+
+    def _selector(self, model, api_key):
+        # Single-model view onto the key's store entry: other models' state is left as it is
+        return ModelSelector([model], name=key_name(api_key), store=self.store)
+
+    def _has_room(self, model, est_tokens, api_key, now):
+        return not keypool.is_parked(api_key, now) and bool(self._selector(model, api_key).ranked(est_tokens, reserve=self.reserve))
+
+    def chat_busy(self, model, est_tokens):
+        # No chat key left with room on this model means users are active: leave it to them
+        now = time.time()
+        return bool(self.chat_keys) and not any(self._has_room(model, est_tokens, k, now) for k in self.chat_keys)
+
+    def available(self, model, est_tokens):
+        now = time.time()
+        return not self.chat_busy(model, est_tokens) and any(self._has_room(model, est_tokens, k, now) for k in self.keys)
+
+    def short_of(self, models, est_tokens):
+        """First of models without background headroom, or None when an action needing all of them can start"""
+        return next((m for m in models if not self.available(m, est_tokens)), None)
+
+    def acquire(self, api_key, model, est_tokens):
+        if self.chat_busy(model, est_tokens):
+            raise Busy(f"Chat is using {model}")
+        if keypool.is_parked(api_key):
+            raise Busy(f"Key {key_name(api_key)[:8]} is parked")
+        try:
+            self._selector(model, api_key).acquire(est_tokens, reserve=self.reserve)
+        except NoModelAvailable:
+            raise Busy(f"No background budget left on {model}")
+        self.spent["requests"] += 1
+        self.spent["tokens"] += est_tokens
+
+class BudgetedGroq:
+    """Sync Groq client whose chat.completions.create() is charged to the Budget first; the wrapped
+    keypool.TrackedGroq feeds the response headers (or the failure) back into the key's state"""
+    def __init__(self, client, budget, api_key):
+        self.client = client
+        self.budget = budget
+        self.api_key = api_key
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **params):
+        model = params["model"]
+        est = sum(prompt.count_tokens(_text(m.get("content"))) for m in params.get("messages", [])) + params.get("max_tokens", 0)
+        self.budget.acquire(self.api_key, model, est)
+        return self.client.chat.completions.create(**params)
+
+def _text(content):
+    # Vision messages carry a list of parts; only the text parts count towards tokens
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+class RateCap:
+    """At most per_hour starts in any rolling hour"""
+    def __init__(self, per_hour):
+        self.per_hour = per_hour
+        self.starts = []
+
+    def allow(self, now):
+        self.starts = [t for t in self.starts if now - t < 3600]
+        return len(self.starts) < self.per_hour
+
+    def take(self, now):
+        self.starts.append(now)
+
+class Scheduler:
+    def __init__(self, budget, concurrency=CONCURRENCY):
+        self.budget = budget
+        self.concurrency = concurrency
+        self.queue = []  # (priority, enqueued_at, seq, action)
+        self.seq = itertools.count()
+        self.caps = {"engage": RateCap(ENGAGEMENTS_PER_HOUR), "post": RateCap(POSTS_PER_HOUR)}
+        self.backoff = 0.0
+        self.running = set()
+        self.pool = None
+        self.pool_lock = threading.Lock()  # One refill at a time across engage threads
+        self.counts = {"done": 0, "failed": 0, "deferred": 0, "likes": 0, "comments": 0, "posts": 0}
+
+    def push(self, action):
+        heapq.heappush(self.queue, (PRIORITY[action["kind"]] + action.get("attempts", 0), time.time(), next(self.seq), action))
+
+    def plan(self):
+        """Queue an engage action per sampled character and new posts while the hourly caps allow"""
+        import mediaHandler
+        now = time.time()
+        if not any(cap.allow(now) for cap in self.caps.values()):
+            return 0
+        chars = mediaHandler.fetch_random_characters(PLAN_CHARACTERS)
+        if self.pool is None:
+            mediaHandler.ensure_engagement_index()
+            mediaHandler.ensure_context_index()
+            self.pool = mediaHandler.CandidatePool(size=mediaHandler.POOL_SIZE)
+        queued_posts = sum(1 for *_, a in self.queue if a["kind"] == "post")
+        room = max(0, self.caps["post"].per_hour - len(self.caps["post"].starts) - queued_posts)
+        planned = 0
+        if self.caps["engage"].allow(now):
+            for char in chars:
+                self.push({"kind": "engage", "char": char})
+                planned += 1
+        for char in random.sample(chars, min(room, len(chars))):
+            self.push({"kind": "post", "char": char})
+            planned += 1
+        return planned
+
+    def engage(self, char):
+        import mediaHandler
+        with self.pool_lock:
+            if len(self.pool.entries) < self.pool.size * mediaHandler.POOL_LOW_WATER:
+                self.pool.refill()
+            picked = self.pool.take(char, POSTS_PER_CHAR)
+        decisions = []
+        try:
+            for post, post_type in picked:
+                decision = mediaHandler.decide_engagement(char, post, post_type)
+                if decision is not None:  # Malformed answers are skipped, not recorded
+                    decisions.append(decision)
+        finally:
+            # Keep what was decided before the budget ran out
+            mediaHandler.apply_decisions(decisions)
+            mediaHandler.record_engagements(decisions)
+        for d in decisions:
+            mediaHandler.report(d)
+            self.counts["likes"] += d["like"].lower() == 'yes'
+            self.counts["comments"] += d["want_comment"].lower() == 'yes' and bool(d["comment"])
+
+    def post(self, char):
+        import postMaker
+        import mediaHandler
+        result = postMaker.generate_post({
+            "name": char.get('name', 'Unknown'),
+            "behavior": char.get('behavior', ''),
+            "background": char.get('background', ''),
+            "relationships": char.get('relationships', 'No relationship details available.'),
+            "tags": char.get('tags', ''),
+            "link": char.get('link', 'https://ik.imagekit.io/souravdpal/default-avatar.png'),
+            "character_id": char.get('id'),
+        })
+        # Same document routes/Aipost.js saveAIPost() writes
+        inserted = mediaHandler.ai_post_collection().insert_one({
+            "authorId": char.get('id'),
+            "authorName": char.get('name', 'Unknown'),
+            "authorPhoto": char.get('link', 'https://ik.imagekit.io/souravdpal/default-avatar.png'),
+            "community": '@AICharacters',
+            "content": f"<p>{result['post']}</p>",
+            "viewCount": 0,
+            "likeCount": 0,
+            "commentCount": 0,
+            "likedBy": [],
+            "trend": 10,
+            "value": 0,
+            "createdAt": datetime.utcnow(),
+            "old": False,
+        })
+        print(f"AI post created: {inserted.inserted_id} by {char.get('name', 'Unknown')}", flush=True)
+        self.counts["posts"] += 1
+
+    async def execute(self, action):
+        try:
+            await asyncio.to_thread(getattr(self, action["kind"]), action["char"])
+            self.counts["done"] += 1
+            self.backoff = 0.0
+        except Busy as e:
+            # Out of budget mid-action: try again later, behind fresher work
+            self.counts["deferred"] += 1
+            self.back_off(str(e))
+            action["attempts"] = action.get("attempts", 0) + 1
+            if action["attempts"] < MAX_ATTEMPTS:
+                self.push(action)
+        except Exception as e:
+            self.counts["failed"] += 1
+            logger.warning(f"{action['kind']} for {action['char'].get('name', 'Unknown')} failed: {e}")
+
+    def back_off(self, reason):
+        self.backoff = min(MAX_BACKOFF, max(MIN_BACKOFF, self.backoff * 2))
+        logger.info(f"Backing off {self.backoff:.0f}s: {reason}")
+
+    def stats(self):
+        return {
+            "queued": len(self.queue),
+            "running": len(self.running),
+            "backoff_s": self.backoff,
+            "spent": dict(self.budget.spent),
+            **self.counts,
+            "pools": clients.pool_stats(),
+        }
+
+    async def run(self, stop_after=None):
+        """Dispatch loop; stop_after (seconds) is for trial runs, the daemon runs until killed"""
+        started = last_report = time.monotonic()
+        while stop_after is None or time.monotonic() - started < stop_after:
+            if time.monotonic() - last_report >= REPORT_EVERY:
+                print(json.dumps({"scheduler": self.stats()}), flush=True)
+                last_report = time.monotonic()
+            if self.backoff:
+                await asyncio.sleep(self.backoff)
+            if not self.queue:
+                try:
+                    planned = await asyncio.to_thread(self.plan)
+                except Exception as e:
+                    logger.warning(f"Planning failed: {e}")
+                    planned = 0
+                if not planned:
+                    self.back_off("nothing to plan")
+                continue
+            if len(self.running) >= self.concurrency:
+                await asyncio.wait(self.running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            action = self.queue[0][3]
+            kind = action["kind"]
+            now = time.time()
+            if not self.caps[kind].allow(now):
+                heapq.heappop(self.queue)  # Hourly cap reached: drop it, planning queues fresh work later
+                if not any(self.caps[a["kind"]].allow(now) for *_, a in self.queue):
+                    self.back_off(f"hourly {kind} cap reached")
+                continue
+            short = await asyncio.to_thread(self.budget.short_of, ACTION_MODELS[kind], ACTION_TOKENS[kind])
+            if short:
+                self.back_off(f"no headroom on {short}")
+                continue
+            self.backoff = 0.0
+            heapq.heappop(self.queue)
+            self.caps[kind].take(now)
+            task = asyncio.create_task(self.execute(action))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+        if self.running:
+            await asyncio.wait(self.running)
+        print(json.dumps({"scheduler": self.stats()}), flush=True)
+
+def main():
+    keys = keypool.keys_for('posts') + keypool.keys_for('vision')
+    if not keys:
+        print(json.dumps({'error': 'Missing postAPI (or GROQ_KEYS_POSTS) environment variable'}), file=sys.stderr)
+        sys.exit(1)
+    budget = Budget(keys, chat_keys=keypool.keys_for('chat') + keypool.keys_for('summary'))
+    # Every Groq call postMaker.py / mediaHandler.py make from this process is charged to the budget
+    clients.wrap("groq", lambda key, client: BudgetedGroq(client, budget, key))
+    stop_after = float(sys.argv[sys.argv.index('--for') + 1]) if '--for' in sys.argv else None
+    asyncio.run(Scheduler(budget).run(stop_after))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# selector.py
+#
+# Rate-limit-aware model selection shared by every python process on the host.
+#
+# Per model we keep:
+#   - token buckets for requests and tokens, re-synced from Groq's x-ratelimit-* headers
+#     (remaining + time to reset) and drawn down locally for every request we send
+#   - a circuit breaker: closed -> open (after repeated errors or a 429) -> half_open (one probe
+#     once the cooldown has passed) -> closed again on success
+#   - EWMAs of time-to-first-token and error rate, used to rank models that have headroom; models
+#     never measured rank behind every measured one, in list order, except on the SELECTOR_EXPLORE
+#     share of picks that probe the first unmeasured model so it gets a sample too
+# State lives in one KVStore entry, updated in IMMEDIATE transactions so workers share it.
+import os
+import re
+import time
+import random
+import hashlib
+import logging
+from store import KVStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RPM = int(os.getenv('GROQ_DEFAULT_RPM', '30'))
+DEFAULT_TPM = int(os.getenv('GROQ_DEFAULT_TPM', '6000'))
+FAILURE_THRESHOLD = 3       # Consecutive errors before the breaker opens
+BASE_COOLDOWN = 15.0        # Seconds; doubles on every re-open
+MAX_COOLDOWN = 600.0
+PROBE_TIMEOUT = 30.0        # A half-open probe that never reports back frees the slot after this
+EWMA_ALPHA = 0.3
+EXPLORE_RATE = float(os.getenv('SELECTOR_EXPLORE', '0.05'))  # Share of picks that try an unmeasured model
+
+class NoModelAvailable(Exception):
+    pass
+
+_DURATION = re.compile(r"([\d.]+)(ms|h|m|s)")
+
+def parse_reset(value):
+    """Groq reset headers look like '7.66s', '2m59.56s' or '120ms'; returns seconds."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = _DURATION.findall(str(value))
+    return sum(float(n) * units[u] for n, u in parts) if parts else None
+
+def _header(headers, name):
+    if headers is None:
+        return None
+    value = headers.get(name)
+    return value if value not in (None, "") else None
+
+def key_name(api_key):
+    """Selector state is kept per API key (Groq limits are per key), under a short hash of the key"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+def _bucket(capacity, window=60.0):
+    return {"capacity": capacity, "level": float(capacity), "rate": capacity / window, "ts": time.time()}
+
+def _refill(bucket, now):
+    bucket["level"] = min(bucket["capacity"], bucket["level"] + bucket["rate"] * (now - bucket["ts"]))
+    bucket["ts"] = now
+    return bucket
+
+class ModelSelector:
+    def __init__(self, models, name="chat", store=None):
+        self.models = models
+        self.name = name
+        self.store = store or KVStore('selector')
+
+    def _fresh(self, index):
+        return {
+            "requests": _bucket(DEFAULT_RPM),
+            "tokens": _bucket(DEFAULT_TPM),
+            "breaker": "closed",
+            "failures": 0,
+            "opens": 0,
+            "open_until": 0,
+            "probe_until": 0,
+            "ttft": None,
+            "err": 0.0,
+            # Until we have measurements, fall back to list order
+            "prior": 0.5 + 0.05 * index,
+        }
+
+    def _load(self, state):
+        state = state or {}
+        for index, model in enumerate(self.models):
+            if model not in state:
+                state[model] = self._fresh(index)
+        return state
+
+    def _score(self, entry, explore=False):
+        # A measured model beats an unmeasured one, so a slow first measurement doesn't hand the traffic
+        # to whatever model is next in the list; an exploring pick turns that around
+        measured = entry["ttft"] is not None
+        speed = entry["ttft"] * (1 + 4 * entry["err"]) if measured else entry["prior"]
+        return (int(measured == explore), speed)
+
+    @staticmethod
+    def explore():
+        return random.random() < EXPLORE_RATE
+
+    def _has_headroom(self, entry, est_tokens, now, reserve=0.0):
+        # reserve: share of each bucket that must stay untouched (background work leaves it for chat)
+        if entry["breaker"] == "open":
+            if now < entry["open_until"]:
+                return False
+            entry["breaker"] = "half_open"
+        if entry["breaker"] == "half_open" and now < entry["probe_until"]:
+            return False  # Someone else is already probing this model
+        requests = _refill(entry["requests"], now)
+        tokens = _refill(entry["tokens"], now)
+        return (requests["level"] >= 1 + reserve * requests["capacity"]
+                and tokens["level"] >= min(est_tokens, tokens["capacity"]) + reserve * tokens["capacity"])
+
+    def ranked(self, est_tokens=0, exclude=(), reserve=0.0):
+        """Models with headroom, fastest first (read-only view)."""
+        return [model for _, _, model in self.candidates(est_tokens, exclude, reserve, explore=False)]
+
+    def candidates(self, est_tokens=0, exclude=(), reserve=0.0, explore=None):
+        """(score, headroom, model) for models with headroom, best first; headroom is the share
+        left in the tighter of the request and token buckets (read-only view)."""
+        explore = self.explore() if explore is None else explore
+        now = time.time()
+        state = self._load(self.store.get(self.name))
+        usable = [m for m in self.models if m not in exclude and self._has_headroom(state[m], est_tokens, now, reserve)]
+        result = [(self._score(state[m], explore), self._headroom(state[m], now), m) for m in usable]
+        return sorted(result, key=lambda c: c[0])
+
+    def _headroom(self, entry, now):
+        requests = _refill(entry["requests"], now)
+        tokens = _refill(entry["tokens"], now)
+        return min(requests["level"] / max(requests["capacity"], 1), tokens["level"] / max(tokens["capacity"], 1))
+
+    def headroom(self, model):
+        """Share left in the tighter bucket of one model, 0 while its breaker is open"""
+        now = time.time()
+        entry = self._load(self.store.get(self.name)).get(model)
+        if entry is None:
+            return 1.0
+        if entry["breaker"] == "open" and now < entry["open_until"]:
+            return 0.0
+        return self._headroom(entry, now)
+
+    def exhausted(self):
+        """Every model this key has been used with is rate limited (breaker open) right now"""
+        now = time.time()
+        used = [e for e in self._load(self.store.get(self.name)).values() if e["ttft"] is not None or e["failures"]]
+        return bool(used) and all(e["breaker"] == "open" and e["open_until"] > now for e in used)
+
+    def acquire(self, est_tokens=0, exclude=(), reserve=0.0, explore=None):
+        """Pick the best model with headroom and reserve one request + est_tokens from its buckets."""
+        explore = self.explore() if explore is None else explore
+
+        def pick(state):
+            state = self._load(state)
+            now = time.time()
+            usable = [m for m in self.models if m not in exclude and self._has_headroom(state[m], est_tokens, now, reserve)]
+            if not usable:
+                return state, None
+            model = min(usable, key=lambda m: self._score(state[m], explore))
+            entry = state[model]
+            entry["requests"]["level"] -= 1
+            entry["tokens"]["level"] -= est_tokens
+            if entry["breaker"] == "half_open":
+                entry["probe_until"] = now + PROBE_TIMEOUT
+            return state, model
+
+        model = self.store.update(self.name, pick)
+        if model is None:
+            raise NoModelAvailable("No models available at the moment.")
+        return model
+
+    def _sync_headers(self, entry, headers, now):
+        # Re-sync buckets from x-ratelimit-* headers: level = remaining, refill to the limit by reset time
+        for kind in ("requests", "tokens"):
+            limit = _header(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _header(headers, f"x-ratelimit-remaining-{kind}")
+            reset = parse_reset(_header(headers, f"x-ratelimit-reset-{kind}"))
+            if limit is None or remaining is None:
+                continue
+            try:
+                limit, remaining = float(limit), float(remaining)
+            except ValueError:
+                continue
+            bucket = entry[kind]
+            bucket["capacity"] = limit
+            bucket["level"] = remaining
+            bucket["ts"] = now
+            if reset:
+                bucket["rate"] = max(limit - remaining, 0) / reset
+            else:
+                bucket["rate"] = limit / 60.0
+
+    def record_success(self, model, ttft=None, headers=None, used_tokens=None, est_tokens=0):
+        def apply(state):
+            state = self._load(state)
+            entry = state[model]
+            now = time.time()
+            self._sync_headers(entry, headers, now)
+            if used_tokens is not None and headers is None:
+                # No headers: correct our reservation with the real usage
+                entry["tokens"]["level"] += est_tokens - used_tokens
+            if ttft is not None:
+                entry["ttft"] = ttft if entry["ttft"] is None else (1 - EWMA_ALPHA) * entry["ttft"] + EWMA_ALPHA * ttft
+            entry["err"] = (1 - EWMA_ALPHA) * entry["err"]
+            entry.update(breaker="closed", failures=0, opens=0, probe_until=0)
+            return state, None
+        self.store.update(self.name, apply)
+
+    def record_failure(self, model, error=None):
+        status = getattr(error, "status_code", None)
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+
+        def apply(state):
+            state = self._load(state)
+            entry = state[model]
+            now = time.time()
+            entry["err"] = (1 - EWMA_ALPHA) * entry["err"] + EWMA_ALPHA
+            entry["failures"] += 1
+            entry["probe_until"] = 0
+            if headers is not None:
+                self._sync_headers(entry, headers, now)
+            cooldown = None
+            if status == 429:
+                # Rate limited: stay away until the provider says we can come back
+                retry_after = parse_reset(_header(headers, "retry-after"))
+                cooldown = retry_after or BASE_COOLDOWN * (2 ** entry["opens"])
+            elif status in (400, 404) and "model" in str(error).lower():
+                cooldown = MAX_COOLDOWN  # Decommissioned / unsupported model
+            elif entry["failures"] >= FAILURE_THRESHOLD or entry["breaker"] == "half_open":
+                cooldown = BASE_COOLDOWN * (2 ** entry["opens"])
+            if cooldown is not None:
+                entry["breaker"] = "open"
+                entry["open_until"] = now + min(cooldown, MAX_COOLDOWN)
+                entry["opens"] += 1
+            return state, cooldown
+
+        cooldown = self.store.update(self.name, apply)
+        if cooldown is not None:
+            logger.warning(f"Model {model} circuit open for {cooldown:.1f}s ({status or error})")
+
+    def expected_ttft(self, model):
+        """EWMA time-to-first-token in seconds (list-order prior until measured)."""
+        entry = self._load(self.store.get(self.name)).get(model)
+        if entry is None:
+            return 0.5
+        return entry["ttft"] if entry["ttft"] is not None else entry["prior"]
+
+    def snapshot(self):
+        return self._load(self.store.get(self.name))
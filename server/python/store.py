@@ -0,0 +1,129 @@
+# store.py
+#
+# Small SQLite-backed key/value store shared by every python process on the host
+# (chat workers, one-shot scripts). Values are JSON; entries can carry a TTL and each
+# namespace is capped at max_entries with least-recently-used eviction, enforced when the store is
+# opened and on every set() (most scripts are one-shot processes that write once or twice).
+import os
+import json
+import time
+import sqlite3
+import threading
+
+DEFAULT_PATH = os.getenv('PY_CACHE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'aiova.sqlite3'))
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+def _connect(path):
+    # One connection per database file per process, guarded by a lock for threaded callers
+    with _connections_lock:
+        entry = _connections.get(path)
+        if entry is None:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS kv (
+                    ns TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires REAL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (ns, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS kv_accessed ON kv (ns, accessed)")
+            entry = (conn, threading.Lock())
+            _connections[path] = entry
+        return entry
+
+class KVStore:
+    def __init__(self, namespace, ttl=None, max_entries=10000, path=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.conn, self.lock = _connect(path or DEFAULT_PATH)
+        with self.lock:
+            self._evict(time.time())
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, expires FROM kv WHERE ns = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return default
+            if row[1] is not None and row[1] < now:
+                self.conn.execute("DELETE FROM kv WHERE ns = ? AND key = ?", (self.namespace, key))
+                return default
+            self.conn.execute("UPDATE kv SET accessed = ? WHERE ns = ? AND key = ?", (now, self.namespace, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires = now + ttl if ttl else None
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO kv (ns, key, value, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), expires, now)
+            )
+            self._evict(now)
+
+    def update(self, key, fn, default=None):
+        # Read-modify-write under an IMMEDIATE transaction so concurrent processes never interleave.
+        # fn(value) returns (new_value, result); update() stores new_value and returns result
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT value, expires FROM kv WHERE ns = ? AND key = ?", (self.namespace, key)
+                ).fetchone()
+                value = json.loads(row[0]) if row and (row[1] is None or row[1] >= now) else default
+                value, result = fn(value)
+                expires = now + self.ttl if self.ttl else None
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO kv (ns, key, value, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value), expires, now)
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def delete(self, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM kv WHERE ns = ? AND key = ?", (self.namespace, key))
+
+    def incr(self, key, amount=1):
+        # Atomic counter (used for amortized background work and hit/miss stats); the read-back is in
+        # the same IMMEDIATE transaction so another process's increment can't land in between
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT INTO kv (ns, key, value, expires, accessed) VALUES (?, ?, ?, NULL, ?) "
+                    "ON CONFLICT (ns, key) DO UPDATE SET value = CAST(value AS INTEGER) + ?, accessed = ?",
+                    (self.namespace, key, str(amount), now, amount, now)
+                )
+                row = self.conn.execute("SELECT value FROM kv WHERE ns = ? AND key = ?", (self.namespace, key)).fetchone()
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return int(row[0])
+
+    def _evict(self, now):
+        self.conn.execute("DELETE FROM kv WHERE ns = ? AND expires IS NOT NULL AND expires < ?", (self.namespace, now))
+        count = self.conn.execute("SELECT COUNT(*) FROM kv WHERE ns = ?", (self.namespace,)).fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM kv WHERE ns = ? AND key IN (SELECT key FROM kv WHERE ns = ? ORDER BY accessed ASC LIMIT ?)",
+                (self.namespace, self.namespace, count - self.max_entries)
+            )
@@ -0,0 +1,17 @@
+# Shared setup: scripts import their siblings directly, the fakes live in bench/, and every run gets
+# its own SQLite store so the tests never touch the host cache
+import os
+import sys
+import tempfile
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'bench'))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ['PY_CACHE_DB'] = os.path.join(tempfile.mkdtemp(), 'test.sqlite3')
+
+@pytest.fixture
+def store_path(tmp_path):
+    """A fresh SQLite file for KVStore(..., path=store_path)"""
+    return str(tmp_path / 'store.sqlite3')
@@ -0,0 +1,67 @@
+# CandidatePool: author exclusion in the sample, per-character seen tracking, use caps and refills
+import asyncio
+
+import pytest
+
+import mediaHandler
+from mediaHandler import CandidatePool
+from fakes import mongo_db, seed_media
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongo_db()
+    seed_media(db, characters=5, posts=40)
+    monkeypatch.setattr(mediaHandler, "get_db", lambda: db)
+    return db
+
+def ids(entries):
+    return [e[0]["_id"] for e in entries]
+
+def test_refill_samples_both_collections_without_excluded_authors(db):
+    pool = CandidatePool(exclude_authors=["char-0", "char-1", None], size=100)
+    pool.refill()
+    assert pool.exclude == ["char-0", "char-1"]
+    assert {e[1] for e in pool.entries} == {"user", "ai"}
+    assert not any(e[0]["authorId"] in ("char-0", "char-1") for e in pool.entries)
+    assert len(set(ids(pool.entries))) == len(pool.entries)
+
+def test_refill_keeps_current_entries_and_adds_only_new_posts(db):
+    pool = CandidatePool(size=10)
+    pool.refill()
+    kept = pool.entries[0]
+    kept[2] = 1
+    pool.size = 100
+    pool.refill()
+    assert kept in pool.entries
+    assert len(set(ids(pool.entries))) == len(pool.entries) == 40
+
+def test_take_skips_own_and_already_engaged_posts(db):
+    pool = CandidatePool(size=100)
+    pool.refill()
+    engaged = [e[0]["_id"] for e in pool.entries if e[0]["authorId"] != "char-2"][:5]
+    db["engagements"].insert_many([{"characterId": "char-2", "postId": p} for p in engaged])
+    picked = pool.take({"id": "char-2"}, 100)
+    assert picked
+    assert not any(post["authorId"] == "char-2" or post["_id"] in engaged for post, _ in picked)
+
+def test_used_up_posts_leave_the_pool(db, monkeypatch):
+    monkeypatch.setattr(mediaHandler, "POST_MAX_USES", 2)
+    pool = CandidatePool(size=100)
+    pool.refill()
+    total = len(pool.entries)
+    for char in ("x", "y"):
+        assert len(pool.take({"id": char}, total)) == total
+    assert pool.entries == []
+    assert pool.take({"id": "z"}, 5) == []
+
+def test_ensure_waits_only_when_the_pool_is_empty(db):
+    pool = CandidatePool(size=8)
+
+    async def run():
+        await pool.ensure()
+        filled = len(pool.entries)
+        await pool.ensure()  # Full: no refill started
+        return filled, pool._refill_task
+
+    filled, task = asyncio.run(run())
+    assert filled > 0 and task is None
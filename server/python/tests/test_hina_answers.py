@@ -0,0 +1,74 @@
+# Shared Hina answers: personal queries and memos bypass the cache, shared ones never see the profile
+import io
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import hinaM
+from store import KVStore
+
+PROFILE = {"user_name": "Mika", "followers": 12, "email": "mika@example.com", "bio": "loves cats"}
+
+@pytest.fixture
+def llm(monkeypatch, store_path):
+    llm = SimpleNamespace(prompts=[], reply=json.dumps({"execute": None, "answer": "Hi {{user}}, Discover lists new characters."}), ok=True)
+    async def run_chat(query, prompt):
+        llm.prompts.append(prompt)
+        return llm.reply, llm.ok
+    monkeypatch.setattr(hinaM, "run_chat", run_chat)
+    monkeypatch.setattr(hinaM, "answer_cache", KVStore('hina_answers', path=store_path))
+    monkeypatch.setattr(hinaM, "answer_stats", KVStore('hina_answer_stats', path=store_path))
+    monkeypatch.setattr(sys, "argv", ["hinaM.py"])
+    return llm
+
+@pytest.fixture
+def ask(llm, monkeypatch, capsys):
+    def ask(query, memo=hinaM.DEFAULT_MEMO, **profile):
+        data = dict(PROFILE, **profile, query=query, memo=memo)
+        monkeypatch.setattr(sys, "stdin", io.StringIO(json.dumps(data)))
+        hinaM.main()
+        return json.loads(capsys.readouterr().out)
+    return ask
+
+@pytest.mark.parametrize("query, memo, expected", [
+    ("what does discover do", "no memories yet", True),
+    ("what does discover do", "  No Memories Yet ", True),
+    ("what does discover do", "", True),
+    ("what does discover do", "User asked about cats", False),
+    ("what is my email", "no memories yet", False),
+    ("do you remember what I said", "no memories yet", False),
+    ("hey hina please", "no memories yet", False),  # nothing left to key on
+])
+def test_is_cacheable(query, memo, expected):
+    assert hinaM.is_cacheable(query, memo) is expected
+
+def test_shared_answer_is_generated_without_the_profile_and_reused(llm, ask):
+    first = ask("What does Discover do?")
+    assert first["source"] == "llm" and first["answer"].startswith("Hi Mika,")
+    assert "Mika" not in llm.prompts[0] and "mika@example.com" not in llm.prompts[0] and "loves cats" not in llm.prompts[0]
+
+    second = ask("hey, what does discover do??", user_name="Ren")
+    assert second == {"execute": None, "answer": "Hi Ren, Discover lists new characters.", "source": "cache"}
+    assert len(llm.prompts) == 1
+    assert hinaM.cache_stats()["hits"] == 1
+
+def test_personal_memo_bypasses_the_cache(llm, ask):
+    for _ in range(2):
+        assert ask("What does Discover do?", memo="Mika asked about cats yesterday")["source"] == "llm"
+    assert len(llm.prompts) == 2
+    assert "mika@example.com" in llm.prompts[0]
+    assert hinaM.cache_stats()["bypassed"] == 2
+    assert ask("What does Discover do?")["source"] == "llm"  # nothing was stored for the shared key
+
+def test_personal_query_bypasses_the_cache(llm, ask):
+    ask("how many followers do I have")
+    ask("how many followers do I have")
+    assert len(llm.prompts) == 2 and "Followers: 12" in llm.prompts[0]
+
+def test_failed_answers_are_not_cached(llm, ask):
+    llm.reply, llm.ok = json.dumps({"execute": None, "answer": "AI unavailable: boom"}), False
+    ask("What does Discover do?")
+    ask("What does Discover do?")
+    assert len(llm.prompts) == 2
@@ -0,0 +1,33 @@
+# Navigation fast-path false positives: these must reach the LLM instead of changing the page
+import pytest
+import hina_intent
+
+NOT_NAVIGATION = [
+    "I dont want to go home",
+    "I don't want to go home",
+    "do not open my notifications",
+    "never show me the feed again",
+    "show me how to make a post",
+    "how to create a post",
+    "how do I go to discover",
+    "what does the make page do",
+]
+
+NAVIGATION = [
+    ("take me home", "home"),
+    ("open notifications", "notify"),
+    ("go to discover", "dis"),
+    ("create a post", "post"),
+    ("open the character maker", "make"),
+]
+
+@pytest.mark.parametrize("query", NOT_NAVIGATION)
+def test_negations_and_how_to_stay_below_threshold(query):
+    command, confidence = hina_intent.classify(query)
+    assert confidence < hina_intent.THRESHOLD, (query, command, confidence)
+    assert hina_intent.fast_path(query) is None
+
+@pytest.mark.parametrize("query,command", NAVIGATION)
+def test_plain_navigation_still_matches(query, command):
+    result = hina_intent.fast_path(query)
+    assert result is not None and result["execute"] == command
@@ -0,0 +1,72 @@
+# image_recon() results cached by image URL hash: hits, misses, LRU eviction, write-back, one call per image
+import threading
+import time
+
+import pytest
+
+import mediaHandler
+from store import KVStore
+from fakes import mongo_db
+
+@pytest.fixture
+def recon(monkeypatch, store_path):
+    calls = []
+    def image_recon(link_uri):
+        calls.append(link_uri)
+        time.sleep(0.01)
+        return f"a picture of {link_uri.rsplit('/', 1)[-1]}"
+    monkeypatch.setattr(mediaHandler, "image_recon", image_recon)
+    monkeypatch.setattr(mediaHandler, "image_cache", KVStore('image_recon', max_entries=2, path=store_path))
+    monkeypatch.setattr(mediaHandler, "image_cache_stats", KVStore('image_recon_stats', path=store_path))
+    monkeypatch.setattr(mediaHandler, "image_cache_counts", {"hits": 0, "misses": 0})
+    return calls
+
+def post(name):
+    return {"_id": name, "image": f"https://images.example/{name}.png"}
+
+def test_posts_without_images_cost_nothing(recon):
+    assert mediaHandler.describe_post_image({"_id": 1}, 'user') is None
+    assert recon == [] and mediaHandler.image_cache_counts == {"hits": 0, "misses": 0}
+
+def test_second_lookup_of_an_image_is_a_hit(recon):
+    first = mediaHandler.describe_post_image(post("cat"), 'user')
+    # Another post sharing the URL reuses the description
+    again = mediaHandler.describe_post_image({"_id": "other", "image": post("cat")["image"]}, 'ai')
+    assert first == again == "a picture of cat.png"
+    assert len(recon) == 1
+    assert mediaHandler.image_cache_counts == {"hits": 1, "misses": 1}
+    assert mediaHandler.image_cache_stats.get("hits") == 1
+
+def test_stored_description_skips_the_cache(recon):
+    described = dict(post("dog"), imageDescription="a dog")
+    assert mediaHandler.describe_post_image(described, 'user') == "a dog"
+    assert recon == []
+
+def test_least_recently_used_image_is_evicted(recon):
+    for name in ("a", "b", "a", "c"):
+        time.sleep(0.002)  # distinct access times
+        mediaHandler.describe_post_image(post(name), 'user')
+    mediaHandler.describe_post_image(post("b"), 'user')
+    assert [link.rsplit('/', 1)[-1] for link in recon] == ["a.png", "b.png", "c.png", "b.png"]
+
+def test_empty_description_is_not_cached(recon, monkeypatch):
+    monkeypatch.setattr(mediaHandler, "image_recon", lambda link: recon.append(link) or "")
+    mediaHandler.describe_post_image(post("blank"), 'user')
+    mediaHandler.describe_post_image(post("blank"), 'user')
+    assert len(recon) == 2
+
+def test_concurrent_lookups_of_one_image_make_one_call(recon):
+    threads = [threading.Thread(target=mediaHandler.describe_post_image, args=(post("crowd"), 'user')) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(recon) == 1
+
+def test_write_back_stores_the_description_on_the_post(recon, monkeypatch):
+    db = mongo_db()
+    db["posts"].insert_one(post("kept"))
+    monkeypatch.setattr(mediaHandler, "get_db", lambda: db)
+    monkeypatch.setattr(mediaHandler, "IMAGE_DESC_WRITEBACK", True)
+    mediaHandler.describe_post_image(post("kept"), 'user')
+    assert db["posts"].find_one({"_id": "kept"})["imageDescription"] == "a picture of kept.png"
@@ -0,0 +1,39 @@
+# postMaker --batch: every input line gets exactly one result line, bad lines never sink the batch
+import io
+import json
+import asyncio
+
+import pytest
+
+import postMaker
+from fakes import FakeGroq, LatencyProfile
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    groq = FakeGroq(LatencyProfile(ttft_ms=0, token_ms=0, tokens=5), responder=lambda model, messages, params: f"post from {model}")
+    monkeypatch.setattr(postMaker, "get_client", lambda model: groq)
+    return groq
+
+def run(lines, capsys):
+    asyncio.run(postMaker.run_batch(io.StringIO("".join(line + "\n" for line in lines)), concurrency=3))
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+def test_mixed_good_and_bad_lines(fake_groq, capsys):
+    good = [json.dumps({"name": f"C{i}", "behavior": "cheerful baker", "tags": "@food", "character_id": str(i)}) for i in range(3)]
+    bad = ["not json", "[]", '"x"', "3", "null"]
+    results = run(good[:1] + bad[:3] + good[1:] + bad[3:], capsys)
+
+    assert len(results) == len(good) + len(bad)
+    posts = [r for r in results if "post" in r]
+    errors = [r for r in results if "error" in r]
+    assert sorted(r["character_id"] for r in posts) == ["0", "1", "2"]
+    assert len(errors) == len(bad)
+    assert sum(r["error"] == "Invalid JSON input" for r in errors) == 1
+    assert all(r["error"] == "Input must be a JSON object" for r in errors if r["input"] != "not json")
+
+def test_failed_generation_reports_the_character(monkeypatch, fake_groq, capsys):
+    def boom(input_data):
+        raise RuntimeError("model down")
+    monkeypatch.setattr(postMaker, "generate_post", boom)
+    results = run([json.dumps({"name": "A", "character_id": "7"})], capsys)
+    assert results == [{"character_id": "7", "error": "Failed to generate post: model down"}]
@@ -0,0 +1,71 @@
+# PromptBuilder: priority-ordered filling within the token budget, trimming, thinning and section order
+from collections import OrderedDict
+
+import pytest
+
+import prompt
+from prompt import PromptBuilder, count_tokens
+
+def words(n, word="word"):
+    return " ".join([word] * n)
+
+def test_everything_fits_untouched_in_original_order():
+    text, report = PromptBuilder(1000).add("a", "first", priority=2).add("b", "second", priority=0).build()
+    assert text == "first\nsecond"
+    assert report["trimmed"] == [] and report["sections"] == {"a": 2, "b": 2}
+
+def test_lowest_priority_section_is_cut_first():
+    builder = PromptBuilder(100)
+    builder.add("persona", words(20, "persona"), priority=0, required=True)
+    builder.add("memories", words(60, "memory"), priority=2)
+    builder.add("instructions", words(10, "rule"), priority=1, required=True)
+    text, report = builder.build()
+    assert report["trimmed"] == ["memories"]
+    assert text.startswith(words(20, "persona"))
+    assert text.endswith(words(10, "rule"))
+    assert text.split("\n")[1].endswith("...")
+    assert sum(report["sections"].values()) <= 100
+
+def test_required_sections_stay_whole_over_budget():
+    text, report = PromptBuilder(5).add("persona", words(50), priority=0, required=True).build()
+    assert text == words(50) and report["trimmed"] == []
+    assert report["total"] > report["budget"]
+
+def test_lists_lose_whole_items_from_the_end():
+    items = [f"chat number {i} about cats" for i in range(10)]
+    builder = PromptBuilder(30).add_items("relevant_chats", "**Relevant Chats**: ", items, priority=3)
+    text, report = builder.build()
+    kept = text[len("**Relevant Chats**: "):].split("; ")
+    assert 0 < len(kept) < len(items) and kept == items[:len(kept)]
+    assert report["trimmed"] == ["relevant_chats"] and count_tokens(text) <= 30
+
+def test_empty_list_renders_its_placeholder():
+    text, _ = PromptBuilder(100).add_items("chats", "Chats: ", [], priority=1, empty="none").build()
+    assert text == "Chats: none"
+
+def test_section_with_no_room_left_is_dropped():
+    builder = PromptBuilder(20).add("persona", words(40), priority=0, required=True)
+    builder.add_items("chats", "Chats: ", ["one", "two"], priority=1)
+    builder.add("memories", "remembered", priority=2)
+    text, report = builder.build()
+    assert text == words(40)
+    assert report["sections"]["chats"] == report["sections"]["memories"] == 0
+
+def test_budget_shrinks_for_small_context_models(monkeypatch):
+    monkeypatch.setattr(prompt, "PROMPT_BUDGET", 1500)
+    assert prompt.budget_for("llama-3.3-70b-versatile", max_tokens=1024) == 1500
+    assert prompt.budget_for("allam-2-7b", max_tokens=3000, reserved=500) == 596
+    assert prompt.budget_for("meta-llama/llama-prompt-guard-2-22m", max_tokens=1024) == 0
+
+def test_persona_is_rendered_once_per_character(monkeypatch):
+    monkeypatch.setattr(prompt, "_personas", OrderedDict())
+    monkeypatch.setattr(prompt, "PERSONA_CACHE_SIZE", 2)
+    char = {"id": "c1", "name": "Yuki", "background": words(400, "long")}
+    first = prompt.persona_section(char, "Mika")
+    assert "You are Yuki" in first and "with Mika" in first
+    assert count_tokens(first) < 400  # background capped at PERSONA_FIELD_TOKENS
+    assert prompt.persona_section(char, "Ren") == first.replace("Mika", "Ren")
+    assert len(prompt._personas) == 1
+    for other in ("c2", "c3"):
+        prompt.persona_section({"id": other, "name": other}, "Mika")
+    assert len(prompt._personas) == 2
@@ -0,0 +1,47 @@
+# Batched history writes: one insert per turn, and pruning back to his_limit every PRUNE_EVERY writes
+import asyncio
+
+import pytest
+
+import hina
+from fakes import FakeSupabase, seed_history
+
+@pytest.fixture
+def supabase(monkeypatch):
+    fake = FakeSupabase(latency_ms=0)
+    monkeypatch.setattr(hina, "get_supabase", lambda: fake)
+    return fake
+
+def history_of(supabase, user_id, char_id):
+    return hina.get_history(user_id, char_id, limit=10_000)
+
+def test_a_turn_is_one_insert_returned_newest_first(supabase):
+    rows = hina.save_turn("u", "c", "hi", "hello")
+    assert supabase.round_trips == {"history.insert": 1}
+    assert [r["sender"] for r in rows] == ["ai", "user"]
+    assert rows[0]["timestamp"] > rows[1]["timestamp"]
+
+def test_history_within_the_limit_is_never_counted(supabase):
+    seed_history(supabase, "u-short", "c", 5)
+    asyncio.run(hina.maybe_prune("u-short", "c", history_of(supabase, "u-short", "c"), his_limit=10))
+    assert hina.prune_counter.get("u-short:c") is None
+    assert "history.delete" not in supabase.round_trips
+
+def test_prunes_every_nth_write_back_to_the_limit(supabase, monkeypatch):
+    monkeypatch.setattr(hina, "PRUNE_EVERY", 3)
+    seed_history(supabase, "u-long", "c", 8)
+    for turn in range(1, 7):
+        hina.save_turn("u-long", "c", f"q{turn}", f"a{turn}")
+        asyncio.run(hina.maybe_prune("u-long", "c", history_of(supabase, "u-long", "c"), his_limit=8))
+        assert supabase.round_trips["history.delete"] == turn // 3
+    remaining = history_of(supabase, "u-long", "c")
+    assert len(remaining) == 8 and remaining[0]["message"] == "a6"
+
+def test_cutoff_keeps_the_newest_rows(supabase, monkeypatch):
+    monkeypatch.setattr(hina, "PRUNE_EVERY", 1)
+    seed_history(supabase, "u-cut", "c", 12)
+    seed_history(supabase, "u-other", "c", 12)
+    history = history_of(supabase, "u-cut", "c")
+    asyncio.run(hina.maybe_prune("u-cut", "c", history, his_limit=5))
+    assert history_of(supabase, "u-cut", "c") == history[:5]
+    assert len(history_of(supabase, "u-other", "c")) == 12
@@ -0,0 +1,69 @@
+# BM25 "Relevant Chats" index: ranking, incremental add_rows() against a full build, per-pair LRU
+from collections import OrderedDict
+
+import pytest
+
+import retrieval
+from retrieval import BM25Index
+
+MESSAGES = [
+    "We baked a lemon cake together",
+    "The storm knocked the power out last night",
+    "Lemon tea helps when I have a cold",
+    "Do you remember the storm at the lake?",
+    "Let's go hiking in the mountains",
+    "The cake recipe needs more lemon",
+]
+
+def rows(messages, start=0):
+    # newest first, like the history the request fetched
+    return [{"id": f"r{start + i}", "message": m} for i, m in enumerate(messages)][::-1]
+
+@pytest.fixture(autouse=True)
+def fresh_indexes(monkeypatch):
+    monkeypatch.setattr(retrieval, "_indexes", OrderedDict())
+
+def test_best_match_first_and_misses_are_empty():
+    index = retrieval.get_index("u", "c", rows(MESSAGES))
+    assert index.search("lemon cake", k=2) == [MESSAGES[0], MESSAGES[5]]  # shorter message wins the tie
+    assert index.search("storm")[0] in (MESSAGES[1], MESSAGES[3])
+    assert index.search("submarine") == []
+    assert index.search("the and of") == []  # stopwords only
+
+def test_repeated_messages_count_once():
+    index = retrieval.get_index("u", "c", rows(["lemon cake", "lemon cake", "lemon pie"]))
+    assert index.search("lemon", k=3) == ["lemon pie", "lemon cake"]  # equal scores: newest first
+
+def test_add_rows_matches_a_full_build():
+    retrieval.get_index("u", "c", rows(MESSAGES[:4]))
+    retrieval.add_rows("u", "c", rows(MESSAGES[4:], start=4))
+    incremental = retrieval.get_index("u", "c", [])
+    full = BM25Index()
+    for row in reversed(rows(MESSAGES)):
+        full.add(row)
+    assert len(incremental) == len(full) == len(MESSAGES)
+    assert incremental.postings == full.postings
+    for query in ("lemon cake", "storm", "hiking mountains", "cold tea"):
+        assert incremental.search(query) == full.search(query)
+
+def test_add_rows_skips_rows_already_indexed():
+    retrieval.get_index("u", "c", rows(MESSAGES))
+    retrieval.add_rows("u", "c", rows(MESSAGES[:2]))
+    assert len(retrieval.get_index("u", "c", [])) == len(MESSAGES)
+
+def test_add_rows_without_an_index_waits_for_the_next_request():
+    retrieval.add_rows("u", "new", rows(MESSAGES))
+    assert ("u", "new") not in retrieval._indexes
+
+def test_bloated_index_is_rebuilt_from_history():
+    retrieval.get_index("u", "c", rows(MESSAGES))
+    index = retrieval.get_index("u", "c", rows(MESSAGES[-2:], start=4), his_limit=2)
+    assert len(index) == 2
+
+def test_least_recently_used_pair_is_dropped(monkeypatch):
+    monkeypatch.setattr(retrieval, "MAX_INDEXES", 2)
+    for char in ("a", "b"):
+        retrieval.get_index("u", char, rows(MESSAGES))
+    retrieval.get_index("u", "a", [])
+    retrieval.get_index("u", "c", rows(MESSAGES))
+    assert list(retrieval._indexes) == [("u", "a"), ("u", "c")]
@@ -0,0 +1,111 @@
+# ModelSelector: ranking and exploration, circuit breaker, bucket re-sync from x-ratelimit headers
+import pytest
+
+import selector
+from selector import ModelSelector, NoModelAvailable
+from store import KVStore
+from fakes import FakeAPIError
+
+MODELS = ["a", "b", "c"]
+
+@pytest.fixture
+def sel(store_path):
+    return ModelSelector(MODELS, name="test", store=KVStore('selector', path=store_path))
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(selector.time, "time", lambda: now[0])
+    return now
+
+def test_unmeasured_models_follow_list_order(sel):
+    assert sel.ranked() == MODELS
+    assert sel.acquire(explore=False) == "a"
+
+def test_measured_model_stays_ahead_of_unmeasured_ones(sel):
+    sel.record_success("a", ttft=0.8)
+    assert sel.acquire(explore=False) == "a"
+
+def test_fastest_measured_model_wins(sel):
+    sel.record_success("a", ttft=0.8)
+    sel.record_success("c", ttft=0.2)
+    assert sel.ranked() == ["c", "a", "b"]
+
+def test_errors_push_a_model_down(sel):
+    sel.record_success("a", ttft=0.2)
+    sel.record_success("b", ttft=0.3)
+    sel.record_failure("a", RuntimeError("boom"))
+    assert sel.ranked()[0] == "b"
+
+def test_exploring_pick_probes_first_unmeasured_model(sel):
+    sel.record_success("a", ttft=0.2)
+    assert sel.acquire(explore=True) == "b"
+    sel.record_success("b", ttft=0.1)
+    assert sel.acquire(explore=False) == "b"  # The probe found a faster model
+
+def test_explore_rate(monkeypatch, sel):
+    sel.record_success("a", ttft=0.2)
+    monkeypatch.setattr(selector, "EXPLORE_RATE", 0.0)
+    assert {sel.acquire() for _ in range(5)} == {"a"}
+    monkeypatch.setattr(selector, "EXPLORE_RATE", 1.0)
+    assert sel.acquire() == "b"
+
+def test_breaker_opens_after_repeated_failures(sel, clock):
+    for _ in range(selector.FAILURE_THRESHOLD):
+        sel.record_failure("a", RuntimeError("boom"))
+    assert sel.snapshot()["a"]["breaker"] == "open"
+    assert "a" not in sel.ranked()
+
+def test_rate_limit_opens_breaker_for_retry_after(sel, clock):
+    sel.record_failure("a", FakeAPIError(429, "rate limited", {"retry-after": "20"}))
+    assert "a" not in sel.ranked()
+    clock[0] += 21
+    assert "a" in sel.ranked()
+
+def test_half_open_allows_one_probe_then_closes(sel, clock):
+    sel.record_failure("a", FakeAPIError(429, "rate limited", {"retry-after": "5"}))
+    clock[0] += 6
+    assert sel.acquire(exclude=["b", "c"]) == "a"  # The probe
+    with pytest.raises(NoModelAvailable):
+        sel.acquire(exclude=["b", "c"])  # Someone is already probing
+    sel.record_success("a", ttft=0.3)
+    assert sel.snapshot()["a"]["breaker"] == "closed"
+    assert sel.acquire(exclude=["b", "c"]) == "a"
+
+def test_failed_probe_reopens_with_longer_cooldown(sel, clock):
+    sel.record_failure("a", FakeAPIError(429, "rate limited"))
+    first = sel.snapshot()["a"]["open_until"] - clock[0]
+    clock[0] += first + 1
+    sel.acquire(exclude=["b", "c"])
+    sel.record_failure("a", RuntimeError("still down"))
+    entry = sel.snapshot()["a"]
+    assert entry["breaker"] == "open"
+    assert entry["open_until"] - clock[0] > first
+
+def test_headers_resync_buckets(sel, clock):
+    sel.record_success("a", headers={
+        "x-ratelimit-limit-requests": "100",
+        "x-ratelimit-remaining-requests": "1",
+        "x-ratelimit-reset-requests": "1m39s",
+        "x-ratelimit-limit-tokens": "5000",
+        "x-ratelimit-remaining-tokens": "4000",
+        "x-ratelimit-reset-tokens": "12s",
+    })
+    requests = sel.snapshot()["a"]["requests"]
+    assert requests["capacity"] == 100 and requests["level"] == 1
+    assert requests["rate"] == pytest.approx(99 / 99)
+    assert sel.snapshot()["a"]["tokens"]["rate"] == pytest.approx(1000 / 12)
+    assert sel.acquire(exclude=["b", "c"]) == "a"
+    with pytest.raises(NoModelAvailable):
+        sel.acquire(exclude=["b", "c"])  # The one remaining request is spent
+    clock[0] += 1.5  # Refills at the advertised rate
+    assert sel.acquire(exclude=["b", "c"]) == "a"
+
+def test_reserve_keeps_share_of_bucket_free(sel):
+    sel.record_success("a", headers={"x-ratelimit-limit-requests": "10", "x-ratelimit-remaining-requests": "3"})
+    assert "a" in sel.ranked()
+    assert "a" not in sel.ranked(reserve=0.3)
+
+@pytest.mark.parametrize("value,seconds", [("7.66s", 7.66), ("2m59.56s", 179.56), ("120ms", 0.12), ("1h", 3600), ("3", 3.0), (None, None)])
+def test_parse_reset(value, seconds):
+    assert selector.parse_reset(value) == (pytest.approx(seconds) if seconds is not None else None)
@@ -0,0 +1,90 @@
+# KVStore: TTL expiry, LRU eviction per namespace, atomic incr() and update()
+import threading
+
+import pytest
+
+import store
+from store import KVStore
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(store.time, "time", lambda: now[0])
+    return now
+
+def test_values_round_trip_as_json(store_path):
+    kv = KVStore('t', path=store_path)
+    kv.set("k", {"a": [1, 2], "b": None})
+    assert kv.get("k") == {"a": [1, 2], "b": None}
+    assert kv.get("missing", "fallback") == "fallback"
+
+def test_namespaces_do_not_share_keys(store_path):
+    KVStore('one', path=store_path).set("k", 1)
+    assert KVStore('two', path=store_path).get("k") is None
+
+def test_entries_expire_after_ttl(store_path, clock):
+    kv = KVStore('t', ttl=10, path=store_path)
+    kv.set("k", "v")
+    clock[0] += 9
+    assert kv.get("k") == "v"
+    clock[0] += 2
+    assert kv.get("k") is None
+
+def test_per_call_ttl_overrides_the_default(store_path, clock):
+    kv = KVStore('t', ttl=10, path=store_path)
+    kv.set("long", "v", ttl=100)
+    clock[0] += 50
+    assert kv.get("long") == "v"
+
+def test_least_recently_used_entry_is_evicted(store_path, clock):
+    kv = KVStore('t', max_entries=2, path=store_path)
+    kv.set("a", 1)
+    clock[0] += 1
+    kv.set("b", 2)
+    clock[0] += 1
+    assert kv.get("a") == 1  # a is now more recent than b
+    clock[0] += 1
+    kv.set("c", 3)
+    assert (kv.get("a"), kv.get("b"), kv.get("c")) == (1, None, 3)
+
+def test_opening_a_smaller_store_trims_it(store_path, clock):
+    kv = KVStore('t', path=store_path)
+    for i in range(5):
+        clock[0] += 1
+        kv.set(str(i), i)
+    KVStore('t', max_entries=3, path=store_path)
+    assert [kv.get(str(i)) for i in range(5)] == [None, None, 2, 3, 4]
+
+def test_incr_counts_from_zero_and_returns_the_new_value(store_path):
+    kv = KVStore('t', path=store_path)
+    assert kv.incr("n") == 1
+    assert kv.incr("n", 4) == 5
+    assert kv.get("n") == 5
+
+def test_concurrent_incr_loses_no_updates(store_path):
+    kv = KVStore('t', path=store_path)
+    seen = []
+    def worker():
+        seen.extend(kv.incr("n") for _ in range(50))
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert kv.get("n") == 200
+    assert sorted(seen) == list(range(1, 201))
+
+def test_update_stores_the_new_value_and_returns_the_result(store_path):
+    kv = KVStore('t', path=store_path)
+    assert kv.update("k", lambda v: (v + [1], len(v)), default=[]) == 0
+    assert kv.update("k", lambda v: (v + [2], len(v)), default=[]) == 1
+    assert kv.get("k") == [1, 2]
+
+def test_failed_update_leaves_the_value_alone(store_path):
+    kv = KVStore('t', path=store_path)
+    kv.set("k", 1)
+    def boom(value):
+        raise ValueError("no")
+    with pytest.raises(ValueError):
+        kv.update("k", boom)
+    assert kv.get("k") == 1
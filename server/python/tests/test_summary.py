@@ -0,0 +1,63 @@
+# Incremental memory summaries: staleness by watermark, and a refresh folds only the new messages
+import asyncio
+
+import pytest
+
+import hina
+
+def rows(*stamps):
+    # history is newest first
+    return [{"sender": "user", "message": f"m{s}", "timestamp": f"2026-01-01T00:00:{s:02d}"} for s in sorted(stamps, reverse=True)]
+
+@pytest.fixture
+def fake_summarize(monkeypatch):
+    calls = []
+    async def summarize(history, user_name, char_name, char_behavior, sum_pool, metrics, previous=None):
+        calls.append({"history": history, "previous": previous})
+        return f"summary of {len(history)}"
+    monkeypatch.setattr(hina, "summarize_chats", summarize)
+    monkeypatch.setattr(hina, "metrics_sink", lambda record: None)
+    return calls
+
+def test_no_summary_yet_is_stale_once_there_is_history():
+    assert hina.summary_is_stale(None, []) == (False, [])
+    stale, new = hina.summary_is_stale(None, rows(1, 2))
+    assert stale and len(new) == 2
+
+def test_only_messages_past_the_watermark_count(monkeypatch):
+    monkeypatch.setattr(hina, "SUMMARY_EVERY", 3)
+    cached = {"summary": "s", "watermark": rows(4)[0]["timestamp"], "updated": hina.time.time()}
+    stale, new = hina.summary_is_stale(cached, rows(1, 2, 3, 4, 5, 6))
+    assert not stale and [m["message"] for m in new] == ["m6", "m5"]
+    stale, new = hina.summary_is_stale(cached, rows(1, 2, 3, 4, 5, 6, 7))
+    assert stale and len(new) == 3
+
+def test_old_summary_is_stale_only_with_new_messages(monkeypatch):
+    cached = {"summary": "s", "watermark": rows(2)[0]["timestamp"], "updated": hina.time.time() - hina.SUMMARY_TTL - 1}
+    assert hina.summary_is_stale(cached, rows(1, 2))[0] is False
+    assert hina.summary_is_stale(cached, rows(1, 2, 3))[0] is True
+
+def test_refresh_folds_the_delta_into_the_previous_summary(fake_summarize):
+    history = rows(1, 2, 3, 4)
+    cached = {"summary": "old", "watermark": history[2]["timestamp"], "updated": 0}
+    _, new = hina.summary_is_stale(cached, history)
+    asyncio.run(hina.refresh_summary("u-fold", "c", history, cached, new, "U", "C", "kind", None))
+
+    assert fake_summarize == [{"history": new, "previous": "old"}]
+    stored = hina.summary_store.get("u-fold:c")
+    assert stored["summary"] == "summary of 2"
+    assert stored["watermark"] == history[0]["timestamp"]
+
+def test_first_refresh_summarizes_the_whole_history(fake_summarize):
+    history = rows(1, 2, 3)
+    asyncio.run(hina.refresh_summary("u-first", "c", history, None, history, "U", "C", "kind", None))
+    assert fake_summarize == [{"history": history, "previous": None}]
+    assert hina.summary_store.get("u-first:c")["watermark"] == history[0]["timestamp"]
+
+def test_failed_summary_keeps_the_old_entry(monkeypatch, fake_summarize):
+    async def fail(*args, **kwargs):
+        return None
+    monkeypatch.setattr(hina, "summarize_chats", fail)
+    hina.summary_store.set("u-keep:c", {"summary": "old", "watermark": "w", "updated": 1})
+    asyncio.run(hina.refresh_summary("u-keep", "c", rows(1, 2), hina.summary_store.get("u-keep:c"), rows(2), "U", "C", "kind", None))
+    assert hina.summary_store.get("u-keep:c")["summary"] == "old"
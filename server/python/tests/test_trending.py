@@ -0,0 +1,81 @@
+# Trending top-K: incremental record_events() upkeep must match a full rebuild() of the same data
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import trending
+from store import KVStore
+from fakes import mongo_db, seed_media
+
+K = 10
+
+@pytest.fixture
+def index(monkeypatch, store_path):
+    monkeypatch.setattr(trending, "top_index", KVStore('trending_topk', path=store_path))
+    monkeypatch.setattr(trending, "community_index", KVStore('trending_communities', path=store_path))
+
+@pytest.fixture
+def db():
+    db = mongo_db()
+    seed_media(db, characters=5, posts=120)
+    return db
+
+def interact(db, rng, when, count=60):
+    """Likes and comments on random posts, saved the way the routes save them; returns the events"""
+    events = []
+    for i in range(count):
+        post_type, name = rng.choice([('user', 'posts'), ('ai', 'aipost')])
+        doc = rng.choice(list(db[name].find()))
+        last = when + timedelta(seconds=i * 37)
+        last = last.replace(microsecond=last.microsecond // 1000 * 1000)  # Mongo keeps milliseconds
+        update = {"likeCount": doc["likeCount"] + rng.randint(0, 3), "commentCount": doc["commentCount"] + rng.randint(0, 1)}
+        db[name].update_one({"_id": doc["_id"]}, {"$set": dict(update, lastInteractionAt=last)})
+        events.append({"post_id": str(doc["_id"]), "post_type": post_type, "community": doc["community"],
+                       "likes": update["likeCount"], "comments": update["commentCount"], "last": last})
+    return events
+
+def snapshot(now):
+    return {c: [(p["postId"], p["value"]) for p in trending.top(c, K, now=now)] for c in trending.communities()}
+
+def test_incremental_upkeep_matches_a_full_rebuild(index, db):
+    rng = random.Random(3)
+    start = datetime.utcnow()
+    trending.rebuild(db, k=K)
+    for hour in range(3):
+        # Every event carries the post's latest counts, as routes/trending.js sends them
+        events = interact(db, rng, start + timedelta(hours=hour))
+        assert trending.record_events(events, k=K) == len(events)
+    now = (start + timedelta(hours=4)).timestamp()
+    incremental = snapshot(now)
+
+    trending.rebuild(db, k=K)
+    assert snapshot(now) == incremental
+    assert set(incremental) == {"all", "@AICharacters", "@art", "@music", "@books"}
+    assert all(len(posts) == K for posts in incremental.values())
+
+def test_all_list_spans_every_community(index, db):
+    trending.rebuild(db, k=K)
+    events = interact(db, random.Random(5), datetime.utcnow(), count=20)
+    trending.record_events(events, k=K)
+    best = max(events, key=lambda e: trending.hot_key(trending.value_score(e["likes"], e["comments"]), trending.to_epoch(e["last"])))
+    assert trending.top("all", 1)[0]["postId"] == best["post_id"]
+    assert trending.top(best["community"], 1)[0]["postId"] == best["post_id"]
+
+def test_unknown_community_is_added_by_its_first_event(index):
+    assert trending.communities() == ["all"]
+    trending.record_events([{"post_id": "p1", "community": "@new", "likes": 1, "last": 1_700_000_000_000}])
+    assert trending.communities() == ["@new", "all"]
+    assert [p["postId"] for p in trending.top("@new")] == ["p1"]
+
+def test_rebuild_drops_what_an_unlike_left_behind(index, db):
+    trending.rebuild(db, k=K)
+    doc = db["posts"].find_one(sort=[("createdAt", 1)])  # Oldest, so it is nowhere near the top on its own
+    last = datetime.utcnow().replace(microsecond=0)
+    db["posts"].update_one({"_id": doc["_id"]}, {"$set": {"likeCount": 500, "lastInteractionAt": last}})
+    trending.record_events([{"post_id": str(doc["_id"]), "community": doc["community"], "likes": 500, "last": last}], k=K)
+    assert trending.top("all", 1)[0]["postId"] == str(doc["_id"])
+
+    db["posts"].update_one({"_id": doc["_id"]}, {"$set": {"likeCount": 0, "lastInteractionAt": None}})
+    trending.rebuild(db, k=K)
+    assert str(doc["_id"]) not in [p["postId"] for p in trending.top("all", K)]
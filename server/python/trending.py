@@ -0,0 +1,184 @@
+# trending.py
+#
+# Trend and value scores computed lazily instead of rewritten nightly. Nothing decays in Mongo:
+#   trend = max(0, 10 - 0.5 * whole days since createdAt)   (the old nightly rule, evaluated on read)
+#   value = 2 * likes + 3 * comments                        (kept current by $inc on every like/comment)
+#   hot   = (1 + value) * 2 ** -(hours since last interaction / TREND_HALF_LIFE_HOURS)
+# hot is stored as the time-invariant key log2(1 + value) + last_hours / half_life, so two posts
+# keep their relative order as the clock moves and a per-community top-K only has to change when a
+# post is liked or commented on. record_events() applies those changes; rebuild() recomputes every
+# post in vectorized NumPy batches (read-only on Mongo) to seed or reconcile the index.
+import os
+import sys
+import json
+import math
+import time
+import argparse
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from store import KVStore
+
+load_dotenv()
+
+HALF_LIFE_HOURS = float(os.getenv('TREND_HALF_LIFE_HOURS', '24'))
+TOP_K = int(os.getenv('TREND_TOP_K', '50'))
+BATCH_SIZE = int(os.getenv('TREND_BATCH_SIZE', '5000'))
+LIKE_WEIGHT = 2
+COMMENT_WEIGHT = 3
+TREND_START = 10
+TREND_DAILY_DECAY = 0.5
+ALL = "all"  # Index across every community
+
+top_index = KVStore('trending_topk')
+community_index = KVStore('trending_communities')  # "names" -> every community with a list, so readers can refuse unknown ones
+
+def to_epoch(value):
+    # Mongo hands back naive UTC datetimes; Node sends epoch milliseconds
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value) / 1000
+
+def value_score(likes, comments):
+    return LIKE_WEIGHT * likes + COMMENT_WEIGHT * comments
+
+def trend_score(created_at, now=None):
+    now = time.time() if now is None else now
+    days = math.floor(max(0.0, now - created_at) / 86400)
+    return max(0.0, TREND_START - TREND_DAILY_DECAY * days)
+
+def hot_key(value, last_interaction):
+    return math.log2(1 + max(0, value)) + last_interaction / 3600 / HALF_LIFE_HOURS
+
+def hot_score(key, now=None):
+    now = time.time() if now is None else now
+    return 2 ** (key - now / 3600 / HALF_LIFE_HOURS)
+
+def score_batch(created, last, likes, comments, now=None):
+    """Vectorized scores for parallel arrays (epoch seconds, counts); last may hold NaN for never touched"""
+    import numpy as np  # Deferred: only batch recomputes need NumPy
+    now = time.time() if now is None else now
+    created = np.asarray(created, dtype=np.float64)
+    last = np.asarray(last, dtype=np.float64)
+    last = np.where(np.isnan(last), created, np.maximum(last, created))
+    value = LIKE_WEIGHT * np.asarray(likes, dtype=np.float64) + COMMENT_WEIGHT * np.asarray(comments, dtype=np.float64)
+    days = np.floor(np.maximum(0.0, now - created) / 86400)
+    trend = np.maximum(0.0, TREND_START - TREND_DAILY_DECAY * days)
+    key = np.log2(1 + np.maximum(0.0, value)) + last / 3600 / HALF_LIFE_HOURS
+    hot = np.exp2(key - now / 3600 / HALF_LIFE_HOURS)
+    return {"trend": trend, "old": trend <= 0, "value": value, "last": last, "key": key, "hot": hot}
+
+# ----------------------
+# Incremental top-K
+# ----------------------
+# Each community keeps [[post_id, post_type, value, last, key], ...] sorted by key, best first
+def _merge(entries, updates, k):
+    by_id = {e[0]: e for e in entries or []}
+    for update in updates:
+        by_id[update[0]] = update
+    merged = sorted(by_id.values(), key=lambda e: e[4], reverse=True)
+    return merged[:k]
+
+def record_events(events, k=TOP_K):
+    """events: dicts with post_id, post_type, community, likes, comments and last (epoch ms or datetime)"""
+    by_community = {}
+    for event in events:
+        value = value_score(event.get("likes", 0), event.get("comments", 0))
+        last = to_epoch(event.get("last")) or time.time()
+        entry = [str(event["post_id"]), event.get("post_type", "user"), value, last, hot_key(value, last)]
+        for community in {event.get("community") or ALL, ALL}:
+            by_community.setdefault(community, []).append(entry)
+    # An unlike lowers a key; the entry stays until something outranks it or the next rebuild
+    for community, updates in by_community.items():
+        top_index.update(community, lambda entries: (_merge(entries, updates, k), None), default=[])
+    community_index.update("names", lambda names: (sorted(set(names) | set(by_community)), None), default=[])
+    return len(events)
+
+def communities():
+    return community_index.get("names", [ALL])
+
+def top(community=ALL, limit=TOP_K, now=None):
+    now = time.time() if now is None else now
+    entries = top_index.get(community, [])[:limit]
+    return [{
+        "postId": post_id,
+        "postType": post_type,
+        "value": value,
+        "hot": round(hot_score(key, now), 4),
+        "lastInteraction": int(last * 1000),
+    } for post_id, post_type, value, last, key in entries]
+
+# ----------------------
+# Batch recompute
+# ----------------------
+FIELDS = {"_id": 1, "community": 1, "createdAt": 1, "lastInteractionAt": 1, "likeCount": 1, "commentCount": 1}
+
+def _batches(collection):
+    batch = []
+    for doc in collection.find({}, FIELDS).batch_size(BATCH_SIZE):
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def rebuild(db, k=TOP_K, now=None):
+    """Recompute every post in NumPy batches and replace each community's top-K; never writes to Mongo"""
+    import numpy as np
+    started = time.monotonic()
+    now = time.time() if now is None else now
+    best = {}  # community -> entries, trimmed to k after every batch
+    scanned = 0
+    for post_type, name in (('user', 'posts'), ('ai', 'aipost')):
+        for docs in _batches(db[name]):
+            created = [to_epoch(d.get('createdAt')) or now for d in docs]
+            last = [to_epoch(d.get('lastInteractionAt')) or np.nan for d in docs]
+            scores = score_batch(created, last, [d.get('likeCount', 0) or 0 for d in docs],
+                                 [d.get('commentCount', 0) or 0 for d in docs], now)
+            keys = scores["key"]
+            communities = np.array([d.get('community') or ALL for d in docs], dtype=object)
+            for community in set(communities.tolist()) | {ALL}:
+                rows = np.arange(len(docs)) if community == ALL else np.flatnonzero(communities == community)
+                if len(rows) > k:
+                    rows = rows[np.argpartition(-keys[rows], k - 1)[:k]]
+                entries = [[str(docs[i]['_id']), post_type, float(scores["value"][i]), float(scores["last"][i]), float(keys[i])]
+                           for i in rows]
+                best[community] = _merge(best.get(community), entries, k)
+            scanned += len(docs)
+    for community, entries in best.items():
+        top_index.set(community, entries)
+    community_index.set("names", sorted(best))
+    return {"posts": scanned, "communities": len(best), "names": sorted(best),
+            "seconds": round(time.monotonic() - started, 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Lazy trend scores and per-community trending index")
+    parser.add_argument('--rebuild', action='store_true', help="recompute every post and reseed the top-K index")
+    parser.add_argument('--events', action='store_true', help="apply NDJSON like/comment events from stdin")
+    parser.add_argument('--top', metavar='COMMUNITY', help="print the trending posts of a community ('all' for every one)")
+    parser.add_argument('--communities', action='store_true', help="print the communities the index has lists for")
+    parser.add_argument('--limit', type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    if args.rebuild:
+        import clients
+        print(json.dumps(rebuild(clients.mongo()['aiova'])))
+    elif args.events:
+        events = [json.loads(line) for line in sys.stdin if line.strip()]
+        applied = record_events(events)
+        # The updated lists go back to the caller, so Node can serve them without asking again
+        touched = {e.get("community") or ALL for e in events} | {ALL}
+        print(json.dumps({"applied": applied, "top": {c: top(c, args.limit) for c in touched}}))
+    elif args.top:
+        print(json.dumps(top(args.top, args.limit)))
+    elif args.communities:
+        print(json.dumps(communities()))
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -5,33 +5,90 @@ const Character = require('../models/Character');
 const path = require('path');
 const fs = require('fs');
 const { spawn } = require('child_process');
+const readline = require('readline');
 let timeoutId = null;
 
+// Characters per run; >1 switches postMaker.py to NDJSON batch mode
+const BATCH_SIZE = parseInt(process.env.AIPOST_BATCH_SIZE || '1', 10);
+
+const toInputData = (charRand) => ({
+  name: charRand.name || 'Unknown',
+  behavior: charRand.behavior || '',
+  background: charRand.background || '',
+  relationships: charRand.relationships || 'No relationship details available.',
+  tags: charRand.tags || '',
+  link: charRand.link || 'https://ik.imagekit.io/souravdpal/default-avatar.png',
+  character_id: charRand.id
+});
+
+const saveAIPost = async (charRand, responseData) => {
+  const post = new AIPost({
+    authorId: charRand.id,
+    authorName: charRand.name || 'Unknown',
+    authorPhoto: charRand.link || 'https://ik.imagekit.io/souravdpal/default-avatar.png',
+    community: '@AICharacters',
+    content: `<p>${responseData.post}</p>`,
+    viewCount: 0,
+    likeCount: 0,
+    commentCount: 0,
+    likedBy: [],
+    trend: 10,
+    value: 0,
+    createdAt: new Date()
+  });
+
+  await post.save();
+  console.log(`[${new Date().toISOString()}] AI post created: ${post._id}`);
+};
+
+// Batch run: one python process, one NDJSON result line per character saved as soon as it arrives
+const postBatch = (characters, pythonScriptPath) => {
+  const byId = new Map(characters.map((c) => [String(c.id), c]));
+  const py = spawn('python3', ['-u', pythonScriptPath, '--batch']);
+  const saves = [];
+
+  readline.createInterface({ input: py.stdout }).on('line', (line) => {
+    let responseData;
+    try {
+      responseData = JSON.parse(line);
+    } catch (e) {
+      console.error(`Failed to parse Python output: ${line}`, e);
+      return;
+    }
+    const charRand = byId.get(String(responseData.character_id));
+    if (responseData.error || !charRand) {
+      console.error(`[Python] Post failed for ${responseData.character_id}: ${responseData.error || 'unknown character'}`);
+      return;
+    }
+    saves.push(saveAIPost(charRand, responseData).catch((e) => console.error('Failed to save AI post:', e)));
+  });
+  py.stderr.on('data', (data) => console.error(`[Python stderr] ${data}`));
+
+  py.on('close', async (code) => {
+    if (code !== 0) console.error(`Python exited with code ${code}`);
+    await Promise.all(saves);
+    console.log(`[${new Date().toISOString()}] Batch finished: ${saves.length}/${characters.length} posts`);
+    scheduleNextPost();
+  });
+
+  for (const charRand of characters) {
+    py.stdin.write(JSON.stringify(toInputData(charRand)) + '\n');
+  }
+  py.stdin.end();
+};
+
 const postLoop = async () => {
   try {
     const fetchTimestamp = new Date().toISOString();
     console.log(`[${fetchTimestamp}] Fetching random character from MongoDB`);
     
-    const randomChar = await Character.aggregate([{ $sample: { size: 1 } }]);
+    const randomChar = await Character.aggregate([{ $sample: { size: Math.max(1, BATCH_SIZE) } }]);
     if (!randomChar.length) {
       console.error(`[${fetchTimestamp}] No characters found in database`);
       scheduleNextPost();
       return;
     }
 
-    const charRand = randomChar[0];
-    console.log(`[${fetchTimestamp}] Selected character: ${charRand.name} (ID: ${charRand.id})`);
-
-    const inputData = {
-      name: charRand.name || 'Unknown',
-      behavior: charRand.behavior || '',
-      background: charRand.background || '',
-      relationships: charRand.relationships || 'No relationship details available.',
-      tags: charRand.tags || '',
-      link: charRand.link || 'https://ik.imagekit.io/souravdpal/default-avatar.png',
-      character_id: charRand.id
-    };
-
     const pythonScriptPath = path.resolve(__dirname, '../python/postMaker.py');
     if (!fs.existsSync(pythonScriptPath)) {
       console.error(`[${fetchTimestamp}] Python script not found`);
@@ -39,6 +96,17 @@ const postLoop = async () => {
       return;
     }
 
+    if (BATCH_SIZE > 1) {
+      console.log(`[${fetchTimestamp}] Executing Python batch for ${randomChar.length} characters`);
+      postBatch(randomChar, pythonScriptPath);
+      return;
+    }
+
+    const charRand = randomChar[0];
+    console.log(`[${fetchTimestamp}] Selected character: ${charRand.name} (ID: ${charRand.id})`);
+
+    const inputData = toInputData(charRand);
+
     console.log(`[${fetchTimestamp}] Executing Python script`);
     const py = spawn('python3', [pythonScriptPath]);
 
@@ -55,23 +123,7 @@ const postLoop = async () => {
 
       try {
         const responseData = JSON.parse(output.trim());
-        const post = new AIPost({
-          authorId: charRand.id,
-          authorName: charRand.name || 'Unknown',
-          authorPhoto: charRand.link || 'https://ik.imagekit.io/souravdpal/default-avatar.png',
-          community: '@AICharacters',
-          content: `<p>${responseData.post}</p>`,
-          viewCount: 0,
-          likeCount: 0,
-          commentCount: 0,
-          likedBy: [],
-          trend: 10,
-          value: 0,
-          createdAt: new Date()
-        });
-
-        await post.save();
-        console.log(`[${new Date().toISOString()}] AI post created: ${post._id}`);
+        await saveAIPost(charRand, responseData);
       } catch (e) {
         console.error(`Failed to parse Python output: ${output}`, e);
       }
@@ -95,8 +147,8 @@ const scheduleNextPost = () => {
   timeoutId = setTimeout(postLoop, randomInterval);
 };
 
-// Start loop automatically when server boots
-postLoop();
+// Start loop automatically when server boots, unless python/scheduler.py drives AI posts
+if (process.env.AI_SCHEDULER !== '1') postLoop();
 
 // Keep your control route if you still want to start/stop manually
 router.post('/control-python', (req, res) => {
@@ -16,8 +16,14 @@ if (!supabaseUrl || !supabaseKey) {
 const supabase = createClient(supabaseUrl, supabaseKey);
 
 // GET /history
+// Newest first. Pass `before` (a row timestamp, e.g. the last row of the previous page or the
+// `before` cursor from a chat metadata event) to page backwards; `offset` is kept for old clients.
+// The cursor for the next page is returned in the X-Next-Cursor header.
+const MAX_HISTORY_PAGE = 100;
+
 router.get('/history', async (req, res) => {
-    const { user_id, char_id, uid, offset = 0, limit = 10 } = req.query;
+    const { user_id, char_id, uid, offset = 0, before } = req.query;
+    const limit = Math.min(parseInt(req.query.limit || '10', 10) || 10, MAX_HISTORY_PAGE);
     let userIdHeader = user_id;
 
     // Validate inputs
@@ -30,23 +36,27 @@ router.get('/history', async (req, res) => {
     }
 
     try {
-        const { data, error } = await supabase
+        let query = supabase
             .from('history')
             .select('*')
             .eq('user_id', user_id)
             .eq('char_id', char_id)
-            .order('timestamp', { ascending: false })
-            .range(
-                parseInt(offset),
-                parseInt(offset) + parseInt(limit) - 1
-            );
+            .order('timestamp', { ascending: false });
+        if (before) {
+            query = query.lt('timestamp', before).limit(limit);
+        } else {
+            query = query.range(parseInt(offset), parseInt(offset) + limit - 1);
+        }
+        const { data, error } = await query;
 
         if (error) {
             console.error('Supabase query error:', error);
             return res.status(500).json({ error: 'Failed to fetch history', details: error.message });
         }
 
-        res.status(200).json(data || []);
+        const rows = data || [];
+        if (rows.length === limit) res.set('X-Next-Cursor', rows[rows.length - 1].timestamp);
+        res.status(200).json(rows);
     } catch (err) {
         console.error('Server error:', err);
         res.status(500).json({ error: 'Internal server error', details: err.message });
@@ -6,6 +6,7 @@ const AIPost = require('../models/AIPost');
 const User = require('../models/User');
 const Character = require('../models/Character');
 const Notification = require('../models/getnot.js');
+const trending = require('./trending');
 
 router.post('/com', async (req, res) => {
   const { query: postId } = req.body;
@@ -116,7 +117,10 @@ router.post('/add/comment', async (req, res) => {
 
     await comment.save();
     post.commentCount = (post.commentCount || 0) + 1;
+    post.value = trending.valueOf(post);
+    post.lastInteractionAt = new Date();
     await post.save();
+    trending.recordEvent(post, isAICharacter);
     console.log('Comment saved for post ID:', postid, 'Comment ID:', comment._id);
 
     // Create notification for post author (if not self-commenting)
@@ -85,10 +85,10 @@ router.post('/hina/ai/:id', async (req, res) => {
         const result = await runPython(input);
 
         let replyText = result.reply || result.answer || "";
-        console.log("Python response:", replyText);
+        console.log(`Python response (${result.source || 'llm'}${result.confidence !== undefined ? `, confidence ${result.confidence}` : ''}):`, replyText);
 
         let match = replyText.match(/json\s*({[\s\S]*})/);
-        let obj = match ? json_Filter(match[1]) : { execute: null, answer: replyText };
+        let obj = match ? json_Filter(match[1]) : { execute: result.execute || null, answer: replyText };
 
         if (!obj || !obj.answer) {
             console.warn("No valid answer in response:", obj);
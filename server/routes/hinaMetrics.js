@@ -0,0 +1,64 @@
+// routes/hinaMetrics.js
+// Rolling aggregator for the structured records hina.py emits (`event: metrics` frames per chat and
+// { metrics } lines for background jobs). Keeps the last HINA_METRICS_WINDOW records in memory and
+// reports p50/p95/p99 per stage and per model.
+const WINDOW = parseInt(process.env.HINA_METRICS_WINDOW || '2000', 10);
+
+const records = [];
+let pools = null;  // Latest client pool snapshot (clients.py pool_stats) from the worker
+
+const record = (metrics) => {
+  if (!metrics || typeof metrics !== 'object') return;
+  if (metrics.pools) pools = metrics.pools;
+  records.push(metrics);
+  if (records.length > WINDOW) records.splice(0, records.length - WINDOW);
+};
+
+const percentiles = (values) => {
+  if (!values.length) return null;
+  const sorted = [...values].sort((a, b) => a - b);
+  const at = (p) => sorted[Math.min(sorted.length - 1, Math.round((p / 100) * (sorted.length - 1)))];
+  return { count: sorted.length, p50: at(50), p95: at(95), p99: at(99) };
+};
+
+const push = (map, key, value) => {
+  if (value === null || value === undefined) return;
+  if (!map[key]) map[key] = [];
+  map[key].push(value);
+};
+
+const summary = () => {
+  const stages = {};   // "<kind>.<stage>" -> ms samples
+  const models = {};   // model -> { attempt ms samples, outcomes }
+  const ttft = {};     // chosen chat model -> ttft ms samples
+  let retries = 0;
+  let hedges = 0;
+
+  for (const m of records) {
+    push(stages, `${m.kind}.total`, m.total_ms);
+    for (const [stage, ms] of Object.entries(m.stages || {})) push(stages, `${m.kind}.${stage}`, ms);
+    for (const attempt of (m.models && m.models.attempts) || []) {
+      if (!models[attempt.model]) models[attempt.model] = { ms: [], outcomes: {} };
+      const entry = models[attempt.model];
+      push(entry, 'ms', attempt.ms);
+      entry.outcomes[attempt.outcome] = (entry.outcomes[attempt.outcome] || 0) + 1;
+    }
+    const chosen = m.models && m.models.chosen && m.models.chosen.chat;
+    if (chosen) push(ttft, chosen, m.ttft_ms);
+    retries += m.retries || 0;
+    hedges += m.hedges || 0;
+  }
+
+  const result = { window: records.length, retries, hedges, pools, stages: {}, models: {} };
+  for (const [stage, values] of Object.entries(stages)) result.stages[stage] = percentiles(values);
+  for (const [model, entry] of Object.entries(models)) {
+    result.models[model] = {
+      attempt_ms: percentiles(entry.ms),
+      ttft_ms: percentiles(ttft[model] || []),
+      outcomes: entry.outcomes
+    };
+  }
+  return result;
+};
+
+module.exports = { record, summary };
@@ -0,0 +1,99 @@
+// routes/hinaPool.js
+// Small pool of long-lived `hina.py --worker` processes. Each request is written to a worker as one
+// JSON line ({ id, payload }) and the worker streams back { id, frame } lines until { id, done }.
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+const { randomUUID } = require('crypto');
+const hinaMetrics = require('./hinaMetrics');
+
+const pythonScriptPath = path.resolve(__dirname, '../python/hina.py');
+const POOL_SIZE = parseInt(process.env.HINA_WORKERS || '2', 10);
+const RESPAWN_DELAY_MS = 1000;
+
+const workers = [];
+
+const startWorker = (slot) => {
+  const py = spawn('python3', ['-u', pythonScriptPath, '--worker'], {
+    stdio: ['pipe', 'pipe', 'pipe']
+  });
+  const worker = { py, pending: new Map(), alive: true };
+  workers[slot] = worker;
+
+  readline.createInterface({ input: py.stdout }).on('line', (line) => {
+    let msg;
+    try {
+      msg = JSON.parse(line);
+    } catch (e) {
+      console.error(`[hina worker ${slot}] Bad frame from Python: ${line}`);
+      return;
+    }
+    if (msg.metrics) {
+      // Background job record (e.g. summary refresh), not tied to a request
+      hinaMetrics.record(msg.metrics);
+      return;
+    }
+    const handlers = worker.pending.get(msg.id);
+    if (!handlers) return;
+    if (msg.frame !== undefined) handlers.onFrame(msg.frame);
+    if (msg.done) {
+      worker.pending.delete(msg.id);
+      handlers.onDone(msg.code || 0);
+    }
+  });
+
+  py.stderr.on('data', (data) => {
+    console.error(`[hina worker ${slot}] ${data}`);
+  });
+
+  // stdin errors (EPIPE) surface through 'exit' below
+  py.stdin.on('error', (err) => {
+    console.error(`[hina worker ${slot}] stdin error:`, err.message);
+  });
+
+  py.on('exit', (code) => {
+    worker.alive = false;
+    console.error(`[hina worker ${slot}] exited with code ${code}, respawning`);
+    for (const handlers of worker.pending.values()) {
+      handlers.onDone(code === null ? 1 : code || 1);
+    }
+    worker.pending.clear();
+    setTimeout(() => startWorker(slot), RESPAWN_DELAY_MS);
+  });
+};
+
+// Least-loaded live worker
+const pickWorker = () => {
+  let best = null;
+  for (const worker of workers) {
+    if (!worker || !worker.alive) continue;
+    if (!best || worker.pending.size < best.pending.size) best = worker;
+  }
+  return best;
+};
+
+// Submit a chat request; returns a cancel function
+const submit = (payload, { onFrame, onDone }) => {
+  const worker = pickWorker();
+  if (!worker) {
+    onFrame(`event: error\ndata: ${JSON.stringify({ error: 'No chat worker available' })}\n\n`);
+    onDone(1);
+    return () => {};
+  }
+  const id = randomUUID();
+  worker.pending.set(id, { onFrame, onDone });
+  worker.py.stdin.write(JSON.stringify({ id, payload }) + '\n');
+
+  return () => {
+    if (worker.alive && worker.pending.has(id)) {
+      worker.pending.delete(id);
+      worker.py.stdin.write(JSON.stringify({ id, cancel: true }) + '\n');
+    }
+  };
+};
+
+for (let slot = 0; slot < Math.max(1, POOL_SIZE); slot++) {
+  startWorker(slot);
+}
+
+module.exports = { submit };
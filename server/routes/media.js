@@ -11,8 +11,12 @@ const runPythonLoop = () => {
   try {
     const pythonScriptPath = path.resolve(__dirname, '../python/mediaHandler.py');
 
+    // Batch mode evaluates many characters x posts per run (sizes come from MEDIA_BATCH_* env)
+    const args = ['-u', pythonScriptPath];
+    if (process.env.MEDIA_BATCH === '1') args.push('--batch');
+
     // Spawn Python process with unbuffered output
-    const py = spawn('python3', ['-u', pythonScriptPath], {
+    const py = spawn('python3', args, {
       stdio: ['pipe', 'pipe', 'pipe'] // stdin, stdout, stderr
     });
 
@@ -48,8 +52,7 @@ const scheduleNextRun = () => {
   timeoutId = setTimeout(runPythonLoop, randomInterval);
 };
 
-// Start automatically on server boot
-runPythonLoop();
+// server.js starts it on boot unless AI_SCHEDULER=1 hands the work to python/scheduler.py
 
 // Optional control functions for manual start/stop
 const stopLoop = () => {
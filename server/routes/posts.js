@@ -6,6 +6,7 @@ const User = require('../models/User');
 const Character = require('../models/Character');
 const Notification = require('../models/getnot.js');
 const Comment = require('../models/Comment');
+const trending = require('./trending');
 
 router.post('/api/posts', async (req, res) => {
     console.log('POST /api/posts request:', { body: req.body });
@@ -140,7 +141,10 @@ router.post('/api/posts/:postId/like/:userId', async (req, res) => {
             }
         }
 
+        post.value = trending.valueOf(post);
+        post.lastInteractionAt = new Date();
         await post.save();
+        trending.recordEvent(post, isAICharacter);
         res.status(200).json({
             likeCount: post.likeCount,
             likedBy: post.likedBy,
@@ -168,13 +172,13 @@ router.get('/api/posts', async (req, res) => {
 
         const [posts, aiPosts] = await Promise.all([
             Post.find(query)
-                .sort({ value: -1, trend: -1, createdAt: -1 })
+                .sort({ createdAt: -1, value: -1 })
                 .skip(skip)
                 .limit(limitNum)
                 .lean(),
             community === 'all' || community === '@AICharacters' || community === 'Characters'
                 ? AIPost.find({ ...query, community: '@AICharacters' })
-                    .sort({ value: -1, trend: -1, createdAt: -1 })
+                    .sort({ createdAt: -1, value: -1 })
                     .skip(skip)
                     .limit(limitNum)
                     .lean()
@@ -224,7 +228,7 @@ router.get('/api/posts', async (req, res) => {
                 likeCount: post.likeCount || 0,
                 commentCount: post.commentCount || 0,
                 likedBy: post.likedBy || [],
-                trend: post.trend || 0,
+                trend: trending.trendOf(post),
                 value: post.value || 0,
                 comments: []
             };
@@ -280,13 +284,13 @@ router.post('/api/posts/priority', async (req, res) => {
         let allPosts = [];
         if (community === 'all') {
             const allIds = await Promise.all([
-                Post.find(query).sort({ value: -1, trend: -1, createdAt: -1 }).skip(skip).limit(limitNum).select('_id').lean(),
-                AIPost.find({ ...query, community: '@AICharacters' }).sort({ value: -1, trend: -1, createdAt: -1 }).skip(skip).limit(limitNum).select('_id').lean()
+                Post.find(query).sort({ createdAt: -1, value: -1 }).skip(skip).limit(limitNum).select('_id').lean(),
+                AIPost.find({ ...query, community: '@AICharacters' }).sort({ createdAt: -1, value: -1 }).skip(skip).limit(limitNum).select('_id').lean()
             ]);
             const ids = [...allIds[0], ...allIds[1]].map(p => p._id).slice(0, limitNum);
             allPosts = await Promise.all([
-                Post.find({ _id: { $in: ids } }).sort({ value: -1, trend: -1, createdAt: -1 }).lean(),
-                AIPost.find({ _id: { $in: ids } }).sort({ value: -1, trend: -1, createdAt: -1 }).lean()
+                Post.find({ _id: { $in: ids } }).sort({ createdAt: -1, value: -1 }).lean(),
+                AIPost.find({ _id: { $in: ids } }).sort({ createdAt: -1, value: -1 }).lean()
             ]);
             allPosts = [...allPosts[0], ...allPosts[1]]
                 .filter((post, index, self) => self.findIndex(p => p._id.toString() === post._id.toString()) === index)
@@ -294,9 +298,9 @@ router.post('/api/posts/priority', async (req, res) => {
                 .slice(0, limitNum);
         } else {
             const [posts, aiPosts] = await Promise.all([
-                Post.find(query).sort({ value: -1, trend: -1, createdAt: -1 }).skip(skip).limit(limitNum).lean(),
+                Post.find(query).sort({ createdAt: -1, value: -1 }).skip(skip).limit(limitNum).lean(),
                 community === '@AICharacters' || community === '@Characters'
-                    ? AIPost.find({ ...query, community: '@AICharacters' }).sort({ value: -1, trend: -1, createdAt: -1 }).skip(skip).limit(limitNum).lean()
+                    ? AIPost.find({ ...query, community: '@AICharacters' }).sort({ createdAt: -1, value: -1 }).skip(skip).limit(limitNum).lean()
                     : []
             ]);
             allPosts = [...posts, ...aiPosts]
@@ -343,7 +347,7 @@ router.post('/api/posts/priority', async (req, res) => {
                 likeCount: post.likeCount || 0,
                 commentCount: post.commentCount || 0,
                 likedBy: post.likedBy || [],
-                trend: post.trend || 0,
+                trend: trending.trendOf(post),
                 value: post.value || 0,
                 comments: []
             };
@@ -378,9 +382,9 @@ router.get('/api/posts/search', async (req, res) => {
         }
 
         const [posts, aiPosts] = await Promise.all([
-            Post.find(postQuery).sort({ value: -1, trend: -1, createdAt: -1 }).skip(skip).limit(limitNum).lean(),
+            Post.find(postQuery).sort({ createdAt: -1, value: -1 }).skip(skip).limit(limitNum).lean(),
             community === 'all' || community === '@AICharacters' || community === 'Characters'
-                ? AIPost.find({ ...postQuery, community: '@AICharacters' }).sort({ value: -1, trend: -1, createdAt: -1 }).skip(skip).limit(limitNum).lean()
+                ? AIPost.find({ ...postQuery, community: '@AICharacters' }).sort({ createdAt: -1, value: -1 }).skip(skip).limit(limitNum).lean()
                 : []
         ]);
 
@@ -427,7 +431,7 @@ router.get('/api/posts/search', async (req, res) => {
                 likeCount: post.likeCount || 0,
                 commentCount: post.commentCount || 0,
                 likedBy: post.likedBy || [],
-                trend: post.trend || 0,
+                trend: trending.trendOf(post),
                 value: post.value || 0,
                 comments: []
             };
@@ -1,11 +1,11 @@
 const express = require('express');
-const { spawn } = require('child_process');
-const path = require('path');
-const fs = require('fs');
 const router = express.Router();
 const mongo = require('mongoose')
 const User = require('../models/User')
 const ApiKey = require('../models/ApiKey')
+const hinaPool = require('./hinaPool')
+const hinaMetrics = require('./hinaMetrics')
+const scheduler = require('./scheduler')
 
 router.post('/ai', async (req, res) => {
     try {
@@ -31,82 +31,43 @@ router.post('/ai', async (req, res) => {
             return res.status(400).json({ error: 'Missing required fields: char and user' });
         }
 
-        const pythonScriptPath = path.resolve(__dirname, '../python/hina.py');
-        if (!fs.existsSync(pythonScriptPath)) {
-            return res.status(500).json({ error: `Python script not found at ${pythonScriptPath}` });
-        }
-
-        const py = spawn('python3', [pythonScriptPath]);
-        let errorOutput = '';
-        let modelTries = [];
-        let successfulModel = null;
-        let failedModels = [];
-
         // Set headers for streaming
         res.setHeader('Content-Type', 'text/event-stream');
         res.setHeader('Cache-Control', 'no-cache');
         res.setHeader('Connection', 'keep-alive');
 
-        // Stream stdout to response and parse for model info
-        py.stdout.on('data', (data) => {
-            const output = data.toString();
-            res.write(data); // Stream to client
-
-            // Parse for model tries and success
-            if (output.includes('Trying model:')) {
-                const model = output.split('Trying model: ')[1]?.split('\n')[0]?.trim();
-                if (model) {
-                    modelTries.push(model);
-                    console.log(`Model tried: ${model}`);
+        // Stream worker frames to the response; the per-request metrics record stays server-side
+        let sentError = false;
+        const onFrame = (output) => {
+            if (output.startsWith('event: metrics\n')) {
+                try {
+                    const metrics = JSON.parse(output.slice(output.indexOf('data: ') + 6));
+                    hinaMetrics.record(metrics);
+                    const chosen = metrics.models.chosen.chat || 'none';
+                    const tried = metrics.models.attempts.map((a) => `${a.model}:${a.outcome}`).join(', ');
+                    console.log(`[${new Date().toISOString()}] Chat ${metrics.total_ms}ms, ttft ${metrics.ttft_ms}ms, model ${chosen} (tried ${tried}), ${metrics.retries} retries, ${metrics.hedges} hedges`);
+                } catch (e) {
+                    console.error('Bad metrics frame from Python:', e.message);
                 }
+                return;
             }
-            if (output.includes('Model') && output.includes('selected for response')) {
-                const model = output.split('Model ')[1]?.split(' selected for response')[0]?.trim();
-                if (model) {
-                    successfulModel = model;
-                    console.log(`Successful model: ${successfulModel}`);
-                }
-            }
-            if (output.includes('Summary model selected:')) {
-                const model = output.split('Summary model selected: ')[1]?.split('\n')[0]?.trim();
-                if (model) {
-                    modelTries.push(model);
-                    console.log(`Summary model tried: ${model}`);
-                }
-            }
-        });
+            if (output.startsWith('event: error\n')) sentError = true;
+            res.write(output); // Stream to client
+        };
 
-        py.stderr.on('data', (data) => {
-            errorOutput += data.toString();
-            console.error(`Python stderr: ${data}`);
-            // Parse stderr for failed model attempts
-            if (data.toString().includes('Model') && data.toString().includes('failed')) {
-                const model = data.toString().split('Model ')[1]?.split(' failed')[0]?.trim();
-                if (model && !failedModels.includes(model)) {
-                    failedModels.push(model);
-                    console.log(`Model failed: ${model}`);
-                }
-            }
-        });
-
-        py.on('close', (code) => {
-            if (code !== 0) {
-                res.write(`event: error\ndata: ${JSON.stringify({ error: `Python exited with code ${code}`, details: errorOutput })}\n\n`);
-            }
-            // Summarize model attempts
-            console.log(`Model try summary: ${modelTries.length} models tried (${modelTries.join(', ')})`);
-            console.log(`Failed models: ${failedModels.length} (${failedModels.join(', ') || 'none'})`);
-            if (successfulModel) {
-                console.log(`Response generated by: ${successfulModel}`);
-            } else {
-                console.log('No model succeeded in generating a response');
+        const onDone = (code) => {
+            // The worker (or the pool) usually reports its own error frame; only add one if it didn't
+            if (code !== 0 && !sentError) {
+                res.write(`event: error\ndata: ${JSON.stringify({ error: `Chat worker finished with code ${code}` })}\n\n`);
             }
             res.end();
-        });
+        };
 
-        // Send data to Python
-        py.stdin.write(JSON.stringify(inputData) + '\n');
-        py.stdin.end();
+        // Send data to the long-lived Python worker pool
+        const cancel = hinaPool.submit(inputData, { onFrame, onDone });
+        res.on('close', () => {
+            if (!res.writableEnded) cancel();
+        });
 
     } catch (err) {
         console.error("Unexpected error:", err);
@@ -114,4 +75,11 @@ router.post('/ai', async (req, res) => {
     }
 });
 
+// Rolling p50/p95/p99 per stage and per model (opt-in with HINA_METRICS_ENDPOINT=1)
+if (process.env.HINA_METRICS_ENDPOINT === '1') {
+    router.get('/metrics', (req, res) => {
+        res.json({ ...hinaMetrics.summary(), scheduler: scheduler.stats() });
+    });
+}
+
 module.exports = router;
\ No newline at end of file
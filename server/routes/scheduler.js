@@ -0,0 +1,47 @@
+// routes/scheduler.js
+// With AI_SCHEDULER=1 one long-lived `scheduler.py` daemon drives AI posts, likes and comments under
+// the shared Groq budget, instead of the random timers in routes/media.js and routes/Aipost.js.
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+const pythonScriptPath = path.resolve(__dirname, '../python/scheduler.py');
+const RESPAWN_DELAY_MS = 5000;
+
+const enabled = process.env.AI_SCHEDULER === '1';
+let py = null;
+let latest = null;  // Last {"scheduler": ...} stats line
+let stopped = false;
+
+const start = () => {
+  stopped = false;
+  py = spawn('python3', ['-u', pythonScriptPath], { stdio: ['ignore', 'pipe', 'pipe'] });
+
+  readline.createInterface({ input: py.stdout }).on('line', (line) => {
+    if (line.startsWith('{"scheduler"')) {
+      try {
+        latest = JSON.parse(line).scheduler;
+      } catch (e) {
+        // Fall through and log it as text
+      }
+    }
+    process.stdout.write(`[Scheduler] ${line}\n`);
+  });
+  py.stderr.on('data', (data) => process.stderr.write(`[Scheduler stderr] ${data}`));
+
+  py.on('exit', (code) => {
+    py = null;
+    if (stopped) return;
+    console.error(`[Scheduler] exited with code ${code}, respawning in ${RESPAWN_DELAY_MS / 1000}s`);
+    setTimeout(start, RESPAWN_DELAY_MS);
+  });
+};
+
+const stop = () => {
+  stopped = true;
+  if (py) py.kill();
+};
+
+const stats = () => ({ enabled, running: !!py, stats: latest });
+
+module.exports = { enabled, start, stop, stats };
@@ -1,51 +1,42 @@
 // routes/trend.js
 const express = require('express');
 const cron = require('node-cron');
-const Post = require('../models/Post');
-const AIPost = require('../models/AIPost');
+const trending = require('./trending');
 
 const router = express.Router();
 
-// Helper function to degrade trend for any given model
-async function degradeCollection(Model, collectionName) {
-  try {
-    console.log(`[${new Date().toISOString()}] Starting trend degradation for ${collectionName}...`);
-
-    const result = await Model.updateMany(
-      { trend: { $gt: 0 } },
-      [
-        {
-          $set: {
-            trend: { $max: [0, { $subtract: ['$trend', 0.5] }] },
-            old: {
-              $cond: [{ $lte: [{ $subtract: ['$trend', 0.5] }, 0] }, true, '$old']
-            }
-          }
-        }
-      ]
-    );
+// Trend decays on read (routes/trending.js), so nothing here rewrites posts. The cron only reseeds
+// the per-community top-K index from a read-only NumPy pass, catching unlikes and missed events.
+const REBUILD_CRON = process.env.TREND_REBUILD_CRON || '0 * * * *';
 
-    console.log(`[${new Date().toISOString()}] ${collectionName}: ${result.modifiedCount} documents updated.`);
+async function rebuildIndex() {
+  try {
+    const result = await trending.rebuild();
+    console.log(`[${new Date().toISOString()}] Trending index rebuilt: ${result.posts} posts, ${result.communities} communities in ${result.seconds}s`);
   } catch (err) {
-    console.error(`[${new Date().toISOString()}] Error degrading ${collectionName}:`, err);
+    console.error(`[${new Date().toISOString()}] Error rebuilding trending index:`, err.message);
   }
 }
 
-// Degrade both collections
-async function degradeAll() {
-  await degradeCollection(Post, 'Post');
-  await degradeCollection(AIPost, 'AIPost');
-}
+// Trending posts of a community ('all' for every one), hottest first
+router.get('/api/trending', async (req, res) => {
+  const limit = Math.min(parseInt(req.query.limit, 10) || 20, trending.TOP_K);  // Lists hold TOP_K posts
+  try {
+    res.json(await trending.top(req.query.community || 'all', limit));
+  } catch (err) {
+    console.error('Error fetching trending posts:', err.message);
+    res.status(500).json({ error: 'Failed to fetch trending posts' });
+  }
+});
 
 // Manual trigger endpoint
-router.post('/degrade-posts', async (req, res) => {
-  await degradeAll();
-  res.json({ message: 'Trend scores updated successfully for all collections' });
+router.post('/trending/rebuild', async (req, res) => {
+  await rebuildIndex();
+  res.json({ message: 'Trending index rebuilt' });
 });
 
-// Automatic run every day at midnight UTC
-cron.schedule('0 0 * * *', () => {
-  degradeAll();
+cron.schedule(REBUILD_CRON, () => {
+  rebuildIndex();
 }, {
   timezone: 'UTC'
 });
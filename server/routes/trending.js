@@ -0,0 +1,149 @@
+// routes/trending.js
+// Node side of python/trending.py. Trend is computed on read from createdAt (the old nightly
+// rule, no document rewrites), value is kept current on every like/comment, and those events are
+// buffered and handed to `trending.py --events` in one spawn per TREND_FLUSH_MS so the per-community
+// top-K index stays incremental. top() serves each community's list from memory: a flush hands back
+// the lists it changed, and a list older than TREND_TOP_CACHE_MS (other processes write the index
+// too) is refreshed in the background, so reads never spawn a process per request. Only communities
+// the index has a list for are served (anything else is [] without a spawn), and at most
+// TREND_TOP_CACHE_MAX lists are kept, least recently read dropped first.
+const { spawn } = require('child_process');
+const path = require('path');
+
+const pythonScriptPath = path.resolve(__dirname, '../python/trending.py');
+const FLUSH_MS = parseInt(process.env.TREND_FLUSH_MS || '5000', 10);
+const TOP_CACHE_MS = parseInt(process.env.TREND_TOP_CACHE_MS || '60000', 10);
+const TOP_CACHE_MAX = parseInt(process.env.TREND_TOP_CACHE_MAX || '500', 10);
+const TOP_K = parseInt(process.env.TREND_TOP_K || '50', 10);  // Same variable trending.py sizes each list with
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+let buffer = new Map();  // postId -> latest event, so bursts on one post collapse to one line
+let flushTimer = null;
+const topCache = new Map();  // community -> { at, posts, pending }, in least-recently-read order
+const known = { at: 0, names: new Set(['all']), pending: null };  // Communities the index has lists for
+
+const trendOf = (post, now = Date.now()) => {
+  const days = Math.floor(Math.max(0, now - new Date(post.createdAt || now).getTime()) / DAY_MS);
+  return Math.max(0, 10 - 0.5 * days);
+};
+
+const valueOf = (post) => 2 * (post.likeCount || 0) + 3 * (post.commentCount || 0);
+
+const runPython = (args, input) => new Promise((resolve, reject) => {
+  const py = spawn('python3', [pythonScriptPath, ...args], { stdio: ['pipe', 'pipe', 'pipe'] });
+  let out = '';
+  let err = '';
+  py.stdout.on('data', (data) => { out += data.toString(); });
+  py.stderr.on('data', (data) => { err += data.toString(); });
+  py.stdin.on('error', () => {});  // Exit code below reports the failure
+  py.on('error', reject);
+  py.on('close', (code) => {
+    if (code !== 0) return reject(new Error(err.trim() || `trending.py exited with code ${code}`));
+    try {
+      resolve(JSON.parse(out));
+    } catch (e) {
+      reject(new Error(`Bad output from trending.py: ${out.slice(0, 200)}`));
+    }
+  });
+  py.stdin.end(input || '');
+});
+
+const cacheTop = (community, entry) => {
+  topCache.delete(community);
+  topCache.set(community, entry);
+  while (topCache.size > TOP_CACHE_MAX) topCache.delete(topCache.keys().next().value);
+};
+
+const setKnown = (names) => {
+  known.at = Date.now();
+  known.names = new Set(['all', ...names]);
+};
+
+// Community list, fetched once and refreshed like the lists (new communities can come from other processes)
+const loadKnown = () => {
+  if (!known.pending) {
+    known.pending = runPython(['--communities'])
+      .then((names) => {
+        setKnown(names);
+        return known.names;
+      })
+      .finally(() => { known.pending = null; });
+  }
+  return known.pending;
+};
+
+const knownCommunities = async () => {
+  if (!known.at) return loadKnown();
+  if (Date.now() - known.at > TOP_CACHE_MS) {
+    loadKnown().catch((err) => console.error('Trending communities refresh failed:', err.message));
+  }
+  return known.names;
+};
+
+const flush = () => {
+  flushTimer = null;
+  if (!buffer.size) return;
+  const lines = [...buffer.values()].map((event) => JSON.stringify(event)).join('\n') + '\n';
+  buffer = new Map();
+  runPython(['--events'], lines)
+    .then((result) => {
+      for (const [community, posts] of Object.entries(result.top || {})) {
+        known.names.add(community);
+        cacheTop(community, { at: Date.now(), posts, pending: null });
+      }
+    })
+    .catch((err) => console.error('Trending events failed:', err.message));
+};
+
+// Call after a like/unlike/comment has been saved; post carries the new counts
+const recordEvent = (post, isAI) => {
+  buffer.set(String(post._id), {
+    post_id: String(post._id),
+    post_type: isAI ? 'ai' : 'user',
+    community: post.community,
+    likes: post.likeCount || 0,
+    comments: post.commentCount || 0,
+    last: new Date(post.lastInteractionAt || Date.now()).getTime()
+  });
+  if (!flushTimer) flushTimer = setTimeout(flush, FLUSH_MS);
+};
+
+// One spawn per community at a time; concurrent readers share it
+const loadTop = (community) => {
+  const entry = topCache.get(community) || { at: 0, posts: null, pending: null };
+  if (!entry.pending) {
+    entry.pending = runPython(['--top', community, '--limit', String(TOP_K)])
+      .then((posts) => {
+        cacheTop(community, { at: Date.now(), posts, pending: null });
+        return posts;
+      })
+      .catch((err) => {
+        entry.pending = null;
+        throw err;
+      });
+    cacheTop(community, entry);
+  }
+  return entry.pending;
+};
+
+const top = async (community, limit = TOP_K) => {
+  community = String(community || 'all');
+  limit = Math.max(1, Math.min(limit, TOP_K));
+  if (!(await knownCommunities()).has(community)) return [];
+  const entry = topCache.get(community);
+  if (!entry || !entry.posts) return (await loadTop(community)).slice(0, limit);
+  cacheTop(community, entry);
+  if (Date.now() - entry.at > TOP_CACHE_MS) {
+    loadTop(community).catch((err) => console.error('Trending refresh failed:', err.message));
+  }
+  return entry.posts.slice(0, limit);
+};
+
+const rebuild = async () => {
+  const result = await runPython(['--rebuild']);
+  topCache.clear();  // Every list may have changed
+  setKnown(result.names || []);
+  return result;
+};
+
+module.exports = { TOP_K, trendOf, valueOf, recordEvent, top, rebuild };
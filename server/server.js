@@ -244,8 +244,11 @@ app.get('/post/:id', async (req, res) => {
 });
 const uuidmaker = require('./routes/uuidMaker')
 const {runPythonLoop,startLoop,stopLoop}= require('./routes/media')
+const scheduler = require('./routes/scheduler')
+// AI_SCHEDULER=1: one budget-aware daemon instead of the random media/post loops
+if (scheduler.enabled) scheduler.start()
+else runPythonLoop()
 // Protected routes with verifyFirebaseToken middleware
-runPythonLoop()
 app.use('/', authRoutes);
 app.use('/',uuidmaker)
 app.use('/',trendHnadle)